@@ -0,0 +1,298 @@
+"""Synthetic-data benchmarks for the case pipeline.
+
+    python benchmark.py generate --sizes 1k,10k,100k,1m
+    python benchmark.py run --sizes 1k,10k,100k --out bench_results
+    python benchmark.py compare bench_results/<old>.json bench_results/<new>.json
+
+Synthetic exports have the shape of myCases.txt (a JSON array of JSON-encoded case records,
+Kannada fields included) and draw case types, courts, stages and dispositions from the
+bundled sample, so the category mix and text lengths stay realistic at any size. Hearing
+dates are spread around the day of generation: pending cases over the coming months, with a
+peak on working days, disposed ones in the past. Results are written as JSON, one file per
+run, named after the current commit.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "myCases.txt")
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+SEARCH_TERMS = [("kumar", "Contains"), ("o.s", "Contains"), ("evidence", "Whole words"), ("ra", "Prefix")]
+
+def _sample_records(path=SAMPLE):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(s) for s in json.load(f)]
+
+def _is_kannada(word):
+    return len(word) > 1 and all("\u0c80" <= ch <= "\u0cff" for ch in word)
+
+class CaseGenerator:
+    """Draws synthetic case records that look like the sample's."""
+
+    def __init__(self, sample, seed=0, today=None):
+        self.rng = random.Random(seed)
+        self.today = today or datetime.date.today()
+        self.sample = sample
+
+        def pairs(*fields):
+            return [tuple(r.get(f) for f in fields) for r in sample]
+
+        self.types = pairs("type_name", "ltype_name")
+        self.courts = pairs("establishment_name", "establishment_code", "lestablishment_name",
+                            "court_no_desg_name", "lcourt_no_desg_name", "state_code", "district_code",
+                            "state_name", "district_name", "ldistrict_name")
+        self.purposes = pairs("purpose_name", "lpurpose_name")
+        self.disposals = [p for p in pairs("disp_name", "ldisp_name") if p[0]]
+        self.disposed_share = len(self.disposals) / len(sample)
+        self.name_words = sorted({w for r in sample for f in ("petparty_name", "resparty_name")
+                                  for w in (r.get(f) or "").split() if w.isalpha() and len(w) > 2})
+        # Kannada party names: words in Kannada script, filled in as often as in the sample
+        self.local_name_words = sorted({w for r in sample for f in ("lpetparty_name", "lresparty_name")
+                                        for w in (r.get(f) or "").split() if _is_kannada(w)})
+        self.local_party_share = sum(bool(r.get("lpetparty_name")) for r in sample) / len(sample)
+        self.years = [r["reg_year"] for r in sample if r.get("reg_year")]
+
+    def _party(self):
+        rng = self.rng
+        name = " ".join(rng.choice(self.name_words) for _ in range(rng.choice((1, 2, 2, 3))))
+        return name + (" AND OTHERS" if rng.random() < 0.1 else "")
+
+    def _local_party(self):
+        rng = self.rng
+        if not self.local_name_words or rng.random() >= self.local_party_share:
+            return ""
+        return " ".join(rng.choice(self.local_name_words) for _ in range(rng.choice((1, 2, 2, 3))))
+
+    def _next_date(self, disposed):
+        rng = self.rng
+        if disposed:
+            return self.today - datetime.timedelta(days=rng.randint(1, 8 * 365))
+        # Pending: a few overdue, most within four months, none on Sundays
+        d = self.today + datetime.timedelta(days=int(rng.triangular(-30, 120, 7)))
+        return d + datetime.timedelta(days=1) if d.weekday() == 6 else d
+
+    def record(self, i):
+        rng = self.rng
+        type_name, ltype_name = rng.choice(self.types)
+        (establishment, code, lestablishment, court, lcourt, state_code,
+         district_code, state, district, ldistrict) = rng.choice(self.courts)
+        purpose, lpurpose = rng.choice(self.purposes)
+        year = rng.choice(self.years)
+        reg_no = rng.randint(1, 30000)
+        disposed = rng.random() < self.disposed_share
+        next_date = self._next_date(disposed)
+        last_date = next_date - datetime.timedelta(days=rng.randint(7, 90))
+        rec = {
+            "cino": f"{code}{i:06d}{year}",
+            "type_name": type_name, "case_no": f"2052{reg_no:07d}{year}", "reg_year": year, "reg_no": reg_no,
+            "petparty_name": self._party(), "resparty_name": self._party(),
+            "fil_year": "0", "fil_no": "0",
+            "establishment_name": establishment, "establishment_code": code,
+            "state_code": state_code, "district_code": district_code,
+            "state_name": state, "district_name": district,
+            "date_next_list": next_date.isoformat(),
+            "date_of_decision": next_date.isoformat() if disposed else None,
+            "date_last_list": last_date.isoformat(),
+            "updated": True,
+            "court_no_desg_name": court,
+            "ltype_name": ltype_name, "lpetparty_name": self._local_party(), "lresparty_name": self._local_party(),
+            "lestablishment_name": lestablishment, "lstate_name": "", "ldistrict_name": ldistrict,
+            "lcourt_no_desg_name": lcourt, "note": "",
+            "purpose_name": purpose, "lpurpose_name": lpurpose,
+        }
+        if disposed:
+            rec["disp_name"], rec["ldisp_name"] = rng.choice(self.disposals)
+        return rec
+
+def generate(path, n, seed=0, today=None):
+    """Write an n-case export to path, streamed so 1M cases never sit in memory at once."""
+    gen = CaseGenerator(_sample_records(), seed=seed, today=today)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(n):
+            if i:
+                f.write(",")
+            f.write(json.dumps(json.dumps(gen.record(i), ensure_ascii=False, separators=(",", ":")),
+                               ensure_ascii=False))
+        f.write("]")
+    return path
+
+def dataset_path(data_dir, label, seed):
+    path = os.path.join(data_dir, f"cases_{label}_seed{seed}.txt")
+    if not os.path.exists(path):
+        print(f"generating {label} cases -> {path}", file=sys.stderr)
+        generate(path, SIZES[label], seed=seed)
+    return path
+
+def _load_core():
+    import case_core
+    return case_core
+
+class Timer:
+    def __init__(self, repeat, memory):
+        self.repeat = repeat
+        self.memory = memory
+        self.results = []
+
+    def time(self, size, op, func, rows=None):
+        """Best of repeat wall times for func(); returns its last result."""
+        best, peak, result = None, None, None
+        for _ in range(self.repeat):
+            if self.memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - started
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1] // 1024
+                tracemalloc.stop()
+            best = seconds if best is None else min(best, seconds)
+        entry = {"size": size, "op": op, "seconds": round(best, 6),
+                 "rows": rows(result) if callable(rows) else rows}
+        if peak is not None:
+            entry["peak_kb"] = peak
+        self.results.append(entry)
+        print(f"{size:>6} {op:<30} {best:9.4f}s  rows={entry['rows']}", file=sys.stderr)
+        return result
+
+def run_size(core, timer, label, path):
+    from case_store import CaseStore
+    from cause_list_export import build_cause_list_excel, render_cause_list_pdf
+    from search_index import CaseSearchIndex
+
+    n = SIZES[label]
+
+    def load():
+        with open(path, "rb") as f:
+            return core.read_case_export(f, include_local=True)[0]
+
+    df = timer.time(label, "load", load, len)
+    timer.results[-1]["bytes_per_case"] = round(core.memory_per_case(df))
+    categories = timer.time(label, "categorize", lambda: core.categorize_cases(df), len)
+    disp = timer.time(label, "display", lambda: core.prepare_display_df(df, categories=categories), len)
+
+    today = datetime.date.today()
+    index = timer.time(label, "date_index_build", lambda: core.HearingDateIndex(df["date_next_list"]), n)
+    # The next day with hearings stands in for "today", which may be a Sunday
+    day = next((d for d in index.dates if d >= today), today)
+    timer.time(label, "date_filter_day", lambda: df.iloc[index.on(day)], len)
+    month = timer.time(label, "date_filter_30_days",
+                       lambda: df.iloc[index.between(today, today + datetime.timedelta(days=30))], len)
+
+    search = timer.time(label, "search_index_build", lambda: CaseSearchIndex(df), n)
+    for term, mode in SEARCH_TERMS:
+        timer.time(label, f"search_{mode.lower().replace(' ', '_')}_{term}", lambda: search.search(term, mode), len)
+
+    listed = disp.loc[month.index].rename(columns={"court_no_desg_name": "Court Hall"})
+    # Excel caps a sheet at 1,048,576 rows, so the workbook is the 30-day list, not the master list
+    timer.time(label, "export_excel_30_days",
+               lambda: build_cause_list_excel(listed, core.CAUSE_LIST_COLUMNS, core.APP_NAME, core.APP_SUB),
+               len(listed))
+    day_list = listed.loc[listed.index.isin(df.index[index.on(day)])]
+    sections = [(cat, day_list[day_list["Category"] == cat]) for cat in core.CAUSE_LIST_CATEGORIES]
+    timer.time(label, "export_pdf_day",
+               lambda: render_cause_list_pdf(sections, core.CAUSE_LIST_COLUMNS, core.APP_NAME, core.APP_SUB),
+               len(day_list))
+
+    root = tempfile.mkdtemp(prefix="casepilot-bench-")
+    store = CaseStore(root)
+    try:
+        timer.time(label, "store_save", lambda: store.save_cases(df), n)
+        timer.time(label, "backup_full", lambda: store.write_backup(io.BytesIO(), df, incremental=False), n)
+        changed = df.copy()
+        changed.iloc[0, changed.columns.get_loc("purpose_name")] = changed["purpose_name"].iat[1]
+        timer.time(label, "backup_incremental_1_row",
+                   lambda: store.write_backup(io.BytesIO(), changed, incremental=True), 1)
+    finally:
+        store.db.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run(sizes, data_dir, out_dir, repeat=3, memory=False, seed=0):
+    import numpy
+    import pandas
+    core = _load_core()
+    timer = Timer(repeat, memory)
+    for label in sizes:
+        run_size(core, timer, label, dataset_path(data_dir, label, seed))
+    commit = _git_commit()
+    report = {
+        "commit": commit,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "pandas": pandas.__version__, "numpy": numpy.__version__,
+        "machine": platform.machine(), "cpus": os.cpu_count(),
+        "repeat": repeat, "seed": seed, "results": timer.results,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{report['created'].replace(':', '')}_{commit}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(path)
+    return report
+
+def compare(old_path, new_path):
+    """Print new/old time ratios for every (size, op) measured in both reports."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["size"], r["op"]): r["seconds"] for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    for r in new:
+        before = old.get((r["size"], r["op"]))
+        if before is None:
+            continue
+        ratio = r["seconds"] / before if before else float("inf")
+        print(f"{r['size']:>6} {r['op']:<30} {before:9.4f}s -> {r['seconds']:9.4f}s  x{ratio:.2f}")
+
+def _sizes(text):
+    labels = [s.strip().lower() for s in text.split(",") if s.strip()]
+    unknown = [s for s in labels if s not in SIZES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown size(s) {', '.join(unknown)}; pick from {', '.join(SIZES)}")
+    return labels
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Case pipeline benchmarks on synthetic eCourts exports.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    g = sub.add_parser("generate", help="write synthetic myCases.txt exports")
+    g.add_argument("--sizes", type=_sizes, default=list(SIZES))
+    g.add_argument("--data-dir", default="bench_data")
+    g.add_argument("--seed", type=int, default=0)
+    r = sub.add_parser("run", help="time the pipeline and write a JSON report")
+    r.add_argument("--sizes", type=_sizes, default=list(SIZES))
+    r.add_argument("--data-dir", default="bench_data")
+    r.add_argument("--out", default="bench_results")
+    r.add_argument("--repeat", type=int, default=3)
+    r.add_argument("--memory", action="store_true", help="also record peak allocations (slower)")
+    r.add_argument("--seed", type=int, default=0)
+    c = sub.add_parser("compare", help="compare two JSON reports")
+    c.add_argument("old")
+    c.add_argument("new")
+    args = ap.parse_args(argv)
+    if args.command == "generate":
+        os.makedirs(args.data_dir, exist_ok=True)
+        for label in args.sizes:
+            print(dataset_path(args.data_dir, label, args.seed))
+    elif args.command == "run":
+        os.makedirs(args.data_dir, exist_ok=True)
+        run(args.sizes, args.data_dir, args.out, repeat=args.repeat, memory=args.memory, seed=args.seed)
+    else:
+        compare(args.old, args.new)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import bisect
+import datetime
+import threading
+from io import BytesIO
+
+import pandas as pd
+
+from case_store import BILLING_FIELDS
+from diagnostics import timed
+
+BILLING_HEADERS = ["Date", "Case", "Billing Category", "Description", "Fee Type", "Amount (INR)", "Time Spent (hours)"]
+# Running totals are kept per value of each dimension, and per pair for the period report and invoices
+DIMENSIONS = ["case", "service_type", "fee_type", "month"]
+PAIRS = [("month", "service_type"), ("month", "case"), ("case", "service_type")]
+TOTAL_COLUMNS = ["amount", "time_spent", "entries"]
+BILLING_PAGE_SIZE = 50
+
+def entry_month(date):
+    """"YYYY-MM" of a billing date as entered (dd.mm.yyyy), or None."""
+    try:
+        return datetime.datetime.strptime(str(date), "%d.%m.%Y").strftime("%Y-%m")
+    except ValueError:
+        return None
+
+def _number(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if value != value else value
+
+def _text(value):
+    return "" if value is None or value != value else str(value)
+
+def normalize_entry(entry):
+    """An entry with every field present: amounts as floats, the rest as strings."""
+    return {f: _number(entry.get(f)) if f in ("amount", "time_spent") else _text(entry.get(f))
+            for f in BILLING_FIELDS}
+
+class BillingLedger:
+    """Every billing entry, held by column and shared by all sessions.
+
+    Entries sit in per-field lists in the order they were written, with the position of each
+    entry id and the positions of each case's entries. Running totals (amount, hours, entries)
+    are kept by case, billing category, fee type and month and for the PAIRS cross-tabs;
+    adding, editing or deleting entries moves only those entries between totals, so
+    summaries and exports never rescan the ledger. The store's billing table is the durable
+    copy; when someone else wrote to it (another process, a restore) the ledger reloads."""
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.RLock()
+        self.revision = None
+
+    def current(self):
+        if self.revision != self.store.billing_revision:
+            with self.lock:
+                revision = self.store.billing_revision
+                if self.revision != revision:
+                    self._load(revision)
+        return self
+
+    @timed("BillingLedger.load", rows=lambda result, ledger, revision: len(ledger))
+    def _load(self, revision):
+        df = self.store.load_billing()
+        for f in ("amount", "time_spent"):
+            df[f] = pd.to_numeric(df[f], errors="coerce").fillna(0.0).astype(float)
+        for f in ("case", "date", "service_type", "description", "fee_type"):
+            df[f] = df[f].fillna("").astype(str)
+        df["month"] = df["date"].map({d: entry_month(d) for d in df["date"].unique()})
+        self.columns = {f: df[f].tolist() for f in ["id", *BILLING_FIELDS, "month"]}
+        self.positions = dict(zip(self.columns["id"], range(len(df))))
+        self.case_positions = {case: pos.tolist() for case, pos in df.groupby("case", sort=False).indices.items()}
+        # Totals are built with one groupby per key, then kept up to date entry by entry
+        self.totals = {}
+        for key in [*DIMENSIONS, *PAIRS]:
+            cols = list(key) if isinstance(key, tuple) else key
+            grouped = df.groupby(cols, sort=False, dropna=False).agg(
+                amount=("amount", "sum"), time_spent=("time_spent", "sum"), entries=("amount", "size"))
+            totals = dict(zip(grouped.index.tolist(), map(list, zip(grouped["amount"].tolist(),
+                                                                   grouped["time_spent"].tolist(),
+                                                                   grouped["entries"].tolist()))))
+            if "month" in cols:
+                # groupby(dropna=False) keys entries without a readable date by NaN; the ledger uses None
+                undated = grouped.index.get_level_values("month").isna()
+                for k in grouped.index[undated].tolist():
+                    totals[_none(k)] = totals.pop(k)
+            self.totals[key] = totals
+        self.revision = revision
+
+    def _commit(self, revision, change):
+        # One write of ours since the last load is applied in place; anything else means reload
+        if revision == self.revision + 1:
+            change()
+            self.revision = revision
+        else:
+            self._load(revision)
+
+    # ----- Columns and totals -----
+    def _append(self, entry_id, entry):
+        entry = dict(entry, month=entry_month(entry["date"]))
+        pos = len(self.columns["id"])
+        self.columns["id"].append(entry_id)
+        for f in [*BILLING_FIELDS, "month"]:
+            self.columns[f].append(entry[f])
+        self.positions[entry_id] = pos
+        self.case_positions.setdefault(entry["case"], []).append(pos)
+        self._count(entry, 1)
+
+    def _entry(self, pos):
+        return {f: self.columns[f][pos] for f in [*BILLING_FIELDS, "month"]}
+
+    def _count(self, entry, sign):
+        keys = [(dim, entry[dim]) for dim in DIMENSIONS]
+        keys += [(pair, tuple(entry[d] for d in pair)) for pair in PAIRS]
+        for dim, value in keys:
+            totals = self.totals[dim]
+            row = totals.setdefault(value, [0.0, 0.0, 0])
+            row[0] += sign * entry["amount"]
+            row[1] += sign * entry["time_spent"]
+            row[2] += sign
+            if not row[2]:
+                del totals[value]
+
+    # ----- Writes -----
+    def add(self, entry):
+        entry = normalize_entry(entry)
+        with self.lock:
+            self.current()
+            entry_id, revision = self.store.add_billing_entry(entry)
+            self._commit(revision, lambda: self._append(entry_id, entry))
+        return entry_id
+
+    def update(self, changes):
+        """Apply {entry id: {field: new value}}."""
+        with self.lock:
+            self.current()
+            changes = {i: fields for i, fields in changes.items() if i in self.positions and fields}
+            if not changes:
+                return
+            updated = {i: normalize_entry(dict(self._entry(self.positions[i]), **fields)) for i, fields in changes.items()}
+            revision = self.store.update_billing_entries(updated)
+            self._commit(revision, lambda: [self._replace(i, entry) for i, entry in updated.items()])
+
+    def _replace(self, entry_id, entry):
+        pos = self.positions[entry_id]
+        old = self._entry(pos)
+        entry = dict(entry, month=entry_month(entry["date"]))
+        self._count(old, -1)
+        for f in [*BILLING_FIELDS, "month"]:
+            self.columns[f][pos] = entry[f]
+        if old["case"] != entry["case"]:
+            self._move_case(pos, old["case"], entry["case"])
+        self._count(entry, 1)
+
+    def _move_case(self, pos, old, new):
+        positions = self.case_positions[old]
+        positions.remove(pos)
+        if not positions:
+            del self.case_positions[old]
+        if new is not None:
+            # Positions stay in write order, which is what the pages show
+            bisect.insort(self.case_positions.setdefault(new, []), pos)
+
+    def delete(self, ids):
+        with self.lock:
+            self.current()
+            ids = [i for i in ids if i in self.positions]
+            if not ids:
+                return
+            revision = self.store.delete_billing_entries(ids)
+            self._commit(revision, lambda: [self._remove(i) for i in ids])
+
+    def _remove(self, entry_id):
+        # The row stays in the columns as a gap (id None) until the next load
+        pos = self.positions.pop(entry_id)
+        entry = self._entry(pos)
+        self._count(entry, -1)
+        self._move_case(pos, entry["case"], None)
+        self.columns["id"][pos] = None
+
+    # ----- Reads -----
+    def __len__(self):
+        return len(self.positions)
+
+    def entry_ids(self, case=None, start=0, stop=None):
+        """Ids of the live entries (of one case), oldest first, sliced [start:stop]."""
+        with self.lock:
+            ids = self.columns["id"]
+            if case is not None:
+                return [ids[pos] for pos in self.case_positions.get(case, [])[start:stop]]
+            if len(self.positions) == len(ids):
+                return ids[start:stop]
+            return [i for i in ids if i is not None][start:stop]
+
+    def count(self, case=None):
+        return len(self) if case is None else len(self.case_positions.get(case, []))
+
+    def frame(self, ids):
+        """The given entries as a frame indexed by entry id, in BILLING_FIELDS order."""
+        with self.lock:
+            positions = [self.positions[i] for i in ids if i in self.positions]
+            data = {f: [self.columns[f][pos] for pos in positions] for f in BILLING_FIELDS}
+            return pd.DataFrame(data, index=pd.Index([self.columns["id"][pos] for pos in positions], name="id"))
+
+    def total(self, dim=None, value=None):
+        """(amount, hours, entries) of the whole ledger, or of one value of a dimension or pair."""
+        if dim is None:
+            amount = sum(row[0] for row in self.totals["case"].values())
+            hours = sum(row[1] for row in self.totals["case"].values())
+            return amount, hours, len(self)
+        return tuple(self.totals[dim].get(value, (0.0, 0.0, 0)))
+
+    def summary(self, dim, within=None):
+        """Totals by one dimension (or pair), as a frame sorted by key (no month last).
+
+        For a pair, within keeps one value of its first dimension and indexes by the second."""
+        with self.lock:
+            totals = self.totals[dim]
+            if within is not None:
+                totals = {k[1]: row for k, row in totals.items() if k[0] == within}
+                dim = dim[1]
+            keys, rows = list(totals), [list(row) for row in totals.values()]
+        if isinstance(dim, tuple):
+            index = pd.MultiIndex.from_tuples(keys, names=list(dim)) if keys else \
+                pd.MultiIndex.from_arrays([[]] * len(dim), names=list(dim))
+        else:
+            index = pd.Index(keys, name=dim, dtype=object)
+        frame = pd.DataFrame(rows, index=index, columns=TOTAL_COLUMNS).sort_index(na_position="last")
+        return frame.astype({"amount": float, "time_spent": float, "entries": int}).round({"amount": 2, "time_spent": 2})
+
+def _none(key):
+    if isinstance(key, tuple):
+        return tuple(_none(k) for k in key)
+    return None if key != key else key
+
+# ----- Excel -----
+def _write_sheet(ws, headers, rows, widths=None):
+    from openpyxl.styles import Alignment, Font
+    from openpyxl.utils import get_column_letter
+
+    ws.append(headers)
+    for cell in ws[ws.max_row]:
+        cell.font = Font(bold=True)
+    for row in rows:
+        ws.append(list(row))
+    widths = widths or [max(len(str(h)), 12) + 2 for h in headers]
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    for row in ws.iter_rows():
+        for cell in row:
+            cell.alignment = Alignment(wrap_text=True, vertical="top", horizontal="left")
+    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    ws.page_setup.fitToPage = True
+    ws.page_setup.fitToWidth = 1
+
+def _total_rows(frame):
+    # frame from BillingLedger.summary: its key cells, then amount, hours and entries
+    keys = frame.index.to_frame(index=False).astype(object)
+    keys = keys.where(keys.notna(), "")
+    return zip(*[keys[c].tolist() for c in keys.columns], frame["amount"].tolist(),
+               frame["time_spent"].tolist(), frame["entries"].tolist())
+
+def _in_period(months, start_month, end_month):
+    months = pd.Index(months, dtype=object).fillna("")
+    mask = months != ""
+    if start_month:
+        mask &= months >= start_month
+    if end_month:
+        mask &= months <= end_month
+    return mask
+
+def _workbook_bytes(wb):
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+@timed()
+def build_period_excel(ledger, start_month=None, end_month=None):
+    """Workbook of billing totals per month, by billing category and by case, for the
+    months in [start_month, end_month] ("YYYY-MM"); read from the ledger's running totals."""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "By Month"
+    months = ledger.summary("month")
+    months = months[_in_period(months.index, start_month, end_month)]
+    _write_sheet(ws, ["Month", "Amount (INR)", "Time Spent (hours)", "Entries"], _total_rows(months))
+    ws.append(["Total", round(months["amount"].sum(), 2), round(months["time_spent"].sum(), 2), int(months["entries"].sum())])
+    for title, pair, header in [("By Category", ("month", "service_type"), "Billing Category"),
+                                ("By Case", ("month", "case"), "Case")]:
+        frame = ledger.summary(pair)
+        frame = frame[_in_period(frame.index.get_level_values("month"), start_month, end_month)]
+        _write_sheet(wb.create_sheet(title), ["Month", header, "Amount (INR)", "Time Spent (hours)", "Entries"],
+                     _total_rows(frame), widths=[12, 40, 16, 20, 10])
+    return _workbook_bytes(wb)
+
+@timed()
+def build_invoice_excel(ledger, case, label=None):
+    """Invoice workbook for one case (or "General"): its entries, then subtotals per billing
+    category and the grand total from the running totals."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Invoice"
+    ws.append([f"Invoice: {label or case}"])
+    ws[ws.max_row][0].font = Font(bold=True, size=13)
+    ws.append([f"Generated {datetime.date.today().strftime('%d.%m.%Y')}"])
+    ws.append([])
+    entries = ledger.frame(ledger.entry_ids(case))
+    _write_sheet(ws, BILLING_HEADERS, entries.itertuples(index=False), widths=[12, 24, 28, 40, 22, 14, 18])
+    ws.append([])
+    for category, amount, hours, _ in _total_rows(ledger.summary(("case", "service_type"), within=case)):
+        ws.append(["", "", category, "Subtotal", "", amount, hours])
+    amount, hours, _ = ledger.total("case", case)
+    ws.append(["", "", "", "Total", "", round(amount, 2), round(hours, 2)])
+    for cell in ws[ws.max_row]:
+        cell.font = Font(bold=True)
+    return _workbook_bytes(wb)
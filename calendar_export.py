@@ -0,0 +1,211 @@
+"""Upcoming hearings as an iCalendar (.ics) file, for calendar apps to import or subscribe to.
+
+Each case with a hearing in the window is one all-day VEVENT whose UID comes from its CNR, so a
+rescheduled hearing moves the existing event instead of adding another. Rendered events are kept
+in a small SQLite cache with a fingerprint of their content: a re-export renders only the
+hearings whose details changed, gives those the next SEQUENCE, and copies the rest verbatim.
+Events are written in batches straight to the output file, so a large calendar never sits in
+memory as a whole.
+"""
+import datetime
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import pytz
+
+from diagnostics import timed
+
+PRODID = "-//ecourts-pc-dashboard//EN"
+CALENDAR_CHUNK = 500
+# Split option -> display column the calendars are cut by
+SPLITS = {"court": "court_no_desg_name", "category": "Category"}
+
+def calendar_window(config, now=None):
+    """(first, last) hearing day an export covers: today in the configured timezone plus
+    calendar_days_ahead."""
+    tz = pytz.timezone(config.get("timezone") or "Asia/Kolkata")
+    today = (now or datetime.datetime.now(tz)).astimezone(tz).date()
+    return today, today + datetime.timedelta(days=int(config.get("calendar_days_ahead", 45)))
+
+def event_uid(cino):
+    return f"{cino.strip()}@casepilot"
+
+def _clean(value):
+    return "" if value is None or value != value else str(value).strip()
+
+def _as_day(value):
+    if value is None or value != value:
+        return None
+    return value.date() if isinstance(value, datetime.datetime) else value
+
+def _escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+def _fold(line):
+    # Content lines longer than 75 octets continue on lines starting with a space (RFC 5545 3.1),
+    # never breaking inside a UTF-8 sequence
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start, limit = end, 74
+    return "\r\n ".join(parts)
+
+def _event_body(day, summary, location, description, reminder_minutes):
+    # Everything but UID, DTSTAMP and SEQUENCE; the fingerprint is taken over these lines
+    lines = [f"DTSTART;VALUE=DATE:{day:%Y%m%d}", f"DTEND;VALUE=DATE:{day + datetime.timedelta(days=1):%Y%m%d}",
+             f"SUMMARY:{_escape(summary)}"]
+    if location:
+        lines.append(f"LOCATION:{_escape(location)}")
+    lines += [f"DESCRIPTION:{_escape(description)}", "TRANSP:TRANSPARENT"]
+    if reminder_minutes:
+        # For an all-day event the alarm counts back from the start of the hearing day
+        lines += ["BEGIN:VALARM", "ACTION:DISPLAY", f"DESCRIPTION:{_escape(summary)}",
+                  f"TRIGGER:-PT{int(reminder_minutes)}M", "END:VALARM"]
+    return lines
+
+class CalendarCache:
+    """Rendered VEVENTs by UID, with the fingerprint and SEQUENCE each was rendered at.
+
+    Entries outlive the hearings that left the window, so an event that comes back carries on
+    from its last SEQUENCE."""
+
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    uid TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, sequence INTEGER NOT NULL, event TEXT NOT NULL
+                )
+            """)
+
+    def get(self, uids):
+        """{uid: (fingerprint, sequence, event)} for the cached ones among uids."""
+        out = {}
+        with self.lock:
+            for i in range(0, len(uids), CALENDAR_CHUNK):
+                batch = uids[i:i + CALENDAR_CHUNK]
+                rows = self.db.execute(
+                    f"SELECT uid, fingerprint, sequence, event FROM events WHERE uid IN ({','.join('?' * len(batch))})",
+                    batch)
+                out.update((uid, (fp, seq, event)) for uid, fp, seq, event in rows)
+        return out
+
+    def put(self, rows):
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO events (uid, fingerprint, sequence, event) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (uid) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                "sequence = excluded.sequence, event = excluded.event", rows)
+
+def _render_events(disp, chunk, cache, reminder_minutes, stamp, seen):
+    # One batch of VEVENTs as text, plus how many had to be rendered afresh
+    rows = disp.iloc[chunk]
+    columns = ["cino", "date_next_list", "Type", "Case Number/Year", "Parties", "court_no_desg_name",
+               "establishment_name", "Stage Today", "Category"]
+    values = zip(*(rows[c].astype(object).to_numpy() if c in rows.columns else [None] * len(rows)
+                   for c in columns))
+    pending = []
+    for cino, day, case_type, number, parties, court, establishment, stage, category in values:
+        cino, day = _clean(cino), _as_day(day)
+        uid = event_uid(cino)
+        # Rows without a CNR have nothing stable to key on; a repeated CNR keeps its first row
+        if not cino or day is None or uid in seen:
+            continue
+        seen.add(uid)
+        summary = " ".join(p for p in (_clean(case_type), _clean(number)) if p)
+        summary = f"{summary}: {_clean(parties)}" if summary else _clean(parties)
+        location = ", ".join(p for p in (_clean(court), _clean(establishment)) if p)
+        description = "\n".join(f"{label}: {text}" for label, text in
+                                (("CNR", cino), ("Stage", _clean(stage)), ("Category", _clean(category))) if text)
+        body = _event_body(day, summary, location, description, reminder_minutes)
+        pending.append((uid, hashlib.sha1("\n".join(body).encode("utf-8")).hexdigest(), body))
+    cached = cache.get([uid for uid, _, _ in pending])
+    out, changed = [], []
+    for uid, fingerprint, body in pending:
+        old = cached.get(uid)
+        if old and old[0] == fingerprint:
+            out.append(old[2])
+            continue
+        sequence = 0 if old is None else old[1] + 1
+        lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}", f"SEQUENCE:{sequence}", *body, "END:VEVENT"]
+        event = "".join(_fold(line) + "\r\n" for line in lines)
+        changed.append((uid, fingerprint, sequence, event))
+        out.append(event)
+    cache.put(changed)
+    return "".join(out), len(out), len(changed)
+
+@timed()
+def write_calendar(f, disp, positions, cache, name="Hearings", reminder_minutes=None, timezone=None):
+    """Write the hearings of disp (prepare_display_df output) at positions, in that order, to the
+    binary file f as one VCALENDAR. Returns (events written, events rendered afresh)."""
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    header = ["BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+              f"X-WR-CALNAME:{_escape(name)}"]
+    if timezone:
+        header.append(f"X-WR-TIMEZONE:{timezone}")
+    f.write("".join(_fold(line) + "\r\n" for line in header).encode("utf-8"))
+    written = rendered = 0
+    seen = set()
+    for i in range(0, len(positions), CALENDAR_CHUNK):
+        text, n, fresh = _render_events(disp, positions[i:i + CALENDAR_CHUNK], cache, reminder_minutes, stamp, seen)
+        f.write(text.encode("utf-8"))
+        written += n
+        rendered += fresh
+    f.write(b"END:VCALENDAR\r\n")
+    return written, rendered
+
+def write_calendar_file(path, *args, **kwargs):
+    """write_calendar to path, replacing the file only once it is complete (subscribers may be
+    reading it meanwhile)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            counts = write_calendar(f, *args, **kwargs)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return counts
+
+def _file_part(group):
+    return re.sub(r"[^0-9A-Za-z]+", "_", group).strip("_") or "Unassigned"
+
+def calendar_groups(disp, positions, split=None):
+    """[(group, positions)]: one calendar (group None), or one per court or category, in name
+    order, each keeping the order of positions. Names that only differ in punctuation or case
+    (the same court spelt two ways) share a calendar, since they would share a file name."""
+    if not split:
+        return [(None, positions)]
+    keys = disp[SPLITS[split]].astype(object).to_numpy()[positions]
+    names, groups = {}, {}
+    for pos, key in zip(positions, keys):
+        name = _clean(key) or "Unassigned"
+        part = _file_part(name).lower()
+        names.setdefault(part, name)
+        groups.setdefault(part, []).append(pos)
+    return sorted((names[part], rows) for part, rows in groups.items())
+
+def calendar_name(group):
+    return f"Hearings - {group}" if group else "Hearings"
+
+def calendar_file_name(path, group):
+    """path for the whole calendar, path with the group name worked into the stem for a split."""
+    if group is None:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{_file_part(group)}{ext or '.ics'}"
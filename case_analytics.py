@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# Dimension -> source column; "category" and "week" are derived (case category, Monday of the hearing week)
+COLUMN_DIMENSIONS = {
+    "court": "court_no_desg_name",
+    "stage": "purpose_name",
+    "establishment": "establishment_name",
+    "district": "district_name",
+}
+DIMENSIONS = ["category", *COLUMN_DIMENSIONS, "week"]
+
+def aggregate_keys(df, categories):
+    """The key each row of df is counted under, one column per dimension (None where unknown)."""
+    keys = pd.DataFrame(index=df.index)
+    keys["category"] = pd.Series(categories, index=df.index, dtype=object)
+    for dim, col in COLUMN_DIMENSIONS.items():
+        keys[dim] = df[col].astype(object) if col in df.columns else None
+    next_dates = pd.to_datetime(df["date_next_list"], errors="coerce")
+    keys["week"] = (next_dates - pd.to_timedelta(next_dates.dt.weekday, unit="D")).dt.date.astype(object)
+    return keys.where(keys.notna(), None)
+
+def _pairs(keys):
+    return [(court, week) if court is not None and week is not None else None
+            for court, week in zip(keys["court"].to_numpy(), keys["week"].to_numpy())]
+
+def _count(values):
+    counts = pd.Series(values, dtype=object).value_counts(dropna=True)
+    return {k: int(n) for k, n in counts.items() if k is not None}
+
+def _delta(old, new):
+    # Net count change per key when rows move from old to new keys; rows that stay put cancel out
+    delta = {}
+    for key in old:
+        if key is not None:
+            delta[key] = delta.get(key, 0) - 1
+    for key in new:
+        if key is not None:
+            delta[key] = delta.get(key, 0) + 1
+    return {k: n for k, n in delta.items() if n}
+
+def _bump(counts, key, n):
+    n += counts.get(key, 0)
+    if n:
+        counts[key] = n
+    else:
+        counts.pop(key, None)
+
+class CaseAggregates:
+    """Case counts by category, court, stage, establishment, district and hearing week, plus
+    weekly hearings per court for trend views.
+
+    Built once from the whole table with value_counts; after a sync only the changed rows are
+    moved between buckets (apply), so keeping the counts current costs O(changed rows). Copies
+    share their counter dicts and copy one only when apply first changes it."""
+
+    def __init__(self, keys):
+        self.counts = {dim: _count(keys[dim]) for dim in DIMENSIONS}
+        self.court_weeks = {}
+        pairs = keys[["court", "week"]].dropna()
+        if len(pairs):
+            for (court, week), n in pairs.groupby(["court", "week"], sort=False).size().items():
+                self.court_weeks.setdefault(court, {})[week] = int(n)
+        # Counter dicts this object may change in place: dimension names and (court,) keys
+        self._owned = {*DIMENSIONS, *((court,) for court in self.court_weeks)}
+
+    def copy(self):
+        other = object.__new__(CaseAggregates)
+        other.counts = dict(self.counts)
+        other.court_weeks = dict(self.court_weeks)
+        # Neither side owns the shared dicts any more; whichever changes one first copies it
+        self._owned = set()
+        other._owned = set()
+        return other
+
+    def _counts(self, dim):
+        if dim not in self._owned:
+            self.counts[dim] = dict(self.counts[dim])
+            self._owned.add(dim)
+        return self.counts[dim]
+
+    def _weeks(self, court):
+        if (court,) not in self._owned:
+            self.court_weeks[court] = dict(self.court_weeks.get(court, {}))
+            self._owned.add((court,))
+        return self.court_weeks[court]
+
+    def apply(self, old_keys, new_keys):
+        """Move rows from their old keys to their new ones (both from aggregate_keys)."""
+        for dim in DIMENSIONS:
+            delta = _delta(old_keys[dim].to_numpy(), new_keys[dim].to_numpy())
+            if delta:
+                counts = self._counts(dim)
+                for key, n in delta.items():
+                    _bump(counts, key, n)
+        pairs = [_pairs(keys) for keys in (old_keys, new_keys)]
+        for (court, week), n in _delta(*pairs).items():
+            weeks = self._weeks(court)
+            _bump(weeks, week, n)
+            if not weeks:
+                del self.court_weeks[court]
+                self._owned.discard((court,))
+
+    def series(self, dim, top=None):
+        """Counts for one dimension, largest first (weeks in date order)."""
+        counts = self.counts[dim]
+        if dim == "week":
+            s = pd.Series({k: counts[k] for k in sorted(counts)}, dtype=np.int64)
+        else:
+            s = pd.Series(counts, dtype=np.int64).sort_values(ascending=False, kind="stable")
+        return s.head(top) if top else s
+
+    def trend(self, court, start=None, end=None):
+        """Hearings per week for one court, in date order, optionally within [start, end]."""
+        weeks = self.court_weeks.get(court, {})
+        keys = [w for w in sorted(weeks) if (start is None or w >= start) and (end is None or w <= end)]
+        return pd.Series([weeks[w] for w in keys], index=keys, dtype=np.int64)
@@ -0,0 +1,448 @@
+import bisect
+import datetime
+import json
+import os
+import re
+from io import TextIOWrapper
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import result_rows, timed
+
+APP_NAME = "Case Pilot"
+APP_SUB = "A Case Management Tool Developed and Created by JAY KISHAN SHARMA"
+API_URL = "https://eciapi.akshit.me"
+CAUSE_LIST_CATEGORIES = ["CCC/S/SCCH/MACT", "ACMM/ACJM/MMTC", "FC/MAYO/COM/CONS/DRT/OUT"]
+CAUSE_LIST_COLUMNS = ["Previous Date", "Court Hall", "Type",
+                      "Case Number/Year", "Parties", "Stage Today", "Next Date"]
+REQUIRED_COLUMNS = [
+    "cino","type_name","case_no","reg_no","reg_year",
+    "petparty_name","resparty_name","date_last_list","date_next_list",
+    "purpose_name","disp_name","establishment_name","court_no_desg_name","district_name"
+]
+# Kannada fields that the eCourts app export carries alongside the English ones
+LOCAL_COLUMNS = [
+    "ltype_name","lpetparty_name","lresparty_name","lestablishment_name",
+    "lcourt_no_desg_name","lpurpose_name","ldisp_name","ldistrict_name","lstate_name"
+]
+# Low-cardinality text kept as pandas categoricals
+CATEGORICAL_COLUMNS = [
+    "type_name","purpose_name","disp_name","establishment_name","court_no_desg_name","district_name"
+]
+# Hearing dates are day-resolution datetime64 (8 bytes, vectorized comparisons); date objects and
+# dd.mm.yyyy strings are only made at the edges (display, exports, the provider API)
+DATE_COLUMNS = ["date_last_list", "date_next_list"]
+DATE_DTYPE = "datetime64[s]"
+INT_COLUMNS = ["reg_no", "reg_year"]
+# Party names repeat (the State, banks, insurers) but are too varied for a categorical; the parser
+# shares one string object per distinct name while it collects them
+INTERNED_COLUMNS = ["petparty_name", "resparty_name"]
+# With this schema a case takes about 140 bytes in memory, text included (143 for myCases.txt against
+# about 890 with every column as Python objects); benchmark.py, which keeps the Kannada fields too,
+# records bytes_per_case at each size
+# Local persistent store (case snapshot + side tables); override the folder with CASEPILOT_DATA
+CASE_STORE_DIR = os.environ.get("CASEPILOT_DATA", "casepilot_data")
+
+def _as_date(value):
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value).date()
+
+def to_dates(values):
+    """Dates, ISO strings, Timestamps or None as DATE_DTYPE values (NaT where unreadable)."""
+    return pd.to_datetime(values, errors="coerce").astype(DATE_DTYPE)
+
+def compact_cases(df):
+    """Bring a case frame to the compact schema in place and return it: DATE_DTYPE dates, Int32
+    registration numbers and categorical low-cardinality text. Frames already in it pass through
+    untouched; older snapshots (date objects) and JSON restores (all object) are converted."""
+    for c in DATE_COLUMNS:
+        if c in df.columns and df[c].dtype != DATE_DTYPE:
+            df[c] = to_dates(df[c])
+    for c in INT_COLUMNS:
+        if c in df.columns and df[c].dtype != "Int32":
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int32")
+    for c in CATEGORICAL_COLUMNS:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    return df
+
+def memory_per_case(df):
+    """Bytes per case the frame holds, strings and categoricals included."""
+    return df.memory_usage(deep=True).sum() / max(len(df), 1)
+
+class CaseIndex:
+    """Row position of every CNR, so a lookup by cino is a dict hit instead of a column scan.
+
+    Built once per case table; a sync only rewrites statuses, so the index carries over to
+    the next version unchanged. A CNR listed more than once maps to its first row and is
+    reported in duplicates."""
+
+    def __init__(self, cinos):
+        cinos = pd.Series(cinos, dtype=object).to_numpy()
+        valid = pd.notna(cinos)
+        repeated = pd.Series(cinos).duplicated().to_numpy() & valid
+        first = np.flatnonzero(valid & ~repeated)
+        self.positions = dict(zip(cinos[first].tolist(), first.tolist()))
+        self.duplicates = sorted(set(cinos[repeated].tolist()))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, cino):
+        return cino in self.positions
+
+    def position(self, cino):
+        return self.positions.get(cino)
+
+    def positions_of(self, cinos):
+        """Row positions of the given CNRs that are in the table, in table order."""
+        get = self.positions.get
+        return np.array(sorted(p for p in map(get, cinos) if p is not None), dtype=np.intp)
+
+class HearingDateIndex:
+    """Row positions bucketed by next hearing date, with the distinct dates kept sorted
+    so that single-date and range lookups cost O(log d + k)."""
+
+    def __init__(self, next_dates):
+        dates = pd.to_datetime(pd.Series(next_dates), errors="coerce").to_numpy()
+        positions = np.flatnonzero(~pd.isna(dates))
+        order = np.argsort(dates[positions], kind="stable")
+        positions = positions[order]
+        keys, starts = np.unique(dates[positions], return_index=True)
+        self.buckets = {}
+        for key, chunk in zip(keys, np.split(positions, starts[1:])):
+            self.buckets[pd.Timestamp(key).date()] = chunk.tolist()
+        self.dates = sorted(self.buckets)
+
+    def on(self, d):
+        return np.array(self.buckets.get(_as_date(d), []), dtype=np.intp)
+
+    def between(self, start, end):
+        lo = bisect.bisect_left(self.dates, _as_date(start))
+        hi = bisect.bisect_right(self.dates, _as_date(end))
+        if lo >= hi:
+            return np.array([], dtype=np.intp)
+        chunks = [self.buckets[d] for d in self.dates[lo:hi]]
+        return np.sort(np.concatenate(chunks).astype(np.intp))
+
+    def sorted_positions(self, start=None, end=None):
+        # Row positions ordered by next hearing date, optionally within [start, end]; undated rows left out
+        lo = 0 if start is None else bisect.bisect_left(self.dates, _as_date(start))
+        hi = len(self.dates) if end is None else bisect.bisect_right(self.dates, _as_date(end))
+        if lo >= hi:
+            return np.array([], dtype=np.intp)
+        return np.concatenate([self.buckets[d] for d in self.dates[lo:hi]]).astype(np.intp)
+
+    def copy(self):
+        # Buckets are replaced, never edited, by move(), so copies can share them
+        index = object.__new__(HearingDateIndex)
+        index.buckets = dict(self.buckets)
+        index.dates = list(self.dates)
+        return index
+
+    def move(self, pos, old, new):
+        old, new = _as_date(old), _as_date(new)
+        if old == new:
+            return
+        if old is not None and pos in self.buckets.get(old, []):
+            bucket = [p for p in self.buckets[old] if p != pos]
+            if bucket:
+                self.buckets[old] = bucket
+            else:
+                del self.buckets[old]
+                del self.dates[bisect.bisect_left(self.dates, old)]
+        if new is not None:
+            if new not in self.buckets:
+                self.buckets[new] = []
+                bisect.insort(self.dates, new)
+            bucket = list(self.buckets[new])
+            bisect.insort(bucket, pos)
+            self.buckets[new] = bucket
+
+def assign_category(row):
+    court_str = f"{row.get('establishment_name','')} {row.get('court_no_desg_name','')}".lower()
+    case_str = f"{row.get('case_no','')} {row.get('reg_no','')} {row.get('type_name','')}".lower()
+
+    case_type = str(row.get('type_name', '')).lower()
+    case_no_full = f"{row.get('case_no','')} {row.get('reg_no','')}".lower()
+
+    reg_no = row.get("reg_no")
+    try:
+        case_number = int(reg_no) if reg_no is not None else None
+    except ValueError:
+        case_number = None
+
+    # ----- Threshold rules -----
+    if case_number is not None:
+        # CC / C.C / Crime cases
+        if any(x in case_type for x in ["cc", "c.c", "crime", "criminal case"]):
+            if case_number > 50000:
+                return "FC/MAYO/COM/CONS/DRT/OUT"
+            else:
+                return "ACMM/ACJM/MMTC"
+
+        # CRL.A / CRL.RP cases
+        if any(x in case_type for x in ["crl.a", "crl.rp", "crl.r.p"]):
+            if case_number > 20000:
+                return "FC/MAYO/COM/CONS/DRT/OUT"
+            else:
+                return "CCC/S/SCCH/MACT"
+
+        # S.C / SC cases
+        if case_type in ["s.c", "sc"]:
+            if case_number > 15000:
+                return "FC/MAYO/COM/CONS/DRT/OUT"
+            else:
+                return "CCC/S/SCCH/MACT"
+
+
+    if "mayo" in court_str or "mayohall" in court_str:
+        return "FC/MAYO/COM/CONS/DRT/OUT"
+
+    if ("commercial" in case_str or
+        any(x in case_str for x in ["com os","com.os","com ex","com.ex"]) or
+        case_str.startswith("com")):
+        return "FC/MAYO/COM/CONS/DRT/OUT"
+
+    if "magistrate" in court_str:
+        if "mayo" in court_str or "mayohall" in court_str:
+            return "FC/MAYO/COM/CONS/DRT/OUT"
+        return "ACMM/ACJM/MMTC"
+
+    if any(x in court_str for x in ["city civil","sessions","small causes","scch","mact","rural"]):
+        return "CCC/S/SCCH/MACT"
+
+    return "FC/MAYO/COM/CONS/DRT/OUT"
+
+# Column-wise equivalents of the substring rules in assign_category
+_CC_TYPE_RE = re.compile(r"cc|c\.c|crime|criminal case")
+_CRL_TYPE_RE = re.compile(r"crl\.a|crl\.rp|crl\.r\.p")
+_MAYO_COURT_RE = re.compile(r"mayo")
+_COMMERCIAL_CASE_RE = re.compile(r"commercial|com os|com\.os|com ex|com\.ex|^com")
+_MAGISTRATE_COURT_RE = re.compile(r"magistrate")
+_CCC_COURT_RE = re.compile(r"city civil|sessions|small causes|scch|mact|rural")
+
+def _lower_text(df, col):
+    # Same text the row-wise rules see: missing column -> "", missing value -> "none"
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype="string")
+    return df[col].astype("string").str.lower().fillna("none")
+
+def _case_numbers(df):
+    # int(reg_no) semantics: numbers truncate, integer strings parse, anything else is None
+    if "reg_no" not in df.columns:
+        return pd.Series(np.nan, index=df.index)
+    reg_no = df["reg_no"]
+    if pd.api.types.is_numeric_dtype(reg_no):
+        return np.trunc(reg_no.astype("float64"))
+    nums = pd.to_numeric(reg_no, errors="coerce")
+    is_text = reg_no.map(lambda v: isinstance(v, str))
+    if is_text.any():
+        int_text = reg_no[is_text].astype("string").str.fullmatch(r"\s*[+-]?\d+\s*").fillna(False)
+        nums[is_text] = nums[is_text].where(int_text.astype(bool))
+    return np.trunc(nums.astype("float64"))
+
+@timed(rows=result_rows)
+def categorize_cases(df):
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    case_type = _lower_text(df, "type_name")
+    court_str = _lower_text(df, "establishment_name") + " " + _lower_text(df, "court_no_desg_name")
+    case_str = (_lower_text(df, "case_no") + " " + _lower_text(df, "reg_no") + " " +
+                case_type)
+    case_number = _case_numbers(df)
+    has_number = case_number.notna().to_numpy()
+    number = case_number.fillna(0).to_numpy()
+
+    is_cc = case_type.str.contains(_CC_TYPE_RE, na=False).to_numpy() & has_number
+    is_crl = case_type.str.contains(_CRL_TYPE_RE, na=False).to_numpy() & has_number
+    is_sc = case_type.isin(["s.c", "sc"]).fillna(False).to_numpy() & has_number
+    is_mayo = court_str.str.contains(_MAYO_COURT_RE, na=False).to_numpy()
+    is_commercial = case_str.str.contains(_COMMERCIAL_CASE_RE, na=False).to_numpy()
+    is_magistrate = court_str.str.contains(_MAGISTRATE_COURT_RE, na=False).to_numpy()
+    is_ccc = court_str.str.contains(_CCC_COURT_RE, na=False).to_numpy()
+
+    # Order matters: first matching rule wins, exactly as in assign_category
+    conditions = [
+        is_cc & (number > 50000), is_cc,
+        is_crl & (number > 20000), is_crl,
+        is_sc & (number > 15000), is_sc,
+        is_mayo,
+        is_commercial,
+        is_magistrate,
+        is_ccc,
+    ]
+    choices = [
+        "FC/MAYO/COM/CONS/DRT/OUT", "ACMM/ACJM/MMTC",
+        "FC/MAYO/COM/CONS/DRT/OUT", "CCC/S/SCCH/MACT",
+        "FC/MAYO/COM/CONS/DRT/OUT", "CCC/S/SCCH/MACT",
+        "FC/MAYO/COM/CONS/DRT/OUT",
+        "FC/MAYO/COM/CONS/DRT/OUT",
+        "ACMM/ACJM/MMTC",
+        "CCC/S/SCCH/MACT",
+    ]
+    labels = np.select(conditions, choices, default="FC/MAYO/COM/CONS/DRT/OUT")
+    return pd.Series(labels, index=df.index, dtype=object)
+
+def _iter_export_elements(text, chunk_size, on_chunk):
+    # Incrementally decodes the outer JSON array of an eCourts export, one element at a time
+    decoder = json.JSONDecoder()
+    buf = text.read(chunk_size)
+    on_chunk()
+    pos = 0
+    eof = not buf
+    started = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            buf = text.read(chunk_size)
+            on_chunk()
+            pos, eof = 0, not buf
+            continue
+        if not started:
+            if buf[pos] == "{":
+                # Older exports are an object keyed by cino; those are small enough to decode at once
+                data = json.loads(buf[pos:] + text.read())
+                on_chunk()
+                yield from data.values()
+                return
+            if buf[pos] != "[":
+                raise ValueError("Expected a JSON array of cases")
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == "]":
+            return
+        try:
+            element, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = len(buf)
+        # A number cut at the end of a chunk still decodes ("-250." reads as -250), so an element
+        # is only taken once the "," or "]" after it has been read, or the file has ended
+        after = end
+        while after < len(buf) and buf[after] in " \t\r\n":
+            after += 1
+        if not eof and (after == len(buf) or buf[after] not in ",]"):
+            more = text.read(chunk_size)
+            on_chunk()
+            buf, pos, eof = buf[pos:] + more, 0, not more
+            continue
+        yield element
+        pos = end
+
+@timed(rows=lambda result, *args, **kwargs: result[1]["rows"])
+def read_case_export(file, include_local=False, on_progress=None, chunk_size=1 << 16):
+    """Stream a myCases.txt export into a typed case frame.
+
+    Only REQUIRED_COLUMNS (plus the Kannada l* fields when include_local is set) are kept.
+    Returns (df, stats) where stats counts loaded rows, rejected rows and unparseable dates."""
+    columns = REQUIRED_COLUMNS + (LOCAL_COLUMNS if include_local else [])
+    values = {c: [] for c in columns}
+    shared = {c: {} for c in columns if c in CATEGORICAL_COLUMNS or c in INTERNED_COLUMNS or c in LOCAL_COLUMNS}
+    rejected = 0
+
+    total = getattr(file, "size", None)
+    file.seek(0)
+    text = TextIOWrapper(file, encoding="utf-8")
+
+    def on_chunk():
+        if on_progress and total:
+            on_progress(min(file.tell() / total, 1.0))
+
+    for element in _iter_export_elements(text, chunk_size, on_chunk):
+        if isinstance(element, str):
+            try:
+                element = json.loads(element)
+            except ValueError:
+                rejected += 1
+                continue
+        if not isinstance(element, dict):
+            rejected += 1
+            continue
+        for c in columns:
+            v = element.get(c)
+            if c in shared and v is not None:
+                v = shared[c].setdefault(v, v)
+            values[c].append(v)
+    text.detach()
+
+    df = pd.DataFrame(index=pd.RangeIndex(len(values["cino"])))
+    bad_dates = 0
+    for c in columns:
+        col = pd.Series(values[c], index=df.index, dtype=object)
+        values[c] = None
+        if c in INT_COLUMNS:
+            col = pd.to_numeric(col, errors="coerce").astype("Int32")
+        elif c in DATE_COLUMNS:
+            col, bad = _parse_export_dates(col)
+            bad_dates += bad
+        elif c in CATEGORICAL_COLUMNS:
+            col = col.astype("category")
+        else:
+            col = col.infer_objects()
+        df[c] = col
+    stats = {"rows": len(df), "rejected": rejected, "bad_dates": bad_dates}
+    return df, stats
+
+def _parse_export_dates(col):
+    # Exports use ISO dates; only rows that miss the explicit format go through dayfirst inference
+    parsed = pd.to_datetime(col, format="%Y-%m-%d", errors="coerce")
+    present = col.notna() & (col.astype(str).str.strip() != "")
+    odd = parsed.isna() & present
+    if odd.any():
+        parsed[odd] = pd.to_datetime(col[odd], dayfirst=True, errors="coerce", format="mixed")
+    return parsed.astype(DATE_DTYPE), int((parsed.isna() & present).sum())
+
+def _format_dates(col):
+    return pd.to_datetime(col, errors="coerce").dt.strftime("%d.%m.%Y").fillna("")
+
+@timed(rows=result_rows)
+def prepare_display_df(df, categories=None):
+    out = df.copy()
+    out["Previous Date"] = _format_dates(out["date_last_list"])
+    out["Next Date"] = _format_dates(out["date_next_list"])
+    out["Case Number/Year"] = out["reg_no"].astype(str) + "/" + out["reg_year"].astype(str)
+    out["Parties"] = out["petparty_name"].fillna("") + " v. " + out["resparty_name"].fillna("")
+    out["Stage Today"] = out["purpose_name"] if "purpose_name" in out.columns else ""
+    out["Type"] = out["type_name"].astype(object).fillna("")
+    out["Category"] = categorize_cases(out) if categories is None else categories
+    return out
+
+
+def cause_list_jobs(disp, index, start, end, calendar_columns=None):
+    """Jobs for build_export_bundle: every category's Excel and PDF cause list on each date in
+    [start, end], cut from disp (prepare_display_df output) through index (its HearingDateIndex),
+    plus the calendar view of the range when calendar_columns is given."""
+    listed = disp.rename(columns={"court_no_desg_name": "Court Hall"})
+    jobs = []
+    d = start
+    while d <= end:
+        day = listed.iloc[index.on(d)]
+        for cat in CAUSE_LIST_CATEGORIES:
+            rows = day.loc[day["Category"] == cat, CAUSE_LIST_COLUMNS]
+            if rows.empty:
+                continue
+            stem = f"{d.isoformat()}/{d.isoformat()}_Cause_List_{cat.replace('/', '_')}"
+            jobs.append((f"{stem}.xlsx", "xlsx", [(cat, rows)], CAUSE_LIST_COLUMNS))
+            jobs.append((f"{stem}.pdf", "pdf", [(cat, rows)], CAUSE_LIST_COLUMNS))
+        d += datetime.timedelta(days=1)
+    if calendar_columns is not None:
+        calendar = disp.iloc[index.sorted_positions(start, end)]
+        calendar = calendar[[c for c in calendar_columns if c in calendar.columns]]
+        jobs.append(("Calendar_View.xlsx", "xlsx", [(None, calendar)], calendar_columns))
+    return jobs
+
+def read_config(path="config.yaml"):
+    import yaml
+    try:
+        with open(path, encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
@@ -0,0 +1,100 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+class CaseSnapshot:
+    """One published version of the case table, shared read-only by every session.
+
+    Neither the frame nor a built view is modified after publication; a newer version
+    is a new snapshot. Views are built on first use, once per snapshot, under its lock.
+    A snapshot that differs from its predecessor in only a few rows remembers those rows
+    (changed_rows, plus the old values in previous_rows) so views can be carried over by
+    patching a copy of the previous version's view instead of rebuilding it."""
+
+    def __init__(self, version, cases, parent_views=None, changed_rows=None, previous_rows=None):
+        self.version = version
+        self.cases = cases
+        self.views = {}
+        self.changed_rows = changed_rows
+        self.previous_rows = previous_rows
+        self._parent_views = parent_views
+        self._lock = threading.RLock()
+
+    def view(self, name, build, derive=None):
+        """(value, built) for the named view; derive(previous view, snapshot) patches a copy."""
+        value = self.views.get(name)
+        if value is not None:
+            return value, False
+        with self._lock:
+            if name in self.views:
+                return self.views[name], False
+            previous = (self._parent_views or {}).get(name)
+            if derive is not None and previous is not None and self.changed_rows is not None:
+                value = derive(previous, self)
+            else:
+                value = build()
+            self.views[name] = value
+            return value, True
+
+class SharedCaseDataset:
+    """Process-wide holder of the current case snapshot, kept in step with the case store.
+
+    Sessions bind to current() at the start of each run and keep that reference for the run,
+    so a version published meanwhile never changes data under a page half-way through. Writers
+    either publish the frame they just saved or leave it to the next reader, which notices the
+    store revision moved (a background sync) and loads the new table once for everybody."""
+
+    def __init__(self, store, empty):
+        self.store = store
+        self.empty = empty
+        self.lock = threading.RLock()
+        self._snapshot = CaseSnapshot(-1, empty)
+
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot.version == self.store.revision:
+            return snapshot
+        with self.lock:
+            with self.store.lock:
+                revision = self.store.revision
+                if self._snapshot.version == revision:
+                    return self._snapshot
+                cases = self.store.load_cases()
+            return self._publish(cases if cases is not None else self.empty, revision)
+
+    def publish(self, cases, revision):
+        """Make cases (as saved by the store at revision) the current version; it must not be modified afterwards."""
+        with self.lock:
+            if revision <= self._snapshot.version:
+                return self._snapshot
+            return self._publish(cases, revision)
+
+    def _publish(self, cases, revision):
+        previous = self._snapshot
+        changed = _changed_rows(previous.cases, cases)
+        if changed is None:
+            snapshot = CaseSnapshot(revision, cases)
+        elif not len(changed):
+            # Same content (e.g. a sync that found nothing new): keep the built views as they are
+            snapshot = CaseSnapshot(revision, cases)
+            snapshot.views = dict(previous.views)
+        else:
+            snapshot = CaseSnapshot(revision, cases, previous.views, changed, previous.cases.iloc[changed])
+        # Only one generation of views is kept for patching; older ones go with their last reader
+        previous._parent_views = None
+        self._snapshot = snapshot
+        return snapshot
+
+def _changed_rows(old, new):
+    """Positions of rows that differ between two frames of the same cases, or None if the
+    row layout changed (other cases, order or columns) and nothing can be carried over."""
+    if (list(old.columns) != list(new.columns) or len(old) != len(new) or not len(new)
+            or not (old["cino"].to_numpy() == new["cino"].to_numpy()).all()):
+        return None
+    try:
+        old_hash = pd.util.hash_pandas_object(old, index=False).to_numpy()
+        new_hash = pd.util.hash_pandas_object(new, index=False).to_numpy()
+    except TypeError:
+        return None
+    return np.flatnonzero(old_hash != new_hash)
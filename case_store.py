@@ -0,0 +1,679 @@
+import datetime
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from case_core import DATE_COLUMNS, CaseIndex, compact_cases, to_dates
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS case_patches (
+    cino TEXT NOT NULL, col TEXT NOT NULL, value TEXT,
+    PRIMARY KEY (cino, col)
+);
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY, cino TEXT NOT NULL, date TEXT, text TEXT
+);
+CREATE INDEX IF NOT EXISTS notes_cino ON notes (cino);
+CREATE TABLE IF NOT EXISTS dossiers (cino TEXT PRIMARY KEY, timeline TEXT);
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY, cino TEXT NOT NULL, doc_type TEXT,
+    custom_doc_name TEXT, original_file_name TEXT, path TEXT,
+    sha256 TEXT, size INTEGER, case_label TEXT, search_key TEXT
+);
+CREATE INDEX IF NOT EXISTS papers_cino ON papers (cino, doc_type);
+CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER);
+CREATE TABLE IF NOT EXISTS pins (cino TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS reminders (id INTEGER PRIMARY KEY, text TEXT, due TEXT);
+CREATE TABLE IF NOT EXISTS billing (
+    id INTEGER PRIMARY KEY, "case" TEXT, date TEXT, service_type TEXT, description TEXT,
+    fee_type TEXT, amount REAL, time_spent REAL
+);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS backups (
+    id TEXT PRIMARY KEY, parent TEXT, kind TEXT, created TEXT, columns TEXT, table_hashes TEXT
+);
+"""
+
+BILLING_FIELDS = ["case", "date", "service_type", "description", "fee_type", "amount", "time_spent"]
+BACKUP_FORMAT = "casepilot-backup/1"
+# Side tables in a backup; dict tables are written as [key, value] lines, the rest one item per line
+BACKUP_TABLES = ["case_notes", "case_papers", "case_dossiers", "pinned_cases", "reminders",
+                 "billing_entries", "settings"]
+BACKUP_DICT_TABLES = {"case_notes", "case_papers", "case_dossiers", "settings"}
+BACKUP_BATCH_ROWS = 10000
+POSITION_COLUMN = "__position__"
+PAPER_FIELDS = ["doc_type", "custom_doc_name", "original_file_name", "path",
+                "sha256", "size", "case_label", "search_key"]
+
+def _json_default(value):
+    if value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, set):
+        return sorted(value)
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+def _to_date(value):
+    if isinstance(value, str) and value:
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+class CaseStore:
+    """On-disk home of the app's data.
+
+    The case table is an Arrow IPC snapshot that is memory-mapped on open. Sync writes land
+    as per-cell patches in SQLite and are folded into a new snapshot once they pile up.
+    Notes, papers, pins, reminders, billing and settings are SQLite rows written one change
+    at a time."""
+
+    def __init__(self, root, compact_ratio=0.25, min_compact=1000):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.cases_path = os.path.join(root, "cases.arrow")
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self.docs_dir = os.path.join(root, "documents")
+        self.backup_rows_path = os.path.join(root, "backup_rows.arrow")
+        self.lock = threading.RLock()
+        # Archives are built off the script thread, when the browser asks for the download;
+        # one at a time, so each incremental names the one before it as its parent
+        self.backup_lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, "casepilot.db"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self._migrate()
+        self.fts = self._create_fts()
+        self._backfill_search_keys()
+
+    @property
+    def revision(self):
+        """Bumped on every case-table write, so sessions (and the app, when the CLI or another
+        process wrote) can tell the table changed. Kept in the db rather than in memory."""
+        return self._meta("revision")
+
+    @property
+    def billing_revision(self):
+        """Bumped on every write to the billing table."""
+        return self._meta("billing")
+
+    def _meta(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump(self, key):
+        # Runs inside the transaction of the write it stands for
+        self.db.execute("INSERT INTO meta (key, value) VALUES (?, 1) "
+                        "ON CONFLICT (key) DO UPDATE SET value = value + 1", (key,))
+        return self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _migrate(self):
+        # Stores created before the document index lack its columns
+        existing = {row[1] for row in self.db.execute("PRAGMA table_info(papers)")}
+        for col, decl in [("sha256", "TEXT"), ("size", "INTEGER"), ("case_label", "TEXT"), ("search_key", "TEXT")]:
+            if col not in existing:
+                self.db.execute(f"ALTER TABLE papers ADD COLUMN {col} {decl}")
+
+    def _create_fts(self):
+        # Trigram full-text index over paper search keys; older SQLite builds fall back to LIKE
+        try:
+            with self.db:
+                self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts "
+                                "USING fts5(search_key, tokenize='trigram')")
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def _backfill_search_keys(self):
+        # Papers filed before the index existed get their key (and FTS row) on first open
+        with self.lock, self.db:
+            rows = self.db.execute(f"SELECT id, cino, {', '.join(PAPER_FIELDS)} FROM papers "
+                                   "WHERE search_key IS NULL").fetchall()
+            for row in rows:
+                key = paper_search_key(row[1], dict(zip(PAPER_FIELDS, row[2:])))
+                self.db.execute("UPDATE papers SET search_key = ? WHERE id = ?", (key, row[0]))
+                if self.fts:
+                    self.db.execute("INSERT INTO papers_fts (rowid, search_key) VALUES (?, ?)", (row[0], key))
+
+    # ----- Case table -----
+    def load_cases(self):
+        if not os.path.exists(self.cases_path):
+            return None
+        with self.lock:
+            with pa.memory_map(self.cases_path, "r") as source:
+                df = pa.ipc.open_file(source).read_all().to_pandas()
+            patches = self.db.execute("SELECT cino, col, value FROM case_patches").fetchall()
+        if patches:
+            _apply_patches(df, patches)
+        return compact_cases(df)
+
+    def _write_snapshot(self, df):
+        table = _to_arrow(df)
+        tmp = self.cases_path + ".tmp"
+        with self.lock:
+            feather.write_feather(table, tmp, compression="uncompressed")
+            os.replace(tmp, self.cases_path)
+            with self.db:
+                self.db.execute("DELETE FROM case_patches")
+
+    def save_cases(self, df):
+        """Replace the case table; returns the new revision."""
+        with self.lock:
+            self._write_snapshot(df)
+            with self.db:
+                return self._bump("revision")
+
+    def patch_cases(self, df, changes):
+        """Record {cino: {column: new value}}; df is the already-updated frame, used to compact.
+
+        Returns the new revision."""
+        rows = [(cino, col, _dumps(value)) for cino, cols in changes.items() for col, value in cols.items()]
+        with self.lock:
+            if not rows:
+                return self.revision
+            with self.db:
+                self.db.executemany(
+                    "INSERT INTO case_patches (cino, col, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (cino, col) DO UPDATE SET value = excluded.value", rows)
+            pending = self.db.execute("SELECT COUNT(*) FROM case_patches").fetchone()[0]
+            if pending >= max(self.min_compact, int(len(df) * self.compact_ratio)):
+                self._write_snapshot(df)
+            with self.db:
+                return self._bump("revision")
+
+    # ----- Side tables -----
+    def load_state(self):
+        """Everything except the case table, shaped like the matching st.session_state entries."""
+        with self.lock:
+            q = self.db.execute
+            notes = {}
+            for cino, date, text in q("SELECT cino, date, text FROM notes ORDER BY id"):
+                notes.setdefault(cino, []).append({"date": date, "text": text})
+            papers = {}
+            for row in q(f"SELECT cino, {', '.join(PAPER_FIELDS)} FROM papers ORDER BY id"):
+                papers.setdefault(row[0], []).append(dict(zip(PAPER_FIELDS, row[1:])))
+            dossiers = {cino: json.loads(timeline) for cino, timeline in q("SELECT cino, timeline FROM dossiers")}
+            pins = {cino for (cino,) in q("SELECT cino FROM pins")}
+            reminders = [{"text": text, "due": _to_date(due)}
+                         for text, due in q("SELECT text, due FROM reminders ORDER BY id")]
+            billing = [dict(zip(BILLING_FIELDS, row)) for row in
+                       q('SELECT "case", date, service_type, description, fee_type, amount, time_spent '
+                         "FROM billing ORDER BY id")]
+            settings = {key: json.loads(value) for key, value in q("SELECT key, value FROM settings")}
+        return {
+            "case_notes": notes,
+            "case_papers": papers,
+            "case_dossiers": dossiers,
+            "pinned_cases": pins,
+            "reminders": reminders,
+            "billing_entries": billing,
+            "settings": settings,
+        }
+
+    def add_note(self, cino, note):
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO notes (cino, date, text) VALUES (?, ?, ?)",
+                            (cino, note["date"], note["text"]))
+
+    def add_paper(self, cino, doc):
+        doc = dict(doc, search_key=doc.get("search_key") or paper_search_key(cino, doc))
+        with self.lock, self.db:
+            cur = self.db.execute(
+                f"INSERT INTO papers (cino, {', '.join(PAPER_FIELDS)}) VALUES ({', '.join('?' * (len(PAPER_FIELDS) + 1))})",
+                (cino, *[doc.get(f) for f in PAPER_FIELDS]))
+            if self.fts:
+                self.db.execute("INSERT INTO papers_fts (rowid, search_key) VALUES (?, ?)",
+                                (cur.lastrowid, doc["search_key"]))
+        return doc
+
+    def has_paper(self, cino, doc_type, sha256):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM papers WHERE cino = ? AND doc_type = ? AND sha256 = ?",
+                                   (cino, doc_type, sha256)).fetchone() is not None
+
+    def search_papers(self, term):
+        """[(cino, doc)] whose search key contains term, in upload order."""
+        term = term.strip().lower()
+        cols = f"p.cino, {', '.join('p.' + f for f in PAPER_FIELDS)}"
+        with self.lock:
+            if not term:
+                rows = self.db.execute(f"SELECT {cols} FROM papers p ORDER BY p.id").fetchall()
+            elif self.fts and len(term) >= 3:
+                rows = self.db.execute(
+                    f"SELECT {cols} FROM papers_fts f JOIN papers p ON p.id = f.rowid "
+                    "WHERE papers_fts MATCH ? ORDER BY p.id", ('"' + term.replace('"', '""') + '"',)).fetchall()
+            else:
+                pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                rows = self.db.execute(f"SELECT {cols} FROM papers p WHERE p.search_key LIKE ? ESCAPE '\\' "
+                                       "ORDER BY p.id", (pattern,)).fetchall()
+        return [(row[0], dict(zip(PAPER_FIELDS, row[1:]))) for row in rows]
+
+    def put_document(self, fileobj, original_name="", chunk_size=1 << 20):
+        """Stream an upload into the content-addressed document folder.
+
+        Returns (sha256, size, path, created); identical content is stored once."""
+        os.makedirs(self.docs_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.docs_dir, suffix=".part")
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        sha = digest.hexdigest()
+        with self.lock:
+            row = self.db.execute("SELECT path FROM blobs WHERE sha256 = ?", (sha,)).fetchone()
+            if row and os.path.exists(row[0]):
+                os.remove(tmp)
+                return sha, size, row[0], False
+            ext = os.path.splitext(original_name)[1].lower()
+            path = os.path.join(self.docs_dir, sha[:2], sha + ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp, path)
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO blobs (sha256, path, size) VALUES (?, ?, ?)",
+                                (sha, path, size))
+        return sha, size, path, True
+
+    def set_pins(self, pins):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM pins")
+            self.db.executemany("INSERT INTO pins (cino) VALUES (?)", [(c,) for c in pins])
+
+    def add_reminder(self, reminder):
+        due = reminder["due"]
+        if isinstance(due, datetime.date):
+            due = due.isoformat()
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO reminders (text, due) VALUES (?, ?)", (reminder["text"], due))
+
+    def load_billing(self):
+        """The billing table as a frame (id plus BILLING_FIELDS), in the order entries were written."""
+        with self.lock:
+            rows = self.db.execute(f"SELECT id, {', '.join(map(_quote, BILLING_FIELDS))} FROM billing ORDER BY id").fetchall()
+        return pd.DataFrame(rows, columns=["id", *BILLING_FIELDS])
+
+    def add_billing_entry(self, entry):
+        """Returns (entry id, billing revision)."""
+        with self.lock, self.db:
+            entry_id = self.db.execute(
+                f"INSERT INTO billing ({', '.join(map(_quote, BILLING_FIELDS))}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [_plain(entry.get(f)) for f in BILLING_FIELDS]).lastrowid
+            return entry_id, self._bump("billing")
+
+    def update_billing_entries(self, changes):
+        """Apply {entry id: {field: new value}}; returns the billing revision."""
+        with self.lock, self.db:
+            for entry_id, fields in changes.items():
+                fields = {f: v for f, v in fields.items() if f in BILLING_FIELDS}
+                if fields:
+                    self.db.execute(f"UPDATE billing SET {', '.join(f'{_quote(f)} = ?' for f in fields)} WHERE id = ?",
+                                    [*map(_plain, fields.values()), entry_id])
+            return self._bump("billing")
+
+    def delete_billing_entries(self, ids):
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM billing WHERE id = ?", [(i,) for i in ids])
+            return self._bump("billing")
+
+    def replace_billing(self, entries):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM billing")
+            self.db.executemany(f"INSERT INTO billing ({', '.join(map(_quote, BILLING_FIELDS))}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                [[_plain(e.get(f)) for f in BILLING_FIELDS] for e in entries])
+            return self._bump("billing")
+
+    def get_setting(self, key, default=None):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_setting(self, key, value):
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO settings (key, value) VALUES (?, ?) "
+                            "ON CONFLICT (key) DO UPDATE SET value = excluded.value", (key, _dumps(value)))
+
+    def import_state(self, cases, state):
+        """Replace the whole store, e.g. from a JSON backup."""
+        if cases is not None:
+            self.save_cases(cases)
+        with self.lock, self.db:
+            for table in ("notes", "papers", "dossiers", "pins", "reminders", "billing"):
+                self.db.execute(f"DELETE FROM {table}")
+            if self.fts:
+                self.db.execute("DELETE FROM papers_fts")
+        for cino, notes in state.get("case_notes", {}).items():
+            for note in notes:
+                self.add_note(cino, note)
+        labels = {}
+        if cases is not None and not cases.empty:
+            labels = dict(zip(cases["cino"], case_labels(cases)))
+        for cino, docs in state.get("case_papers", {}).items():
+            for doc in docs:
+                self.add_paper(cino, dict(doc, case_label=doc.get("case_label") or labels.get(cino)))
+        with self.lock, self.db:
+            self.db.executemany("INSERT INTO dossiers (cino, timeline) VALUES (?, ?)",
+                                [(c, _dumps(t)) for c, t in state.get("case_dossiers", {}).items()])
+        self.set_pins(state.get("pinned_cases", []))
+        for reminder in state.get("reminders", []):
+            self.add_reminder(reminder)
+        self.replace_billing(state.get("billing_entries", []))
+        for key, value in state.get("settings", {}).items():
+            self.set_setting(key, value)
+
+    # ----- Backups -----
+    def backup_baseline(self):
+        """The last backup taken from (or restored into) this store, with its row hashes, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT id, columns, table_hashes FROM backups "
+                                  "ORDER BY rowid DESC LIMIT 1").fetchone()
+            if row is None or not os.path.exists(self.backup_rows_path):
+                return None
+            with pa.memory_map(self.backup_rows_path, "r") as source:
+                rows = pa.ipc.open_file(source).read_all()
+        return {
+            "id": row[0],
+            "columns": json.loads(row[1]),
+            "table_hashes": json.loads(row[2]),
+            "cinos": rows.column("cino").to_numpy(zero_copy_only=False),
+            "hashes": rows.column("hash").to_numpy(),
+        }
+
+    def backup_kind(self, cases, incremental=True):
+        """"incremental" or "full": what write_backup would produce for cases right now."""
+        base = self.backup_baseline() if incremental else None
+        return "incremental" if base is not None and _extends(base, cases) else "full"
+
+    def _record_backup(self, manifest, cases, hashes, table_hashes):
+        rows = pa.table({"cino": pa.array(cases["cino"].astype(object).tolist(), pa.string()),
+                         "hash": pa.array(hashes, pa.uint64())})
+        tmp = self.backup_rows_path + ".tmp"
+        with self.lock:
+            feather.write_feather(rows, tmp, compression="uncompressed")
+            os.replace(tmp, self.backup_rows_path)
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO backups (id, parent, kind, created, columns, table_hashes) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                (manifest["id"], manifest["parent"], manifest["kind"], manifest["created"],
+                                 json.dumps(manifest["columns"]), json.dumps(table_hashes)))
+
+    def write_backup(self, fileobj, cases, incremental=True):
+        """Write a backup archive of the case table and side tables to fileobj; returns its manifest.
+
+        The archive is a ZIP holding the cases as a zstd-compressed Arrow stream, one JSON-lines
+        member per side table and a manifest with the SHA-256 of every member. An incremental
+        backup holds only the case rows and side tables that changed since the previous backup
+        of this store and names that backup as its parent; it falls back to a full one when
+        there is no previous backup or the table was replaced rather than edited.
+
+        The backup becomes the baseline for the next incremental once the archive is complete,
+        so only call this when the archive is about to be handed over."""
+        with self.backup_lock:
+            return self._write_backup(fileobj, cases, incremental)
+
+    def _write_backup(self, fileobj, cases, incremental):
+        hashes = _row_hashes(cases)
+        state = self.load_state()
+        tables = {name: _table_lines(name, state[name]) for name in BACKUP_TABLES}
+        table_hashes = {name: hashlib.sha256(b"".join(lines)).hexdigest() for name, lines in tables.items()}
+
+        base = self.backup_baseline() if incremental else None
+        positions = np.arange(len(cases))
+        if base is not None and _extends(base, cases):
+            n = len(base["cinos"])
+            positions = np.concatenate([np.flatnonzero(hashes[:n] != base["hashes"]), np.arange(n, len(cases))])
+        else:
+            base = None
+        changed = [name for name in BACKUP_TABLES
+                   if base is None or base["table_hashes"].get(name) != table_hashes[name]]
+
+        manifest = {
+            "format": BACKUP_FORMAT,
+            "id": uuid.uuid4().hex,
+            "parent": base["id"] if base else None,
+            "kind": "incremental" if base else "full",
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "columns": [str(c) for c in cases.columns],
+            "rows": len(cases),
+            "case_rows": len(positions),
+            "tables": changed,
+            "members": {},
+        }
+        with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as archive:
+            # The Arrow stream is compressed already, so it is stored as is
+            info = zipfile.ZipInfo("cases.arrow", datetime.datetime.now().timetuple()[:6])
+            with archive.open(info, "w") as member:
+                out = _HashingFile(member)
+                rows = _to_arrow(cases.iloc[positions].assign(**{POSITION_COLUMN: positions}))
+                with pa.ipc.new_stream(out, rows.schema,
+                                       options=pa.ipc.IpcWriteOptions(compression="zstd")) as writer:
+                    for batch in rows.to_batches(BACKUP_BATCH_ROWS):
+                        writer.write_batch(batch)
+                manifest["members"]["cases.arrow"] = out.digest()
+            for name in changed:
+                path = f"tables/{name}.jsonl"
+                with archive.open(path, "w") as member:
+                    out = _HashingFile(member)
+                    for line in tables[name]:
+                        out.write(line)
+                    manifest["members"][path] = out.digest()
+            archive.writestr("manifest.json", json.dumps(manifest, indent=1))
+        self._record_backup(manifest, cases, hashes, table_hashes)
+        return manifest
+
+    def restore_backup(self, files):
+        """Replace the store with a full backup plus any incrementals taken after it, in one go.
+
+        Members are decoded straight from the archives while their checksums are computed, and
+        nothing is written to the store until every member has been verified. Raises ValueError
+        for a broken chain or a checksum mismatch. Returns the restored case table."""
+        archives = [zipfile.ZipFile(f) for f in files]
+        try:
+            chain = _backup_chain([(a, json.loads(a.read("manifest.json"))) for a in archives])
+            cases, state = None, {}
+            for archive, manifest in chain:
+                rows = _read_member(archive, manifest, "cases.arrow",
+                                    lambda member: pa.ipc.open_stream(member).read_pandas())
+                positions = rows.pop(POSITION_COLUMN).to_numpy()
+                cases = rows if cases is None else _merge_rows(cases, positions, rows)
+                for name in manifest["tables"]:
+                    state[name] = _read_member(archive, manifest, f"tables/{name}.jsonl",
+                                               lambda member, name=name: _read_table(name, member))
+        finally:
+            for archive in archives:
+                archive.close()
+        cases = compact_cases(cases)
+        self.import_state(cases, state)
+        tables = {name: _table_lines(name, value) for name, value in self.load_state().items()}
+        self._record_backup(chain[-1][1], cases, _row_hashes(cases),
+                            {name: hashlib.sha256(b"".join(tables[name])).hexdigest() for name in BACKUP_TABLES})
+        return cases
+
+def case_labels(df):
+    """"cino - type - reg_no/reg_year - parties" for every row, as shown in the case pickers."""
+    reg_no_year = (df["reg_no"].astype("string") + "/" + df["reg_year"].astype("string")).fillna("N/A")
+    parties = (df["petparty_name"].astype("string").fillna("") + " v. "
+               + df["resparty_name"].astype("string").fillna("")).str.strip()
+    return (df["cino"].astype("string").fillna("") + " - " + df["type_name"].astype("string").fillna("N/A")
+            + " - " + reg_no_year + " - " + parties).tolist()
+
+def paper_search_key(cino, doc):
+    parts = [cino, doc.get("case_label"), doc.get("custom_doc_name"),
+             doc.get("original_file_name"), doc.get("doc_type")]
+    return " ".join(str(p) for p in parts if p).lower()
+
+def _quote(name):
+    return f'"{name}"'
+
+def _plain(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+def _to_arrow(df):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Frames restored from JSON can carry mixed-type object columns; store those as text
+        df = df.copy()
+        for c in df.columns:
+            if df[c].dtype == object:
+                if c in DATE_COLUMNS:
+                    df[c] = to_dates(df[c])
+                else:
+                    df[c] = df[c].map(lambda v: None if v is None or v != v else str(v))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+def _apply_patches(df, patches):
+    index = CaseIndex(df["cino"])
+    by_col = {}
+    for cino, col, value in patches:
+        pos = index.position(cino)
+        if pos is not None and col in df.columns:
+            value = json.loads(value)
+            by_col.setdefault(col, ([], []))
+            by_col[col][0].append(pos)
+            by_col[col][1].append(value)
+    for col, (pos, values) in by_col.items():
+        if col in DATE_COLUMNS:
+            values = to_dates(values)
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            new = pd.Index(values).difference(df[col].cat.categories).dropna()
+            if len(new):
+                df[col] = df[col].cat.add_categories(new)
+        df.iloc[pos, df.columns.get_loc(col)] = values
+
+class _HashingFile(io.RawIOBase):
+    """Passes reads and writes through to raw while computing their SHA-256."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha = hashlib.sha256()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        buffer[:len(data)] = data
+        self.sha.update(data)
+        self.size += len(data)
+        return len(data)
+
+    def write(self, data):
+        self.sha.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def digest(self):
+        return {"sha256": self.sha.hexdigest(), "size": self.size}
+
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def _extends(base, cases):
+    # Incremental backups address rows by position, so the earlier rows must still be the same cases
+    n = len(base["cinos"])
+    return (base["columns"] == [str(c) for c in cases.columns] and len(cases) >= n
+            and np.array_equal(cases["cino"].astype(object).to_numpy()[:n], base["cinos"].astype(object)))
+
+def _table_lines(name, value):
+    if name in BACKUP_DICT_TABLES:
+        items = ([k, v] for k, v in value.items())
+    elif name == "pinned_cases":
+        items = sorted(value)
+    else:
+        items = value
+    return [_dumps(item).encode("utf-8") + b"\n" for item in items]
+
+def _read_table(name, member):
+    items = (json.loads(line) for line in io.BufferedReader(member) if line.strip())
+    if name in BACKUP_DICT_TABLES:
+        return dict(items)
+    if name == "pinned_cases":
+        return set(items)
+    return list(items)
+
+def _read_member(archive, manifest, path, decode):
+    expected = manifest["members"].get(path)
+    if expected is None:
+        raise ValueError(f"Backup {manifest['id']} has no {path}")
+    with archive.open(path) as raw:
+        member = _HashingFile(raw)
+        value = decode(member)
+        while member.read(1 << 16):
+            pass
+    if member.sha.hexdigest() != expected["sha256"]:
+        raise ValueError(f"Backup {manifest['id']}: checksum mismatch in {path}")
+    return value
+
+def _backup_chain(items):
+    # Order archives full backup first, then each incremental after its parent
+    for _, manifest in items:
+        if manifest.get("format") != BACKUP_FORMAT:
+            raise ValueError("Not a Case Pilot backup archive")
+    fulls = [item for item in items if item[1]["kind"] == "full"]
+    if len(fulls) != 1:
+        raise ValueError("Select exactly one full backup, plus any incremental backups taken after it")
+    children = {item[1]["parent"]: item for item in items if item[1]["kind"] == "incremental"}
+    chain = [fulls[0]]
+    while chain[-1][1]["id"] in children:
+        chain.append(children.pop(chain[-1][1]["id"]))
+    if len(chain) != len(items):
+        raise ValueError("Some incremental backups do not follow on from the selected full backup")
+    return chain
+
+def _merge_rows(cases, positions, rows):
+    # Rows at existing positions replace them; the rest were appended after the parent backup
+    updated = positions < len(cases)
+    if updated.any():
+        cases = cases.copy()
+        for col in cases.columns:
+            values = rows.loc[updated, col]
+            if isinstance(cases[col].dtype, pd.CategoricalDtype):
+                new = pd.Index(values.dropna().unique()).difference(cases[col].cat.categories)
+                if len(new):
+                    cases[col] = cases[col].cat.add_categories(new)
+                values = values.astype(object)
+            cases.iloc[positions[updated], cases.columns.get_loc(col)] = values.to_numpy()
+    if not updated.all():
+        categorical = [c for c in cases.columns if isinstance(cases[c].dtype, pd.CategoricalDtype)]
+        cases = pd.concat([cases, rows[~updated]], ignore_index=True)
+        for col in categorical:
+            if not isinstance(cases[col].dtype, pd.CategoricalDtype):
+                cases[col] = cases[col].astype("category")
+    return cases
@@ -1,29 +1,44 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import datetime
-import pytz
-from dateutil import parser
-import requests, json, time
+import json
 from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font
-from openpyxl.utils import get_column_letter
-import matplotlib.pyplot as plt
 import os
-from fpdf import FPDF
-
-from openpyxl import load_workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-
-APP_NAME = "Case Pilot"
-APP_SUB = "A Case Management Tool Developed and Created by JAY KISHAN SHARMA"
-API_URL = "https://eciapi.akshit.me"
-REQUIRED_COLUMNS = [
-    "cino","type_name","case_no","reg_no","reg_year",
-    "petparty_name","resparty_name","date_last_list","date_next_list",
-    "purpose_name","disp_name","establishment_name","court_no_desg_name"
+import uuid
+import zipfile
+
+from billing_ledger import BILLING_PAGE_SIZE, BillingLedger, build_invoice_excel, build_period_excel
+from calendar_export import (
+    CalendarCache, calendar_file_name, calendar_groups, calendar_name, calendar_window, write_calendar,
+)
+from case_analytics import CaseAggregates, aggregate_keys
+from case_core import (
+    APP_NAME, APP_SUB, API_URL, CASE_STORE_DIR, CAUSE_LIST_CATEGORIES, CAUSE_LIST_COLUMNS, REQUIRED_COLUMNS,
+    CaseIndex, HearingDateIndex, categorize_cases, compact_cases, prepare_display_df, read_case_export,
+    read_config,
+)
+from case_core import cause_list_jobs as build_cause_list_jobs
+from case_dataset import SharedCaseDataset
+from case_store import CaseStore, case_labels
+from cause_list_export import build_cause_list_excel, build_export_bundle, render_cause_list_pdf
+from diagnostics import PROFILER, result_rows, timed
+from search_index import SEARCH_MODES, CaseSearchIndex
+from scheduler import JobScheduler
+from sync_engine import ResponseCache, SyncEngine
+
+PERSISTED_SETTINGS = [
+    "theme", "auto_sync_time", "api_key", "service_types", "causelist_columns", "last_sync_date"
 ]
+# Big tables are sent to the browser a page at a time; sort keys are display columns (dates sort by the date)
+TABLE_PAGE_SIZE = 100
+TABLE_SORTS = {
+    "Next Date": "date_next_list", "Previous Date": "date_last_list", "Court Hall": "court_no_desg_name",
+    "Case Number/Year": "Case Number/Year", "Parties": "Parties", "Stage Today": "Stage Today",
+    "Category": "Category", "CNR": "cino",
+}
+CASE_PICKER_MATCHES = 25
+BILLING_TOTALS = {"Month": "month", "Category": "service_type", "Fee Type": "fee_type", "Case": "case"}
 DEFAULT_CAUSELIST_COLUMNS = [
     "Previous Date",
     "court_no_desg_name",
@@ -44,7 +59,6 @@ defaults = {
     "theme": "Dark",
     "auto_sync_time": datetime.time(17, 0),
     "api_key": "ECIAPI-xxxxxxxxxxxxxxxxxxxxxxxx",
-    "billing_entries": [],
     "service_types": [
         "Hearing/Appearing Charges",
         "Witness Preparation Charges",
@@ -56,10 +70,19 @@ defaults = {
         "Other"
     ],
     "causelist_columns": DEFAULT_CAUSELIST_COLUMNS.copy(),
+    "cases_version": 0,
+    "_store_loaded": False,
+    "_loaded_upload": None,
+    "_restored_upload": None,
+    "_snapshot": None,
+    "_session_id": uuid.uuid4().hex[:8],
+    "_view_cache_stats": {"hits": 0, "misses": 0},
+    "_export_cache": {},
 }
-for k, v in defaults.items():
-    if k not in st.session_state:
-        st.session_state[k] = v
+def init_session_state():
+    for k, v in defaults.items():
+        if k not in st.session_state:
+            st.session_state[k] = v
 
 def apply_theme():
     st.markdown(f'''
@@ -80,300 +103,330 @@ def apply_theme():
 def today():
     return datetime.date.today()
 
+@st.cache_resource
+def get_store():
+    return CaseStore(CASE_STORE_DIR)
+
+@st.cache_resource
+def get_ledger():
+    return BillingLedger(get_store())
+
+def _setting_from_store(key, value):
+    if key == "auto_sync_time" and value:
+        return datetime.time.fromisoformat(value)
+    if key == "last_sync_date" and value:
+        return datetime.date.fromisoformat(value)
+    return value
+
+def warm_start():
+    # A fresh session picks up whatever the store already holds instead of starting empty
+    store = get_store()
+    state = store.load_state()
+    for key in ["case_notes", "case_papers", "case_dossiers", "pinned_cases", "reminders"]:
+        st.session_state[key] = state[key]
+    for key, value in state["settings"].items():
+        if key in PERSISTED_SETTINGS:
+            st.session_state[key] = _setting_from_store(key, value)
+
+def persist_setting(key):
+    get_store().set_setting(key, st.session_state[key])
+
+@st.cache_resource
+def get_dataset():
+    return SharedCaseDataset(get_store(), pd.DataFrame(columns=REQUIRED_COLUMNS))
+
+def bind_cases():
+    # Every run reads one published version of the shared case table; sessions hold a reference, not a copy.
+    # What is per person (pins, notes, settings, widget state) stays in the session as a small overlay.
+    snapshot = get_dataset().current()
+    st.session_state._snapshot = snapshot
+    st.session_state.cases = snapshot.cases
+    st.session_state.cases_version = snapshot.version
+
+def set_cases(df, revision=None):
+    # Every replacement of the case table is saved to the store and published to all sessions as a new
+    # version; pass revision when the store already holds df. df must not be modified afterwards.
+    if revision is None:
+        revision = get_store().save_cases(df)
+    get_dataset().publish(df, revision)
+    bind_cases()
+
+def _moved_dates(index, snapshot):
+    index = index.copy()
+    old = snapshot.previous_rows["date_next_list"].to_numpy()
+    new = snapshot.cases["date_next_list"].to_numpy()[snapshot.changed_rows]
+    for pos, o, n in zip(snapshot.changed_rows, old, new):
+        index.move(pos, o, n)
+    return index
+
+def _updated_search(index, snapshot):
+    index = index.copy()
+    index.update(snapshot.cases, snapshot.changed_rows)
+    return index
+
+def date_index():
+    # After a sync only the changed rows are re-filed, in a copy of the previous version's index
+    return cached_view("date_index", lambda: HearingDateIndex(st.session_state.cases["date_next_list"]), _moved_dates)
+
+def case_index():
+    # A sync never changes which CNR sits in which row, so the previous version's index carries over
+    return cached_view("case_index", lambda: CaseIndex(st.session_state.cases["cino"]), lambda index, snapshot: index)
+
+def search_index():
+    return cached_view("search_index", lambda: CaseSearchIndex(st.session_state.cases), _updated_search)
+
+@timed(rows=result_rows)
 def get_cases_on(d):
-    return st.session_state.cases[st.session_state.cases["date_next_list"] == d]
+    return st.session_state.cases.iloc[date_index().on(d)]
+
+def get_cases_between(start, end):
+    return st.session_state.cases.iloc[date_index().between(start, end)]
 
+@timed(rows=result_rows)
 def filter_next_30(keyword=None):
     start, end = today(), today() + datetime.timedelta(days=30)
-    df = st.session_state.cases[
-        (st.session_state.cases["date_next_list"] >= start) &
-        (st.session_state.cases["date_next_list"] <= end)
-    ]
+    df = get_cases_between(start, end)
     if keyword:
         df = df[df["purpose_name"].str.lower().str.contains(keyword, na=False)]
-    out = prepare_display_df(df)
+    out = display_rows(df)
     cols = ["Next Date", "Case Number/Year", "Parties", "Stage Today", "Category"]
     existing = [c for c in cols if c in out.columns]
     return out[existing]
 
-def assign_category(row):
-    court_str = f"{row.get('establishment_name','')} {row.get('court_no_desg_name','')}".lower()
-    case_str = f"{row.get('case_no','')} {row.get('reg_no','')} {row.get('type_name','')}".lower()
-
-    case_type = str(row.get('type_name', '')).lower()
-    case_no_full = f"{row.get('case_no','')} {row.get('reg_no','')}".lower()
+def cached_view(name, build, derive=None):
+    # Views derived from the case table are built once per dataset version and shared by all sessions
+    value, built = st.session_state._snapshot.view(name, build, derive)
+    st.session_state._view_cache_stats["misses" if built else "hits"] += 1
+    return value
+
+def view_cache_stats():
+    return dict(st.session_state._view_cache_stats, version=st.session_state.cases_version)
+
+def _updated_categories(categories, snapshot):
+    categories = categories.copy()
+    categories.iloc[snapshot.changed_rows] = categorize_cases(snapshot.cases.iloc[snapshot.changed_rows]).to_numpy()
+    return categories
+
+def case_categories():
+    return cached_view("categories", lambda: categorize_cases(st.session_state.cases), _updated_categories)
+
+def _updated_aggregates(aggregates, snapshot):
+    # A sync touches a handful of rows: take them out of their old buckets and into their new ones
+    old, new = snapshot.previous_rows, snapshot.cases.iloc[snapshot.changed_rows]
+    aggregates = aggregates.copy()
+    aggregates.apply(aggregate_keys(old, categorize_cases(old)), aggregate_keys(new, categorize_cases(new)))
+    return aggregates
+
+def case_aggregates():
+    return cached_view("aggregates", lambda: CaseAggregates(aggregate_keys(st.session_state.cases, case_categories())),
+                       _updated_aggregates)
+
+# Chart images are keyed by what they show, so every session and dataset version with the same
+# counts reuses one rendering instead of drawing a new matplotlib figure on each rerun
+@st.cache_data(max_entries=64, show_spinner=False)
+def bar_chart_png(labels, values, title=None):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    ax.bar(labels, values)
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha="right")
+    if title:
+        ax.set_title(title)
+    return _figure_png(fig)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def pie_chart_png(labels, values):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    ax.pie(values, labels=labels, autopct='%1.1f%%')
+    return _figure_png(fig)
+
+def _figure_png(fig):
+    import matplotlib.pyplot as plt
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+def _week_window(weeks_back=4, weeks_ahead=12):
+    monday = today() - datetime.timedelta(days=today().weekday())
+    return monday - datetime.timedelta(weeks=weeks_back), monday + datetime.timedelta(weeks=weeks_ahead)
+
+def display_cases():
+    return cached_view("display", lambda: prepare_display_df(st.session_state.cases, categories=case_categories()))
+
+def display_rows(df):
+    # df must be a row subset of st.session_state.cases; its display rows come from the cache
+    return display_cases().loc[df.index]
+
+def sort_rank(column):
+    # Each row's place when the whole table is sorted by column; a page sort is then one argsort
+    def build():
+        source = TABLE_SORTS[column]
+        if source in ("date_next_list", "date_last_list"):
+            values = pd.to_datetime(st.session_state.cases[source], errors="coerce")
+        else:
+            values = display_cases()[source].astype("string").str.lower().replace("", pd.NA)
+        # Blanks stay NaN, which argsort puts last in either direction
+        return values.rank(method="first").to_numpy()
+    return cached_view(f"sort:{column}", build)
+
+def paged_table(positions, key):
+    """Show the display rows at positions (into the case table) one page at a time.
+
+    Filtering, sorting and paging run here on the cached frame; only the page is sent to the browser."""
+    positions = np.asarray(positions, dtype=np.intp)
+    c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+    term = c1.text_input("Filter rows", key=f"{key}_filter")
+    sort = c2.selectbox("Sort by", ["Default order", *TABLE_SORTS], key=f"{key}_sort")
+    descending = c3.checkbox("Descending", key=f"{key}_desc")
+    if term.strip():
+        positions = positions[np.isin(positions, search_index().search(term))]
+    if sort != "Default order":
+        rank = sort_rank(sort)[positions]
+        positions = positions[np.argsort(-rank if descending else rank, kind="stable")]
+    elif descending:
+        positions = positions[::-1]
+    pages = max(1, -(-len(positions) // TABLE_PAGE_SIZE))
+    page = c4.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    start = (page - 1) * TABLE_PAGE_SIZE
+    window = positions[start:start + TABLE_PAGE_SIZE]
+    st.dataframe(display_cases().iloc[window], width="stretch")
+    st.caption(f"Rows {start + 1 if len(window) else 0}-{start + len(window)} of {len(positions)} (page {page} of {pages})")
+    return positions
+
+def case_picker(label, key, extra=()):
+    """Typeahead case picker: the query goes to the search index and only the best matches become
+    options, so the page never carries one option per case. Returns the chosen cino or extra value."""
+    query = st.text_input(label, key=f"{key}_query", placeholder="Type a CNR, case number, party or court")
+    options = list(extra)
+    if query.strip():
+        exact = case_index().position(query.strip().upper())
+        matches = search_index().search(query, "Prefix")[:CASE_PICKER_MATCHES]
+        if exact is not None:
+            matches = [exact, *(p for p in matches if p != exact)]
+        labels = cached_view("case_labels", lambda: case_labels(st.session_state.cases))
+        options += [labels[p] for p in matches]
+    current = st.session_state.get(key)
+    if current is not None and current not in options:
+        # Keep the current choice while the query changes
+        options.insert(len(extra), current)
+    if not options:
+        st.caption("No matching case.")
+        return None
+    choice = st.selectbox(f"{label} (matches)", options, key=key, label_visibility="collapsed")
+    return choice if choice in extra else choice.split(" - ")[0]
 
-    reg_no = row.get("reg_no")
+@timed()
+def load_cases(file, include_local=False):
     try:
-        case_number = int(reg_no) if reg_no is not None else None
-    except ValueError:
-        case_number = None
-
-    # ----- Threshold rules -----
-    if case_number is not None:
-        # CC / C.C / Crime cases
-        if any(x in case_type for x in ["cc", "c.c", "crime", "criminal case"]):
-            if case_number > 50000:
-                return "FC/MAYO/COM/CONS/DRT/OUT"
-            else:
-                return "ACMM/ACJM/MMTC"
-
-        # CRL.A / CRL.RP cases
-        if any(x in case_type for x in ["crl.a", "crl.rp", "crl.r.p"]):
-            if case_number > 20000:
-                return "FC/MAYO/COM/CONS/DRT/OUT"
-            else:
-                return "CCC/S/SCCH/MACT"
-
-        # S.C / SC cases
-        if case_type in ["s.c", "sc"]:
-            if case_number > 15000:
-                return "FC/MAYO/COM/CONS/DRT/OUT"
-            else:
-                return "CCC/S/SCCH/MACT"
-
-
-    if "mayo" in court_str or "mayohall" in court_str:
-        return "FC/MAYO/COM/CONS/DRT/OUT"
-
-    if ("commercial" in case_str or
-        any(x in case_str for x in ["com os","com.os","com ex","com.ex"]) or
-        case_str.startswith("com")):
-        return "FC/MAYO/COM/CONS/DRT/OUT"
+        bar = st.progress(0.0, text="Reading cases...")
+        df, stats = read_case_export(file, include_local=include_local,
+                                     on_progress=lambda frac: bar.progress(frac, text="Reading cases..."))
+        bar.empty()
+        set_cases(df)
+        st.success(f"Loaded {stats['rows']} cases.")
+        if stats["rejected"]:
+            st.warning(f"Skipped {stats['rejected']} unreadable record(s).")
+        if stats["bad_dates"]:
+            st.warning(f"{stats['bad_dates']} hearing date(s) could not be parsed.")
+        warn_duplicate_cnrs()
+    except Exception as e:
+        st.error(f"Failed loading cases: {e}")
 
-    if "magistrate" in court_str:
-        if "mayo" in court_str or "mayohall" in court_str:
-            return "FC/MAYO/COM/CONS/DRT/OUT"
-        return "ACMM/ACJM/MMTC"
+def warn_duplicate_cnrs():
+    duplicates = case_index().duplicates
+    if duplicates:
+        st.warning(f"{len(duplicates)} CNR(s) are listed more than once; pins, notes and details use the "
+                   f"first row of each: {', '.join(duplicates[:5])}{' ...' if len(duplicates) > 5 else ''}")
 
-    if any(x in court_str for x in ["city civil","sessions","small causes","scch","mact","rural"]):
-        return "CCC/S/SCCH/MACT"
+def lazy_download(label, key, build, file_name, mime):
+    # The file is built only when the download is clicked and reused until the cases change.
+    # The download runs off the script thread, so the cache dict and version are captured here.
+    exports = st.session_state._export_cache
+    version = st.session_state.cases_version
 
-    return "FC/MAYO/COM/CONS/DRT/OUT"
+    def data():
+        entry = exports.get(key)
+        if entry is None or entry[0] != version:
+            for stale in [k for k, (v, _) in exports.items() if v != version]:
+                exports.pop(stale, None)
+            entry = (version, build())
+            exports[key] = entry
+        return entry[1]
 
-def load_cases(file):
-    try:
-        raw = file.read().decode("utf-8")
-        data = json.loads(raw)
-        if isinstance(data, dict) and all(isinstance(v, dict) for v in data.values()):
-            data = list(data.values())
-        if data and all(isinstance(x, str) for x in data):
-            data = [json.loads(x) for x in data]
-        df = pd.DataFrame(data)
-        for c in REQUIRED_COLUMNS:
-            if c not in df.columns:
-                df[c] = None
-        for c in ["date_last_list", "date_next_list"]:
-            df[c] = pd.to_datetime(df[c], dayfirst=True, errors="coerce").dt.date
-        st.session_state.cases = df[REQUIRED_COLUMNS]
-        st.success(f"Loaded {len(df)} cases.")
-    except Exception as e:
-        st.error(f"Failed loading cases: {e}")
+    st.download_button(label, data=data, file_name=file_name, mime=mime, on_click="ignore")
 
-def prepare_display_df(df):
-    out = df.copy()
-    out["Previous Date"] = out["date_last_list"].apply(lambda x: x.strftime("%d.%m.%Y") if pd.notna(x) else "")
-    out["Next Date"] = out["date_next_list"].apply(lambda x: x.strftime("%d.%m.%Y") if pd.notna(x) else "")
-    out["Case Number/Year"] = out["reg_no"].astype(str) + "/" + out["reg_year"].astype(str)
-    out["Parties"] = out["petparty_name"].fillna("") + " v. " + out["resparty_name"].fillna("")
-    out["Stage Today"] = out["purpose_name"] if "purpose_name" in out.columns else ""
-    out["Type"] = out["type_name"].fillna("")
-    out["Category"] = out.apply(assign_category, axis=1)
-    return out
+def _rows_key(df):
+    return hash(df.index.to_numpy().tobytes())
 
 def export_cause_list_excel_categorized(df, selected_columns, filename="Cause_List"):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "CauseList"
-    max_col = len(selected_columns)
-
-    font_header = Font(size=20, bold=True)
-    font_footer = Font(size=20, italic=True)
-    font_data = Font(size=20)
-    align_center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    align_left_wrap = Alignment(horizontal="left", vertical="top", wrap_text=True)
-
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=max_col)
-    cell = ws.cell(row=1, column=1)
-    cell.value = APP_NAME
-    cell.font = font_header
-    cell.alignment = align_center
-
-    ws.merge_cells(start_row=2, start_column=1, end_row=2, end_column=max_col)
-    cell = ws.cell(row=2, column=1)
-    cell.value = APP_SUB
-    cell.font = font_header
-    cell.alignment = align_center
-
-    ws.append([])  # blank line
-
-    # Add column headers
-    ws.append(selected_columns)
-    for cell in ws[ws.max_row]:
-        cell.font = font_header
-        cell.alignment = align_center
-
-    # Add data rows with empty Next Date
-    for _, row in df.iterrows():
-        row_data = []
-        for col in selected_columns:
-            if col == "Next Date":
-                row_data.append("")  # Always empty
-            else:
-                val = row.get(col, "")
-                if isinstance(val, str) and len(val) > 50:
-                    val = val[:47] + "..."
-                row_data.append(val)
-        ws.append(row_data)
-
-    # Style data rows
-    for row_cells in ws.iter_rows(min_row=4, max_row=ws.max_row):
-        for cell in row_cells:
-            cell.font = font_data
-            cell.alignment = align_left_wrap
-
-    # Additional recommended notes (3 rows)
-    ws.append([])
-    ws.append(["Additional Category Notes:"])
-    ws.append(["*Cases advanced/listed but not appearing in cause list; Certified copies, Compliance, Office cases, Client appearances, Follow-ups, etc."])
-    for r in range(ws.max_row-2, ws.max_row+1):
-        for c in range(1, max_col+1):
-            cell = ws.cell(row=r, column=c)
-            cell.font = font_footer
-            cell.alignment = align_left_wrap
-
-    # Footer below notes with spacing
-    footer_row = ws.max_row + 3
-    ws.merge_cells(start_row=footer_row, start_column=1, end_row=footer_row, end_column=max_col)
-    
-
-    # Page setup
-    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
-    ws.page_setup.paperSize = ws.PAPERSIZE_A4
-    ws.page_setup.fitToPage = True
-    ws.page_setup.fitToWidth = 1
-
-    ws.oddFooter.center.text = f"{APP_NAME} - {APP_SUB}"
-    ws.oddFooter.center.size = 18
-    ws.oddFooter.center.font = "Arial"
-    ws.oddFooter.center.color = "000000"
-
-
-    # Adjust column width
-    for i, col in enumerate(selected_columns, 1):
-        max_len = len(col) + 2
-        for cell in ws[get_column_letter(i)]:
-            if cell.value:
-                max_len = max(max_len, len(str(cell.value)))
-        ws.column_dimensions[get_column_letter(i)].width = min(max_len + 5, 50)
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    st.download_button(f"Download {filename} Excel", data=buffer,
-                       file_name=f"{filename}.xlsx",
-                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    lazy_download(f"Download {filename} Excel",
+                  ("xlsx", filename, tuple(selected_columns), _rows_key(df)),
+                  lambda: build_cause_list_excel(df, selected_columns, APP_NAME, APP_SUB),
+                  f"{filename}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 def generate_cause_list_pdf(df, selected_columns, filename="Cause_List.pdf", category_name=None):
-    pdf = FPDF(unit="mm", format="A4")
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-
-    # Title
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, APP_NAME, ln=True, align="C")
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 8, APP_SUB, ln=True, align="C")
-    pdf.ln(6)
-
-    # ---- CATEGORY HEADER ----
-    if category_name:
-        pdf.set_font("Arial", 'B', 13)
-        pdf.cell(0, 8, category_name, ln=True, align="C")
-        pdf.ln(4)  # some spacing before table
-
-    # --- Column widths ---
-    base_widths = [25, 35, 20, 35, 55, 35, 25]
-    if len(selected_columns) != len(base_widths):
-        base_widths = [1] * len(selected_columns)
-
-    available = pdf.w - pdf.l_margin - pdf.r_margin
-    scale = available / sum(base_widths)
-    col_widths = [w * scale for w in base_widths]
-
-    # Header drawer
-    def draw_header():
-        pdf.set_font("Arial", 'B', 10)
-        header_h = 8
-        x = pdf.l_margin
-        y = pdf.get_y()
-        for i, col in enumerate(selected_columns):
-            pdf.rect(x, y, col_widths[i], header_h)
-            pdf.set_xy(x, y)
-            pdf.multi_cell(col_widths[i], header_h, col, border=0, align="C")
-            x += col_widths[i]
-        pdf.ln(header_h)
-
-    draw_header()
-
-    # --- Rows (unchanged) ---
-    line_h = 5
-    pdf.set_font("Arial", '', 9)
-
-    for _, row in df.iterrows():
-        cell_lines = []
-        max_lines = 1
-        for i, col in enumerate(selected_columns):
-            text = "" if col == "Next Date" else str(row.get(col, "") or "")
-            lines = pdf.multi_cell(col_widths[i], line_h, text, border=0, align="L", split_only=True)
-            if not lines:
-                lines = [""]
-            cell_lines.append(lines)
-            if len(lines) > max_lines:
-                max_lines = len(lines)
-
-        row_h = max_lines * line_h
-
-        if pdf.will_page_break(row_h):
-            pdf.add_page()
-            if category_name:
-                pdf.set_font("Arial", 'B', 13)
-                pdf.cell(0, 8, category_name, ln=True, align="C")
-                pdf.ln(4)
-            draw_header()
-
-        y = pdf.get_y()
-        x = pdf.l_margin
-        for i, lines in enumerate(cell_lines):
-            pdf.rect(x, y, col_widths[i], row_h)
-            pdf.set_xy(x, y)
-            pdf.multi_cell(col_widths[i], line_h, "\n".join(lines), border=0, align="L")
-            x += col_widths[i]
-        pdf.set_xy(pdf.l_margin, y + row_h)
-
-    # Footer remains same...
-    pdf.ln(5)
-    note = "*Cases advanced/listed but not appearing in cause list; Certified copies, Compliance, Office cases, Client appearances, Follow-ups, etc."
-    if pdf.will_page_break(18):
-        pdf.add_page()
-        if category_name:
-            pdf.set_font("Arial", 'B', 13)
-            pdf.cell(0, 8, category_name, ln=True, align="C")
-            pdf.ln(4)
-        draw_header()
-    pdf.set_font("Arial", 'I', 9)
-    pdf.multi_cell(0, 6, note)
-
-    pdf.ln(6)
-    pdf.set_font("Arial", 'I', 10)
-    pdf.cell(0, 8, APP_NAME, align="C", ln=True)
-    pdf.cell(0, 8, APP_SUB, align="C")
-
-    pdf_output = bytes(pdf.output(dest="S"))
-    st.download_button("Download Cause List PDF", pdf_output, file_name=filename, mime="application/pdf")
-
-
-
+    generate_cause_list_pdf_batch([(category_name, df)], selected_columns, filename)
+
+def generate_cause_list_pdf_batch(sections, selected_columns, filename="Cause_List.pdf"):
+    # One download for several categories; every section is laid out in the same pass
+    key = ("pdf", filename, tuple(selected_columns), tuple((name, _rows_key(df)) for name, df in sections))
+    lazy_download(f"Download {os.path.splitext(filename)[0]} PDF", key,
+                  lambda: render_cause_list_pdf(sections, selected_columns, APP_NAME, APP_SUB),
+                  filename, "application/pdf")
+
+def restore_json_backup(f):
+    # Backups written before the archive format: one JSON document with everything in it
+    data = json.load(f)
+    cases = compact_cases(pd.DataFrame(data.get("cases", {})))
+    st.session_state.case_notes = data.get("case_notes", {})
+    st.session_state.case_dossiers = data.get("case_dossiers", {})
+    st.session_state.case_papers = data.get("case_papers", {})
+    st.session_state.pinned_cases = set(data.get("pinned_cases", []))
+    st.session_state.reminders = data.get("reminders", [])
+    st.session_state.service_types = data.get("service_types", [])
+    st.session_state.causelist_columns = data.get("causelist_columns", DEFAULT_CAUSELIST_COLUMNS.copy())
+    st.session_state.last_sync_date = data.get("last_sync_date")
+    get_store().import_state(cases, {
+        "case_notes": st.session_state.case_notes,
+        "case_dossiers": st.session_state.case_dossiers,
+        "case_papers": st.session_state.case_papers,
+        "pinned_cases": st.session_state.pinned_cases,
+        "reminders": st.session_state.reminders,
+        "billing_entries": data.get("billing_entries", []),
+        "settings": {k: st.session_state[k] for k in PERSISTED_SETTINGS},
+    })
+    set_cases(cases, get_store().revision)
+
+def cause_list_jobs(start, end, calendar_columns):
+    # Cut from the cached display frame and hearing-date index of this session's dataset version
+    return build_cause_list_jobs(display_cases(), date_index(), start, end, calendar_columns)
+
+def bulk_export_section():
+    with st.expander("Bulk Export (all categories, Excel + PDF, as one ZIP)"):
+        dates = st.date_input("Hearing dates", value=(today(), today() + datetime.timedelta(days=1)),
+                              key="bulk_export_dates")
+        if len(dates) != 2:
+            st.info("Pick a start and an end date.")
+            return
+        start, end = dates
+        columns = list(st.session_state.causelist_columns)
+        key = ("zip", start, end, tuple(columns))
+        exports = st.session_state._export_cache
+        version = st.session_state.cases_version
+        if st.button("Build ZIP"):
+            jobs = cause_list_jobs(start, end, columns)
+            bar = st.progress(0.0, text="Building files...")
+            data = build_export_bundle(
+                jobs, APP_NAME, APP_SUB,
+                on_progress=lambda done, total: bar.progress(done / total, text=f"Built {done} of {total} files"))
+            bar.empty()
+            exports[key] = (version, data)
+        entry = exports.get(key)
+        if entry is not None and entry[0] == version:
+            st.download_button("Download ZIP", entry[1], on_click="ignore",
+                               file_name=f"Cause_Lists_{start.isoformat()}_{end.isoformat()}.zip",
+                               mime="application/zip")
 
 def cause_list_tab():
     st.subheader("Cause Lists - Select Date and View by Category")
@@ -382,97 +435,81 @@ def cause_list_tab():
         st.info("No cases loaded.")
         return
 
+    bulk_export_section()
+
     date_choice = st.radio("View Cause List For:", ["Today", "Tomorrow"])
     selected_date = today() if date_choice == "Today" else today() + datetime.timedelta(days=1)
-    df = st.session_state.cases[st.session_state.cases["date_next_list"] == selected_date]
+    df = get_cases_on(selected_date)
 
     if df.empty:
         st.info(f"No cases listed for {date_choice}.")
         return
 
-    df_prepared = prepare_display_df(df)
-
-    df_prepared["Category"] = df_prepared.apply(assign_category, axis=1)
+    df_prepared = display_rows(df)
 
     df_prepared = df_prepared.rename(columns={"court_no_desg_name": "Court Hall"})
 
-    display_columns = ["Previous Date", "Court Hall", "Type",
-                       "Case Number/Year", "Parties", "Stage Today", "Next Date"]
+    display_columns = CAUSE_LIST_COLUMNS
 
-    categories = ["CCC/S/SCCH/MACT", "ACMM/ACJM/MMTC", "FC/MAYO/COM/CONS/DRT/OUT"]
-
-    for cat in categories:
+    sections = []
+    for cat in CAUSE_LIST_CATEGORIES:
         cat_cases = df_prepared[df_prepared["Category"] == cat]
         if cat_cases.empty:
             continue
+        sections.append((cat, cat_cases))
         st.markdown(f"### {cat}")
         st.dataframe(cat_cases[display_columns], use_container_width=True)
 
-        if st.button(f"Export {cat} Cause List to Excel"):
-            export_cause_list_excel_categorized(cat_cases, display_columns, f"{date_choice}_Cause_List_{cat.replace('/', '_')}")
-        if st.button(f"Export {cat} Cause List to PDF"):
-            generate_cause_list_pdf(cat_cases, display_columns, f"{date_choice}_Cause_List_{cat.replace('/', '_')}.pdf", category_name=cat)
+        export_cause_list_excel_categorized(cat_cases, display_columns, f"{date_choice}_Cause_List_{cat.replace('/', '_')}")
+        generate_cause_list_pdf(cat_cases, display_columns, f"{date_choice}_Cause_List_{cat.replace('/', '_')}.pdf", category_name=cat)
 
+    if len(sections) > 1:
+        st.markdown("### All Categories")
+        generate_cause_list_pdf_batch(sections, display_columns, f"{date_choice}_Cause_List_All.pdf")
 
 def case_papers_tab():
     st.subheader("Case Papers Organisation")
-    upload_folder = "uploaded_case_docs"
-    os.makedirs(upload_folder, exist_ok=True)
     if st.session_state.cases.empty:
         st.info("No cases loaded.")
         return
 
-    display_case_list = []
-    for _, row in st.session_state.cases.iterrows():
-        case_type = row.get('type_name', 'N/A')
-        reg_no_year = f"{row['reg_no']}/{row['reg_year']}" if pd.notna(row['reg_no']) and pd.notna(row['reg_year']) else "N/A"
-        parties = f"{row['petparty_name']} v. {row['resparty_name']}".strip()
-        display_case_list.append(f"{row['cino']} - {case_type} - {reg_no_year} - {parties}")
-
-    sel_display = st.selectbox("Assign Documents to Case", options=display_case_list)
-    sel_cino = sel_display.split(" - ")[0]
+    sel_cino = case_picker("Assign Documents to Case", "papers_case")
+    sel_display = st.session_state.papers_case if sel_cino else None
 
     doc_type = st.selectbox("Document Type", ["Pleading", "Evidence", "Order Copy", "Other"])
     custom_doc_name = st.text_input("Custom Document Name (optional)")
 
     uploaded_files = st.file_uploader("Upload Documents", type=["pdf", "docx", "jpg", "png"], accept_multiple_files=True)
 
-    if uploaded_files and st.button("Save Uploaded Documents"):
+    if uploaded_files and sel_cino and st.button("Save Uploaded Documents"):
+        store = get_store()
+        saved = 0
         for f in uploaded_files:
-            base_filename = custom_doc_name.strip() or f.name
-            safe_filename = f"{sel_cino}_{doc_type}_{base_filename}"
-            file_path = os.path.join(upload_folder, safe_filename)
-            with open(file_path, "wb") as out_file:
-                out_file.write(f.read())
-            if sel_cino not in st.session_state.case_papers:
-                st.session_state.case_papers[sel_cino] = []
-            st.session_state.case_papers[sel_cino].append({
+            sha, size, file_path, _ = store.put_document(f, f.name)
+            if store.has_paper(sel_cino, doc_type, sha):
+                st.info(f"{f.name} is already filed under {doc_type} for case {sel_cino}.")
+                continue
+            doc = {
                 "doc_type": doc_type,
-                "custom_doc_name": base_filename,
+                "custom_doc_name": custom_doc_name.strip() or f.name,
                 "original_file_name": f.name,
                 "path": file_path,
-            })
-        st.success(f"Uploaded {len(uploaded_files)} documents for case {sel_cino}.")
+                "sha256": sha,
+                "size": size,
+                "case_label": sel_display,
+            }
+            doc = store.add_paper(sel_cino, doc)
+            st.session_state.case_papers.setdefault(sel_cino, []).append(doc)
+            saved += 1
+        st.success(f"Uploaded {saved} documents for case {sel_cino}.")
 
     search_term = st.text_input("Search Uploaded Documents by case number, parties, type or document name", value="")
     st.markdown("### Uploaded Documents")
-    documents_to_show = []
-    for cino, docs in st.session_state.case_papers.items():
-        case_row = st.session_state.cases[st.session_state.cases["cino"] == cino]
-        if case_row.empty:
-            continue
-        party_str = f"{case_row.iloc[0]['petparty_name']} v. {case_row.iloc[0]['resparty_name']}".lower()
-        reg_no_year = f"{case_row.iloc[0]['reg_no']}/{case_row.iloc[0]['reg_year']}"
-        case_type = case_row.iloc[0].get('type_name', '').lower()
-        searchable_str = f"{cino} {party_str} {reg_no_year} {case_type}".lower()
-        for doc in docs:
-            combined_search = f"{searchable_str} {doc['custom_doc_name'].lower()} {doc['original_file_name'].lower()} {doc['doc_type'].lower()}"
-            if search_term.strip().lower() in combined_search:
-                documents_to_show.append((cino, party_str, reg_no_year, case_type, doc))
+    documents_to_show = get_store().search_papers(search_term)
 
     if documents_to_show:
-        for cino, parties, reg_no_year, case_type, doc in documents_to_show:
-            st.write(f"**Case:** {cino} - {case_type} - {reg_no_year} - {parties}")
+        for cino, doc in documents_to_show:
+            st.write(f"**Case:** {doc.get('case_label') or cino}")
             st.write(f"- Document Type: {doc['doc_type']}")
             st.write(f"- Document Name: {doc['custom_doc_name']} (Original: {doc['original_file_name']})")
             st.write(f"- Saved Path: {doc['path']}")
@@ -491,18 +528,18 @@ def billing_tab():
             if cols[1].button("Remove", key=f"remove_service_{idx}"):
                 categories.pop(idx)
                 st.session_state.service_types = categories
-                st.experimental_rerun()
+                persist_setting("service_types")
+                st.rerun()
         new_cat = st.text_input("Add New Billing Category")
         if st.button("Add Category") and new_cat.strip():
             if new_cat.strip() not in categories:
                 categories.append(new_cat.strip())
                 st.session_state.service_types = categories
+                persist_setting("service_types")
                 st.success(f"Added new billing category: {new_cat.strip()}")
-                st.experimental_rerun()
-    if "billing_entries" not in st.session_state:
-        st.session_state.billing_entries = []
-    case_options = ["General"] + list(st.session_state.cases["cino"]) if not st.session_state.cases.empty else ["General"]
-    sel_case = st.selectbox("Select Case (or General)", case_options)
+                st.rerun()
+    ledger = get_ledger().current()
+    sel_case = case_picker("Select Case (or General)", "billing_case", extra=("General",))
     with st.form("Add Billing Entry", clear_on_submit=True):
         entry_date = st.date_input("Date of Billing", datetime.date.today())
         service_type = st.selectbox("Billing Category", st.session_state.service_types)
@@ -526,337 +563,458 @@ def billing_tab():
                     "amount": amount,
                     "time_spent": time_spent,
                 }
-                st.session_state.billing_entries.append(billing_record)
+                ledger.add(billing_record)
                 st.success("Billing entry added.")
-    df = pd.DataFrame(st.session_state.billing_entries)
-    edited_df = st.data_editor(df, key="billing_editor", num_rows="dynamic")
-    st.session_state.billing_entries = edited_df.to_dict("records")
     st.markdown("---")
     st.subheader("Billing Entries Summary")
-    filter_case = st.selectbox("Filter by Case", ["All"] + case_options)
-    filtered_entries = st.session_state.billing_entries
-    if filter_case != "All":
-        filtered_entries = [e for e in filtered_entries if e["case"] == filter_case]
-    if filtered_entries:
-        df_filtered = pd.DataFrame(filtered_entries)
-        total_amount = df_filtered["amount"].sum()
-        total_time = df_filtered["time_spent"].sum() if "time_spent" in df_filtered.columns else 0
-        st.write(f"**Total Amount: ₹{total_amount:,.2f}**")
-        if total_time > 0:
-            st.write(f"**Total Time Spent: {total_time:.2f} hours**")
-        display_df = df_filtered[["date","case","service_type","description","fee_type","amount","time_spent"]]
-        st.dataframe(display_df, height=350)
-        def export_billing_excel(dataframe):
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Billing"
-            ws.append(["Date","Case","Billing Category","Description", "Fee Type", "Amount (INR)", "Time Spent (hours)"])
-            for r in dataframe.itertuples(index=False):
-                ws.append(list(r))
-            for i, col in enumerate(ws.columns, 1):
-                max_len = 0
-                for cell in col:
-                    if hasattr(cell, "alignment"):
-                        cell.alignment = Alignment(wrap_text=True, vertical="top", horizontal="left")
-                    if cell.value:
-                        max_len = max(max_len, len(str(cell.value)))
-                col_letter = get_column_letter(i)
-                ws.column_dimensions[col_letter].width = min(max_len + 5, 50)
-            ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
-            ws.page_setup.paperSize = ws.PAPERSIZE_A4
-            ws.page_setup.fitToPage = True
-            ws.page_setup.fitToWidth = 1
-            buffer = BytesIO()
-            wb.save(buffer)
-            buffer.seek(0)
-            return buffer
-        if st.button("Export Billing Data to Excel"):
-            buf = export_billing_excel(display_df)
-            st.download_button("Download Billing Excel", buf, "billing.xlsx",
-                               "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-    else:
+    filter_case = case_picker("Filter by Case", "billing_filter", extra=("All", "General"))
+    case = None if filter_case == "All" else filter_case
+    total_amount, total_time, entries = ledger.total() if case is None else ledger.total("case", case)
+    if not entries:
         st.info("No billing entries to display.")
+        return
+    st.write(f"**Total Amount: ₹{total_amount:,.2f}**")
+    if total_time > 0:
+        st.write(f"**Total Time Spent: {total_time:.2f} hours**")
+    billing_editor(ledger, case)
+    with st.expander("Totals"):
+        dim = st.radio("Totals by", list(BILLING_TOTALS), horizontal=True)
+        st.dataframe(ledger.summary(BILLING_TOTALS[dim]))
+    xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    if case is not None:
+        lazy_download("Download Invoice (Excel)", ("billing_invoice", case, ledger.revision),
+                      lambda: build_invoice_excel(ledger, case), f"Invoice_{case}.xlsx", xlsx)
+    months = [m for m in ledger.summary("month").index if m is not None]
+    if months:
+        first, last = st.select_slider("Billing period", options=months, value=(months[0], months[-1]))
+        lazy_download("Download Billing Period Summary (Excel)", ("billing_period", first, last, ledger.revision),
+                      lambda: build_period_excel(ledger, first, last), f"Billing_{first}_{last}.xlsx", xlsx)
+
+def billing_editor(ledger, case):
+    # Only the visible page goes through the editor. The key carries the ledger revision, so once an
+    # edit has been applied the editor starts over on the updated page instead of replaying it.
+    pages = -(-ledger.count(case) // BILLING_PAGE_SIZE)
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=pages,
+                           key=f"billing_page_{case}") if pages > 1 else 1
+    frame = ledger.frame(ledger.entry_ids(case, (page - 1) * BILLING_PAGE_SIZE, page * BILLING_PAGE_SIZE))
+    key = f"billing_editor_{ledger.revision}_{case}_{page}"
+    st.data_editor(frame.reset_index(drop=True), key=key, num_rows="dynamic", hide_index=True,
+                   on_change=apply_billing_edits, args=(key, frame.index.tolist(), case))
+
+def apply_billing_edits(key, ids, case):
+    # Edits arrive as positions on the page; they are written to the ledger by entry id
+    edits = st.session_state[key]
+    ledger = get_ledger()
+    ledger.update({ids[row]: fields for row, fields in edits.get("edited_rows", {}).items()})
+    for row in edits.get("added_rows", []):
+        if row:
+            ledger.add({"case": case or "General", "date": today().strftime("%d.%m.%Y"), **row})
+    ledger.delete([ids[row] for row in edits.get("deleted_rows", [])])
 
 def judge_analytics_tab():
     st.subheader("Judge & Court Analytics")
     if st.session_state.cases.empty:
         st.info("No case data loaded.")
         return
-    judge_counts = st.session_state.cases["court_no_desg_name"].value_counts()
+    aggregates = case_aggregates()
+    judge_counts = aggregates.series("court")
     st.write("Cases per Judge/Court:")
     st.bar_chart(judge_counts)
-    stage_counts = st.session_state.cases["purpose_name"].value_counts().head(10)
-    fig, ax = plt.subplots()
-    ax.bar(stage_counts.index, stage_counts.values)
-    ax.set_xticklabels(stage_counts.index, rotation=45, ha="right")
-    ax.set_title("Top 10 Hearing Stages")
-    st.pyplot(fig)
-
-def roll_cases_to_tomorrow():
-    today_date = today()
-    tomorrow = today_date + datetime.timedelta(days=1)
-    df = st.session_state.cases.copy()
-    updated_rows = 0
-    for idx, row in df.iterrows():
-        if row["date_next_list"] == today_date:
-            updated_data = fetch_case_api(row["cino"])
-            if updated_data and updated_data["date_next_list"] == tomorrow:
-                df.at[idx, "date_last_list"] = row["date_next_list"]
-                df.at[idx, "date_next_list"] = tomorrow
-                updated_rows += 1
-    st.session_state.cases = df
-    if updated_rows > 0:
-        st.info(f"Rolled {updated_rows} case(s) to Tomorrow's Cause List.")
-
+    court = st.selectbox("Weekly hearings for", list(judge_counts.index))
+    start, end = _week_window()
+    st.bar_chart(aggregates.trend(court, start, end).rename(index=str))
+    stage_counts = aggregates.series("stage", top=10)
+    st.image(bar_chart_png(tuple(stage_counts.index), tuple(stage_counts.to_numpy()), "Top 10 Hearing Stages"))
+
+@st.cache_resource
+def load_config(path="config.yaml"):
+    return read_config(path)
+
+@st.cache_resource
+def _sync_engine(base_url, api_key, min_delay_seconds, max_workers):
+    return SyncEngine(base_url, api_key=api_key, min_delay_seconds=min_delay_seconds, max_workers=max_workers)
+
+def get_sync_engine():
+    # One pooled engine per provider/key, shared across reruns; pacing comes from config.yaml
+    config = load_config()
+    return _sync_engine(config.get("base_url") or API_URL,
+                        st.session_state["api_key"] or config.get("api_key", ""),
+                        float(config.get("min_delay_seconds", 0.7)),
+                        int(config.get("max_workers", 4)))
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(os.path.join(CASE_STORE_DIR, "sync_cache.db"))
+
+@timed()
 def fetch_case_api(cino):
-    try:
-        r = requests.get(f"{API_URL}/case-status/{cino}", headers={"Authorization": f"Bearer {st.session_state['api_key']}"}, timeout=20)
-        if r.status_code != 200:
-            return None
-        data = r.json()
-        return {
-            "date_last_list": parser.parse(data.get("date_last_list")).date() if data.get("date_last_list") else None,
-            "date_next_list": parser.parse(data.get("date_next_list")).date() if data.get("date_next_list") else None,
-            "purpose_name": data.get("purpose_name", "")
-        }
-    except:
-        return None
-
-def update_cases_api(only_today=False):
-    df = st.session_state.cases.copy()
-    target = df if not only_today else get_cases_on(today())
-    if target.empty:
-        st.info("No cases to update.")
-        return
-    bar = st.progress(0)
-    updated = 0
-    for i, idx in enumerate(target.index):
-        cino = df.at[idx, "cino"]
-        if not cino:
-            continue
-        upd = fetch_case_api(cino)
-        if upd:
-            df.at[idx, "date_last_list"] = df.at[idx, "date_next_list"]
-            if upd["date_next_list"]:
-                df.at[idx, "date_next_list"] = upd["date_next_list"]
-            if upd["purpose_name"]:
-                df.at[idx, "purpose_name"] = upd["purpose_name"]
-            updated += 1
-        bar.progress((i + 1) / len(target))
-        time.sleep(0.2)
-    st.session_state.cases = df
-    st.session_state.last_sync_date = today()
-    st.success(f"Updated {updated} cases.")
+    return get_sync_engine().fetch(cino)
+
+@st.cache_resource
+def get_calendar_cache():
+    return CalendarCache(os.path.join(CASE_STORE_DIR, "calendar_cache.db"))
+
+@st.cache_resource
+def get_scheduler():
+    # One worker per server process, shared by every session
+    config = dict(load_config())
+    config["base_url"] = config.get("base_url") or API_URL
+    return JobScheduler(os.path.join(CASE_STORE_DIR, "jobs.db"), get_store(), get_response_cache(), config).start()
+
+@st.fragment(run_every=3)
+def job_status():
+    # Polls the scheduler; once a job has written to the store, the whole page reruns to show it
+    if get_store().revision != st.session_state.cases_version:
+        st.rerun(scope="app")
+    for job in get_scheduler().jobs(limit=5):
+        label = {"sync": "Sync", "rollover": "Rollover", "daily": "Daily sync and rollover"}[job["kind"]]
+        if job["params"].get("only_today"):
+            label += " (today's cases)"
+        if job["status"] == "running":
+            st.progress(job["progress"], text=f"{label}: running")
+        elif job["status"] == "queued":
+            st.write(f"{label}: queued")
+        elif job["status"] == "failed":
+            st.error(f"{label} failed: {job['message']}")
+        else:
+            finished = datetime.datetime.fromtimestamp(job["finished"]).strftime("%d.%m.%Y %H:%M")
+            st.write(f"{label} finished {finished}: {job['message']}")
+
+def diagnostics_tab():
+    st.subheader("Diagnostics")
+    c1, c2 = st.columns(2)
+    PROFILER.enabled = c1.toggle("Record timings", value=PROFILER.enabled,
+                                 help="Applies to every session on this server.")
+    PROFILER.trace_memory(c2.toggle("Trace memory peaks (slower)", value=PROFILER.tracing_memory))
+    n = st.slider("Reruns to show", 1, PROFILER.runs.maxlen, min(10, PROFILER.runs.maxlen))
+    runs = PROFILER.recent("rerun", n)
+    if not runs:
+        st.info("No reruns recorded yet.")
+    else:
+        st.dataframe(pd.DataFrame([{
+            "Run": r["id"],
+            "Session": r["label"],
+            "Started": datetime.datetime.fromtimestamp(r["started"]).strftime("%H:%M:%S"),
+            "Seconds": round(r["seconds"], 3),
+            "Slowest tab": max(r["tabs"], key=r["tabs"].get) if r["tabs"] else "",
+            "Peak KB": r.get("peak_kb"),
+        } for r in runs]), width="stretch", hide_index=True)
+        by_id = {r["id"]: r for r in runs}
+        pick = by_id[st.selectbox("Rerun", list(by_id), format_func=lambda i: f"#{i} ({by_id[i]['seconds']:.2f}s)")]
+        c1, c2 = st.columns(2)
+        c1.write("**Tabs**")
+        c1.dataframe(pd.DataFrame(sorted(pick["tabs"].items(), key=lambda kv: -kv[1]), columns=["Tab", "Seconds"]),
+                     width="stretch", hide_index=True)
+        c2.write("**Functions**")
+        c2.dataframe(_ops_frame(pick["ops"]), width="stretch", hide_index=True)
+    other = PROFILER.recent(limit=PROFILER.runs.maxlen)
+    other = [r for r in other if r["kind"] != "rerun"][:n]
+    if other:
+        st.write("**Downloads and background jobs**")
+        st.dataframe(pd.DataFrame([{
+            "Run": r["id"], "Kind": r["kind"], "What": r["label"] or ", ".join(r["ops"]),
+            "Started": datetime.datetime.fromtimestamp(r["started"]).strftime("%H:%M:%S"),
+            "Seconds": round(r["seconds"], 3),
+            "Rows": sum(op["rows"] for op in r["ops"].values()),
+        } for r in other]), width="stretch", hide_index=True)
+    c1, c2 = st.columns(2)
+    with c1:
+        st.download_button("Download JSONL", data=PROFILER.to_jsonl, file_name="casepilot_diagnostics.jsonl",
+                           mime="application/x-ndjson", on_click="ignore")
+    if c2.button("Clear"):
+        PROFILER.clear()
+    stats = view_cache_stats()
+    st.caption(f"Derived view cache: {stats['hits']} hits / {stats['misses']} misses "
+               f"(dataset version {stats['version']})")
+
+def _ops_frame(ops):
+    return pd.DataFrame([{
+        "Function": name, "Calls": op["calls"],
+        "Total ms": round(op["seconds"] * 1000, 1), "Slowest ms": round(op["max_seconds"] * 1000, 1),
+        "Rows": op["rows"], "Peak KB": op.get("peak_kb"),
+    } for name, op in sorted(ops.items(), key=lambda kv: -kv[1]["seconds"])],
+        columns=["Function", "Calls", "Total ms", "Slowest ms", "Rows", "Peak KB"])
+
+@st.cache_resource
+def configure_profiler():
+    # Timings are cheap enough to stay on; config.yaml can still turn them off
+    PROFILER.enabled = bool(load_config().get("profiling", True))
+    return PROFILER
 
 def main():
     st.set_page_config(page_title=APP_NAME, layout="wide")
-    apply_theme()
-    st.markdown(f"<div style='text-align:center'><h1>{APP_NAME}</h1><h4>{APP_SUB}</h4></div>", unsafe_allow_html=True)
-    tabs = st.tabs([
-        "🏠 Dashboard", "📋 Master List", "📅 Cause Lists", "📌 Pinned Cases", "📝 Case Details",
-        "⏰ Reminders", "🔍 Search", "🔄 API Sync", "📅 Calendar", "📊 Analytics",
-        "💾 Backup", "⚙️ Settings", "📂 Case Papers Org", "💼 Billing", "📈 Judge Analytics"
-    ])
-    (tab_dashboard, tab_master, tab_cause, tab_pinned, tab_details,
-    tab_reminders, tab_search, tab_api, tab_calendar, tab_analytics,
-    tab_backup, tab_settings, tab_casepapers, tab_billing, tab_judgeanalytics) = tabs
-
-    now_ist = datetime.datetime.now(pytz.timezone("Asia/Kolkata")).time()
-    if now_ist.hour == 17 and now_ist.minute < 5:
-        roll_cases_to_tomorrow()
-
-    with tab_dashboard:
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            st.metric("Total Cases", len(st.session_state.cases))
-            st.metric("Today’s Cases", len(get_cases_on(today())))
-            st.metric("Tomorrow’s Cases", len(get_cases_on(today() + datetime.timedelta(days=1))))
-        with col2:
-            critical_cases = get_cases_on(today())
-            critical_cases = prepare_display_df(critical_cases)
-            crit_filter = critical_cases["Stage Today"].str.lower().str.contains("argument|evidence|order|judgment|hearing", na=False)
-            critical_cases = critical_cases[crit_filter]
-            st.subheader("Critical Matters Today")
-            st.dataframe(critical_cases, use_container_width=True)
-        st.subheader("Next 30 Days Overview")
-        st.write("**All Hearings:**")
-        st.dataframe(filter_next_30(), use_container_width=True)
-        st.write("**Written Statement:**")
-        st.dataframe(filter_next_30("written statement"), use_container_width=True)
-        st.write("**Evidence / Cross Examination:**")
-        st.dataframe(filter_next_30("evidence|cross"), use_container_width=True)
-        st.write("**Arguments:**")
-        st.dataframe(filter_next_30("argument"), use_container_width=True)
-        st.write("**Orders:**")
-        st.dataframe(filter_next_30("order"), use_container_width=True)
-        st.write("**Judgments:**")
-        st.dataframe(filter_next_30("judgment"), use_container_width=True)
-
-    with tab_master:
-        f = st.file_uploader("Upload myCases.txt", type=["txt"])
-        if f:
-            load_cases(f)
-        if not st.session_state.cases.empty:
-            disp = prepare_display_df(st.session_state.cases)
-            st.dataframe(disp, use_container_width=True)
-            export_cause_list_excel_categorized(disp, st.session_state.causelist_columns, "Master_List")
-
-    with tab_cause:
-        cause_list_tab()
-
-    with tab_pinned:
-        st.subheader("Pinned Cases")
-        if st.session_state.pinned_cases:
-            pins = [st.session_state.cases[st.session_state.cases["cino"] == cino].iloc[0]
-                    for cino in st.session_state.pinned_cases
-                    if cino in st.session_state.cases["cino"].values]
-            disp = prepare_display_df(pd.DataFrame(pins))
-            st.dataframe(disp, use_container_width=True)
-        else:
-            st.info("No pinned cases.")
+    init_session_state()
+    with configure_profiler().run(st.session_state._session_id):
+        render()
+
+def dashboard_tab():
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.metric("Total Cases", len(st.session_state.cases))
+        st.metric("Today’s Cases", len(get_cases_on(today())))
+        st.metric("Tomorrow’s Cases", len(get_cases_on(today() + datetime.timedelta(days=1))))
+    with col2:
+        critical_cases = get_cases_on(today())
+        critical_cases = display_rows(critical_cases)
+        crit_filter = critical_cases["Stage Today"].str.lower().str.contains("argument|evidence|order|judgment|hearing", na=False)
+        critical_cases = critical_cases[crit_filter]
+        st.subheader("Critical Matters Today")
+        st.dataframe(critical_cases, width="stretch")
+    st.subheader("Next 30 Days Overview")
+    st.write("**All Hearings:**")
+    st.dataframe(filter_next_30(), width="stretch")
+    st.write("**Written Statement:**")
+    st.dataframe(filter_next_30("written statement"), width="stretch")
+    st.write("**Evidence / Cross Examination:**")
+    st.dataframe(filter_next_30("evidence|cross"), width="stretch")
+    st.write("**Arguments:**")
+    st.dataframe(filter_next_30("argument"), width="stretch")
+    st.write("**Orders:**")
+    st.dataframe(filter_next_30("order"), width="stretch")
+    st.write("**Judgments:**")
+    st.dataframe(filter_next_30("judgment"), width="stretch")
+
+def master_list_tab():
+    f = st.file_uploader("Upload myCases.txt", type=["txt"])
+    include_local = st.checkbox("Keep Kannada fields", value=False)
+    # The uploader keeps its file across reruns; only ingest a new upload once
+    if f and st.session_state._loaded_upload != (f.file_id, include_local):
+        load_cases(f, include_local=include_local)
+        st.session_state._loaded_upload = (f.file_id, include_local)
+    if not st.session_state.cases.empty:
+        paged_table(np.arange(len(st.session_state.cases)), "master")
+        export_cause_list_excel_categorized(display_cases(), st.session_state.causelist_columns, "Master_List")
+
+def pinned_cases_tab():
+    st.subheader("Pinned Cases")
+    if st.session_state.pinned_cases:
+        pins = st.session_state.cases.iloc[case_index().positions_of(st.session_state.pinned_cases)]
+        disp = display_rows(pins)
+        st.dataframe(disp, width="stretch")
+    else:
+        st.info("No pinned cases.")
 
-    with tab_details:
-        if st.session_state.cases.empty:
-            st.info("Load cases first.")
+def _detail_text(value):
+    # The Value column mixes dates, numbers and text, so st.table gets it as strings
+    if pd.isna(value):
+        return ""
+    return value.strftime("%d.%m.%Y") if isinstance(value, datetime.date) else str(value)
+
+def case_details_tab():
+    if st.session_state.cases.empty:
+        st.info("Load cases first.")
+    else:
+        sel = case_picker("Select Case (CINO)", "details_case")
+        if sel is None:
+            return
+        pos = case_index().position(sel)
+        if pos is not None:
+            row = st.session_state.cases.iloc[pos]
+            detail_df = pd.DataFrame({"Field": row.index, "Value": [_detail_text(v) for v in row]})
+            st.table(detail_df)
+        note_list = st.session_state.case_notes.get(sel, [])
+        st.subheader("Personal Notes")
+        # Show existing notes with timestamps
+        if note_list:
+            for idx, note_entry in enumerate(note_list):
+                st.markdown(f"**[{note_entry['date']}]**: {note_entry['text']}")
+                st.markdown("---")
         else:
-            sel = st.selectbox("Select Case (CINO)", st.session_state.cases["cino"])
-            row_df = st.session_state.cases[st.session_state.cases["cino"] == sel]
-            if not row_df.empty:
-                row_dict = row_df.iloc[0].to_dict()
-                detail_df = pd.DataFrame(list(row_dict.items()), columns=["Field", "Value"])
-                st.table(detail_df)
-            note_list = st.session_state.case_notes.get(sel, [])
-            st.subheader("Personal Notes")
-            # Show existing notes with timestamps
-            if note_list:
-                for idx, note_entry in enumerate(note_list):
-                    st.markdown(f"**[{note_entry['date']}]**: {note_entry['text']}")
-                    st.markdown("---")
-            else:
-                st.write("No personal notes for this case.")
-            new_note_text = st.text_area("Add New Personal Note")
-            new_note_date = st.date_input("Date for this Note", value=today())
-            if st.button("Add Note"):
-                if new_note_text.strip():
-                    note_list.append({"date": new_note_date.strftime("%d.%m.%Y"), "text": new_note_text.strip()})
-                    st.session_state.case_notes[sel] = note_list
-                    st.success("Note added.")
-                else:
-                    st.error("Note text cannot be empty.")
-
-            st.subheader("Case Dossier Timeline")
-            timeline = st.session_state.case_dossiers.get(sel, [])
-            if timeline:
-                st.table(pd.DataFrame(timeline))
+            st.write("No personal notes for this case.")
+        new_note_text = st.text_area("Add New Personal Note")
+        new_note_date = st.date_input("Date for this Note", value=today())
+        if st.button("Add Note"):
+            if new_note_text.strip():
+                note = {"date": new_note_date.strftime("%d.%m.%Y"), "text": new_note_text.strip()}
+                note_list.append(note)
+                st.session_state.case_notes[sel] = note_list
+                get_store().add_note(sel, note)
+                st.success("Note added.")
             else:
-                st.write("No timeline available.")
-
-    with tab_reminders:
-        st.subheader("Task & Deadline Tracker")
-        txt = st.text_input("Task Description")
-        due = st.date_input("Due Date", today())
-        if st.button("Add Task") and txt:
-            st.session_state.reminders.append({"text": txt, "due": due})
-            st.success("Task added.")
-        if st.session_state.reminders:
-            rem_df = pd.DataFrame(st.session_state.reminders).sort_values("due")
-            rem_df['due'] = rem_df['due'].apply(lambda x: x.strftime("%d.%m.%Y") if isinstance(x, (datetime.date, datetime.datetime)) else str(x))
-            st.table(rem_df)
-        else:
-            st.info("No tasks/reminders.")
-
-    with tab_search:
-        st.subheader("Search Cases")
-        d = st.date_input("Filter by Hearing Date (optional)", value=None)
-        term = st.text_input("Global Search Term")
-        df = st.session_state.cases
-        if d:
-            df = df[df["date_next_list"] == d]
-        if term:
-            df = df[df.apply(lambda row: term.lower() in str(row).lower(), axis=1)]
-        disp = prepare_display_df(df)
-        st.dataframe(disp, use_container_width=True)
-
-    with tab_api:
-        st.subheader("API Sync")
-        if st.button("Sync Today's Cases"):
-            update_cases_api(only_today=True)
-        if st.button("Sync All Cases"):
-            update_cases_api(only_today=False)
-        last_sync = st.session_state.get("last_sync_date", "Never")
-        st.write(f"Last sync date: {last_sync}")
-
-    with tab_calendar:
-        st.subheader("Hearing Calendar")
-        cal_df = st.session_state.cases.dropna(subset=["date_next_list"]).sort_values("date_next_list")
-        st.dataframe(prepare_display_df(cal_df), use_container_width=True)
-        if st.button("Export Calendar to Excel"):
-            export_cause_list_excel_categorized(prepare_display_df(cal_df), st.session_state.causelist_columns, "Calendar_View")
-
-    with tab_analytics:
-        st.subheader("Analytics Overview")
-        if st.session_state.cases.empty:
-            st.info("No data loaded.")
-        else:
-            cats = st.session_state.cases.apply(assign_category, axis=1).value_counts()
-            fig1, ax1 = plt.subplots()
-            ax1.pie(cats, labels=cats.index, autopct='%1.1f%%')
-            st.pyplot(fig1)
-            st.subheader("Top 10 Hearing Stages")
-            stage_counts = st.session_state.cases["purpose_name"].value_counts().head(10)
-            fig2, ax2 = plt.subplots()
-            ax2.bar(stage_counts.index, stage_counts.values)
-            ax2.set_xticklabels(stage_counts.index, rotation=45, ha="right")
-            st.pyplot(fig2)
-
-    with tab_backup:
-        st.subheader("Backup & Restore")
-        if st.button("Backup Data"):
-            backup = {
-                "cases": st.session_state.cases.to_dict(),
-                "case_notes": st.session_state.case_notes,
-                "case_dossiers": st.session_state.case_dossiers,
-                "case_papers": st.session_state.case_papers,
-                "pinned_cases": list(st.session_state.pinned_cases),
-                "reminders": st.session_state.reminders,
-                "billing_entries": st.session_state.billing_entries,
-                "service_types": st.session_state.service_types,
-                "causelist_columns": st.session_state.causelist_columns,
-                "last_sync_date": st.session_state.last_sync_date
-            }
-            buf = BytesIO(json.dumps(backup).encode("utf-8"))
-            st.download_button("Download Backup JSON", buf, file_name="backup.json", mime="application/json")
-        restore = st.file_uploader("Restore from Backup", type=["json"])
-        if restore:
-            data = json.load(restore)
-            st.session_state.cases = pd.DataFrame(data.get("cases", {}))
-            st.session_state.case_notes = data.get("case_notes", {})
-            st.session_state.case_dossiers = data.get("case_dossiers", {})
-            st.session_state.case_papers = data.get("case_papers", {})
-            st.session_state.pinned_cases = set(data.get("pinned_cases", []))
-            st.session_state.reminders = data.get("reminders", [])
-            st.session_state.billing_entries = data.get("billing_entries", [])
-            st.session_state.service_types = data.get("service_types", [])
-            st.session_state.causelist_columns = data.get("causelist_columns", DEFAULT_CAUSELIST_COLUMNS.copy())
-            st.session_state.last_sync_date = data.get("last_sync_date")
-            st.success("Backup restored.")
+                st.error("Note text cannot be empty.")
 
-    with tab_settings:
-        st.subheader("Settings")
-        st.session_state["theme"] = st.radio("Theme", ["Dark", "Light"], index=0 if st.session_state["theme"] == "Dark" else 1)
-        st.session_state["auto_sync_time"] = st.time_input("Daily auto-sync time", st.session_state["auto_sync_time"])
-        st.session_state["api_key"] = st.text_input("API Key", value=st.session_state["api_key"])
-
-    with tab_casepapers:
-        case_papers_tab()
+        st.subheader("Case Dossier Timeline")
+        timeline = st.session_state.case_dossiers.get(sel, [])
+        if timeline:
+            st.table(pd.DataFrame(timeline))
+        else:
+            st.write("No timeline available.")
+
+def reminders_tab():
+    st.subheader("Task & Deadline Tracker")
+    txt = st.text_input("Task Description")
+    due = st.date_input("Due Date", today())
+    if st.button("Add Task") and txt:
+        st.session_state.reminders.append({"text": txt, "due": due})
+        get_store().add_reminder({"text": txt, "due": due})
+        st.success("Task added.")
+    if st.session_state.reminders:
+        rem_df = pd.DataFrame(st.session_state.reminders).sort_values("due")
+        rem_df['due'] = rem_df['due'].apply(lambda x: x.strftime("%d.%m.%Y") if isinstance(x, (datetime.date, datetime.datetime)) else str(x))
+        st.table(rem_df)
+    else:
+        st.info("No tasks/reminders.")
+
+def search_tab():
+    st.subheader("Search Cases")
+    d = st.date_input("Filter by Hearing Date (optional)", value=None)
+    term = st.text_input("Global Search Term")
+    mode = st.radio("Match", SEARCH_MODES, horizontal=True)
+    within = date_index().on(d) if d else None
+    if term:
+        positions = search_index().search(term, mode, within=within)
+    else:
+        positions = within if d else np.arange(len(st.session_state.cases))
+    paged_table(positions, "search")
+
+def api_sync_tab():
+    st.subheader("API Sync")
+    force = st.checkbox("Re-check every case (ignore the response cache)", value=False)
+    # Syncs run on the background scheduler; the page keeps working while they do
+    if st.button("Sync Today's Cases"):
+        get_scheduler().submit("sync", {"only_today": True, "force": force})
+    if st.button("Sync All Cases"):
+        get_scheduler().submit("sync", {"only_today": False, "force": force})
+    # Syncs are written by the scheduler, so the store has the latest date, not the session
+    last_sync = get_store().get_setting("last_sync_date") or st.session_state.get("last_sync_date") or "Never"
+    st.write(f"Last sync date: {last_sync}")
+    st.caption(f"The daily sync and rollover run by themselves at {st.session_state.auto_sync_time.strftime('%H:%M')}.")
+    job_status()
+
+def calendar_tab():
+    st.subheader("Hearing Calendar")
+    positions = paged_table(date_index().sorted_positions(), "calendar")
+    export_cause_list_excel_categorized(display_cases().iloc[positions], st.session_state.causelist_columns,
+                                        "Calendar_View")
+    calendar_export_section()
+
+def calendar_export_section():
+    # Upcoming hearings for calendar apps; the window, reminders and file name come from config.yaml
+    config = load_config()
+    start, end = calendar_window(config)
+    minutes = config.get("default_reminder_minutes", 120)
+    split = st.radio("Calendar file", ["One calendar", "One per court", "One per category"], horizontal=True,
+                     key="ics_split")
+    split = {"One per court": "court", "One per category": "category"}.get(split)
+    disp, positions, cache = display_cases(), date_index().sorted_positions(start, end), get_calendar_cache()
+    out = os.path.basename(config.get("ics_output") or "upcoming_hearings.ics")
+    options = {"reminder_minutes": minutes, "timezone": config.get("timezone")}
+
+    def build():
+        buf = BytesIO()
+        if split is None:
+            write_calendar(buf, disp, positions, cache, **options)
+            return buf.getvalue()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as bundle:
+            for group, rows in calendar_groups(disp, positions, split):
+                with bundle.open(calendar_file_name(out, group), "w") as f:
+                    write_calendar(f, disp, rows, cache, name=calendar_name(group), **options)
+        return buf.getvalue()
+
+    st.caption(f"{len(positions)} hearing(s) from {start:%d.%m.%Y} to {end:%d.%m.%Y}"
+               + (f", each with a reminder {minutes} minutes before the hearing day." if minutes else "."))
+    if split is None:
+        lazy_download("Download Calendar (.ics)", ("ics", start, end), build, out, "text/calendar")
+    else:
+        lazy_download("Download Calendars (ZIP)", ("ics", split, start, end), build,
+                      f"{os.path.splitext(out)[0]}_by_{split}.zip", "application/zip")
 
-    with tab_billing:
-        billing_tab()
+def analytics_tab():
+    st.subheader("Analytics Overview")
+    if st.session_state.cases.empty:
+        st.info("No data loaded.")
+    else:
+        aggregates = case_aggregates()
+        cats = aggregates.series("category")
+        st.image(pie_chart_png(tuple(cats.index), tuple(cats.to_numpy())))
+        st.subheader("Top 10 Hearing Stages")
+        stage_counts = aggregates.series("stage", top=10)
+        st.image(bar_chart_png(tuple(stage_counts.index), tuple(stage_counts.to_numpy())))
+        st.subheader("Hearings per Week")
+        start, end = _week_window()
+        weeks = aggregates.series("week")
+        st.bar_chart(weeks[(weeks.index >= start) & (weeks.index <= end)].rename(index=str))
+        col1, col2 = st.columns(2)
+        col1.write("**Top Establishments**")
+        col1.bar_chart(aggregates.series("establishment", top=10))
+        col2.write("**Cases per District**")
+        col2.bar_chart(aggregates.series("district", top=10))
+
+def backup_tab():
+    st.subheader("Backup & Restore")
+    store = get_store()
+    baseline = store.backup_baseline()
+    incremental = st.checkbox("Only changes since the last backup (incremental)", value=baseline is not None,
+                              disabled=baseline is None)
+    cases = st.session_state.cases
+    kind = store.backup_kind(cases, incremental)
+
+    def backup_archive():
+        # Built when the browser fetches the file, so the baseline for the next incremental
+        # only moves for a backup that was actually downloaded
+        buf = BytesIO()
+        store.write_backup(buf, cases, incremental=incremental)
+        return buf.getvalue()
+
+    st.caption(f"{kind.capitalize()} backup. Keep every file back to the last full backup; a restore needs all of them.")
+    created = datetime.datetime.now().isoformat(timespec="seconds")
+    st.download_button("Download Backup", backup_archive, on_click="ignore",
+                       file_name=f"casepilot_{created.replace(':', '')}_{kind}.zip", mime="application/zip")
+    restore = st.file_uploader("Restore from Backup (a full backup plus any later incrementals, or an old JSON backup)",
+                               type=["zip", "json"], accept_multiple_files=True)
+    restore_ids = tuple(f.file_id for f in restore)
+    if restore and st.session_state._restored_upload != restore_ids:
+        st.session_state._restored_upload = restore_ids
+        if any(f.name.lower().endswith(".json") for f in restore):
+            restore_json_backup(restore[0])
+            st.success("Backup restored.")
+            warn_duplicate_cnrs()
+        else:
+            try:
+                store.restore_backup(restore)
+            except (ValueError, zipfile.BadZipFile, KeyError) as e:
+                st.error(f"Restore failed: {e}")
+            else:
+                warm_start()
+                bind_cases()
+                st.success("Backup restored.")
+                warn_duplicate_cnrs()
+
+def settings_tab():
+    st.subheader("Settings")
+    before = {k: st.session_state[k] for k in ["theme", "auto_sync_time", "api_key"]}
+    st.session_state["theme"] = st.radio("Theme", ["Dark", "Light"], index=0 if st.session_state["theme"] == "Dark" else 1)
+    st.session_state["auto_sync_time"] = st.time_input("Daily auto-sync time", st.session_state["auto_sync_time"])
+    st.session_state["api_key"] = st.text_input("API Key", value=st.session_state["api_key"])
+    for key, value in before.items():
+        if st.session_state[key] != value:
+            persist_setting(key)
+
+# Navigation: (tab label, view). Only the open tab's view runs on a rerun; the others cost nothing
+# until someone switches to them, so an edit in one view no longer recomputes all the others.
+VIEWS = [
+    ("🏠 Dashboard", dashboard_tab), ("📋 Master List", master_list_tab), ("📅 Cause Lists", cause_list_tab),
+    ("📌 Pinned Cases", pinned_cases_tab), ("📝 Case Details", case_details_tab), ("⏰ Reminders", reminders_tab),
+    ("🔍 Search", search_tab), ("🔄 API Sync", api_sync_tab), ("📅 Calendar", calendar_tab),
+    ("📊 Analytics", analytics_tab), ("💾 Backup", backup_tab), ("⚙️ Settings", settings_tab),
+    ("📂 Case Papers Org", case_papers_tab), ("💼 Billing", billing_tab),
+    ("📈 Judge Analytics", judge_analytics_tab), ("🩺 Diagnostics", diagnostics_tab),
+]
 
-    with tab_judgeanalytics:
-        judge_analytics_tab()
+def render():
+    if not st.session_state._store_loaded:
+        st.session_state._store_loaded = True
+        warm_start()
+    bind_cases()
+    get_scheduler()
+    apply_theme()
+    st.markdown(f"<div style='text-align:center'><h1>{APP_NAME}</h1><h4>{APP_SUB}</h4></div>", unsafe_allow_html=True)
+    tabs = st.tabs([label for label, _ in VIEWS], key="active_view", on_change="rerun")
+    for tab, (label, view) in zip(tabs, VIEWS):
+        if tab.open:
+            with tab, PROFILER.section(label.split(" ", 1)[1]):
+                view()
 
 if __name__ == "__main__":
     main()
 
-
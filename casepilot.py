@@ -0,0 +1,188 @@
+"""Command-line access to the case core, for cron jobs and scripts.
+
+    python casepilot.py causelist --date tomorrow --format pdf --out lists/
+    python casepilot.py import myCases.txt
+    python casepilot.py sync --today
+    python casepilot.py calendar --split court
+
+Commands work on the same data directory as the app (CASEPILOT_DATA, or --data), so a list
+imported or synced here shows up in open sessions on their next rerun. Heavy libraries are
+imported inside the commands that need them: --help never loads pandas, and a cause list
+written as Excel never loads the PDF library.
+"""
+import argparse
+import datetime
+import os
+import sys
+
+FORMATS = ("xlsx", "pdf")
+SPLITS = ("category", "court")
+
+def parse_day(value):
+    if value == "today":
+        return datetime.date.today()
+    if value == "tomorrow":
+        return datetime.date.today() + datetime.timedelta(days=1)
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected today, tomorrow or YYYY-MM-DD, not {value!r}")
+
+def parse_formats(value):
+    formats = [f.strip().lower() for f in value.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"formats are {', '.join(FORMATS)}")
+    return formats
+
+def open_store(args):
+    from case_store import CaseStore
+    return CaseStore(args.data)
+
+def load_cases(args):
+    if args.cases:
+        from case_core import read_case_export
+        with open(args.cases, "rb") as f:
+            return read_case_export(f)[0]
+    return open_store(args).load_cases()
+
+def cmd_causelist(args):
+    from case_core import APP_NAME, APP_SUB, HearingDateIndex, categorize_cases, cause_list_jobs, prepare_display_df
+    from cause_list_export import build_export_bundle, build_export_files
+
+    df = load_cases(args)
+    if df is None or df.empty:
+        print("No cases loaded.", file=sys.stderr)
+        return 1
+    disp = prepare_display_df(df, categories=categorize_cases(df))
+    end = args.date + datetime.timedelta(days=args.days - 1)
+    jobs = [job for job in cause_list_jobs(disp, HearingDateIndex(df["date_next_list"]), args.date, end)
+            if job[1] in args.format]
+    if not jobs:
+        print(f"No hearings listed from {args.date} to {end}.")
+        return 0
+    os.makedirs(args.out, exist_ok=True)
+    if args.zip:
+        path = os.path.join(args.out, f"Cause_Lists_{args.date.isoformat()}_{end.isoformat()}.zip")
+        with open(path, "wb") as f:
+            f.write(build_export_bundle(jobs, APP_NAME, APP_SUB))
+        print(path)
+        return 0
+    for name, data in build_export_files(jobs, APP_NAME, APP_SUB).items():
+        path = os.path.join(args.out, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        print(path)
+    return 0
+
+def cmd_import(args):
+    from case_core import CaseIndex, read_case_export
+
+    with open(args.file, "rb") as f:
+        df, stats = read_case_export(f, include_local=args.include_local)
+    revision = open_store(args).save_cases(df)
+    print(f"Loaded {stats['rows']} cases (revision {revision}).")
+    if stats["rejected"]:
+        print(f"Skipped {stats['rejected']} unreadable record(s).", file=sys.stderr)
+    if stats["bad_dates"]:
+        print(f"{stats['bad_dates']} hearing date(s) could not be parsed.", file=sys.stderr)
+    duplicates = CaseIndex(df["cino"]).duplicates
+    if duplicates:
+        print(f"{len(duplicates)} CNR(s) are listed more than once: {', '.join(duplicates)}", file=sys.stderr)
+    return 0
+
+def open_scheduler(args):
+    from case_core import API_URL, read_config
+    from scheduler import JobScheduler
+    from sync_engine import ResponseCache
+
+    config = dict(read_config(args.config))
+    config["base_url"] = config.get("base_url") or API_URL
+    cache = ResponseCache(os.path.join(args.data, "sync_cache.db"))
+    return JobScheduler(os.path.join(args.data, "jobs.db"), open_store(args), cache, config)
+
+def cmd_job(args):
+    # Runs through the job table, so a sync already started by the app is waited for, not repeated
+    params = {"only_today": args.today, "force": args.force} if args.command == "sync" else {}
+    job = open_scheduler(args).run_now(args.command, params)
+    print(job["message"])
+    return 0 if job["status"] == "done" else 1
+
+def cmd_calendar(args):
+    from calendar_export import (
+        CalendarCache, calendar_file_name, calendar_groups, calendar_name, calendar_window, write_calendar_file,
+    )
+    from case_core import HearingDateIndex, categorize_cases, prepare_display_df, read_config
+
+    config = read_config(args.config)
+    df = load_cases(args)
+    if df is None or df.empty:
+        print("No cases loaded.", file=sys.stderr)
+        return 1
+    start, end = calendar_window(config)
+    if args.days is not None:
+        end = start + datetime.timedelta(days=args.days)
+    disp = prepare_display_df(df, categories=categorize_cases(df))
+    positions = HearingDateIndex(df["date_next_list"]).sorted_positions(start, end)
+    os.makedirs(args.data, exist_ok=True)
+    cache = CalendarCache(os.path.join(args.data, "calendar_cache.db"))
+    out = args.out or config.get("ics_output") or "upcoming_hearings.ics"
+    for group, rows in calendar_groups(disp, positions, args.split):
+        path = calendar_file_name(out, group)
+        written, rendered = write_calendar_file(
+            path, disp, rows, cache, name=calendar_name(group),
+            reminder_minutes=config.get("default_reminder_minutes", 120), timezone=config.get("timezone"))
+        print(f"{path}: {written} hearing(s), {rendered} new or changed")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="casepilot", description="Case Pilot without the browser.")
+    parser.add_argument("--data", help="data directory (default $CASEPILOT_DATA or casepilot_data)")
+    parser.add_argument("--config", default="config.yaml")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("causelist", help="write cause lists as Excel and/or PDF")
+    p.add_argument("--date", type=parse_day, default="tomorrow", help="today, tomorrow (default) or YYYY-MM-DD")
+    p.add_argument("--days", type=int, default=1, help="number of days from --date (default 1)")
+    p.add_argument("--format", type=parse_formats, default=list(FORMATS), help="xlsx, pdf or xlsx,pdf (default)")
+    p.add_argument("--out", default=".", help="output directory")
+    p.add_argument("--zip", action="store_true", help="write one ZIP instead of loose files")
+    p.add_argument("--cases", help="read this eCourts export instead of the stored cases")
+    p.set_defaults(func=cmd_causelist)
+
+    p = commands.add_parser("calendar", help="write upcoming hearings as an .ics calendar")
+    p.add_argument("--out", help="output file (default ics_output from the config)")
+    p.add_argument("--days", type=int, help="days ahead to include (default calendar_days_ahead from the config)")
+    p.add_argument("--split", choices=SPLITS, help="one calendar per court or per category")
+    p.add_argument("--cases", help="read this eCourts export instead of the stored cases")
+    p.set_defaults(func=cmd_calendar)
+
+    p = commands.add_parser("import", help="replace the stored cases with an eCourts export")
+    p.add_argument("file")
+    p.add_argument("--include-local", action="store_true", help="keep the Kannada fields")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("sync", help="refresh case statuses from the provider")
+    p.add_argument("--today", action="store_true", help="only cases listed today")
+    p.add_argument("--force", action="store_true", help="ignore cached statuses")
+    p.set_defaults(func=cmd_job)
+
+    p = commands.add_parser("rollover", help="move today's cases the provider lists for tomorrow onto tomorrow's list")
+    p.set_defaults(func=cmd_job)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "causelist" and args.days < 1:
+        build_parser().error("--days must be at least 1")
+    if args.command == "calendar" and args.days is not None and args.days < 0:
+        build_parser().error("--days must not be negative")
+    if args.data is None:
+        # Resolved here rather than as the default, since case_core brings pandas with it
+        from case_core import CASE_STORE_DIR
+        args.data = CASE_STORE_DIR
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import pandas as pd
+
+from diagnostics import first_arg_rows, timed
+
+CAUSE_LIST_NOTES = [
+    "Additional Category Notes:",
+    "*Cases advanced/listed but not appearing in cause list; Certified copies, Compliance, Office cases, Client appearances, Follow-ups, etc.",
+]
+
+def _excel_column(df, col):
+    # Cell values for one export column: blanks for missing data, long text cut to 50 characters
+    if col == "Next Date" or col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    values = df[col].astype(object)
+    values = values.where(values.notna(), None)
+    text = values.map(lambda v: isinstance(v, str))
+    long_text = text & (values.str.len() > 50)
+    if long_text.any():
+        values[long_text] = values[long_text].str.slice(0, 47) + "..."
+    return values
+
+@timed(rows=first_arg_rows)
+def build_cause_list_excel(df, selected_columns, title, subtitle):
+    """Styled cause-list workbook as .xlsx bytes, streamed through a write-only sheet."""
+    # openpyxl and fpdf load on first use, so importing this module stays cheap
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, NamedStyle
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.worksheet import Worksheet
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("CauseList")
+    max_col = len(selected_columns)
+
+    header = NamedStyle("cause_header", font=Font(size=20, bold=True),
+                        alignment=Alignment(horizontal="center", vertical="center", wrap_text=True))
+    footer = NamedStyle("cause_footer", font=Font(size=20, italic=True),
+                        alignment=Alignment(horizontal="left", vertical="top", wrap_text=True))
+    data = NamedStyle("cause_data", font=Font(size=20),
+                      alignment=Alignment(horizontal="left", vertical="top", wrap_text=True))
+    for style in (header, footer, data):
+        wb.add_named_style(style)
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style.name
+        return cell
+
+    columns = [_excel_column(df, col) for col in selected_columns]
+
+    # Page setup, footer and widths must all be in place before the first row is streamed
+    ws.page_setup.orientation = Worksheet.ORIENTATION_PORTRAIT
+    ws.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+    ws.page_setup.fitToPage = True
+    ws.page_setup.fitToWidth = 1
+
+    ws.oddFooter.center.text = f"{title} - {subtitle}"
+    ws.oddFooter.center.size = 18
+    ws.oddFooter.center.font = "Arial"
+    ws.oddFooter.center.color = "000000"
+
+    # Widths come from string lengths of the source columns
+    for i, (col, values) in enumerate(zip(selected_columns, columns), 1):
+        present = values[values.notna() & (values != "")]
+        max_len = max(len(col) + 2, int(present.astype(str).str.len().max()) if len(present) else 0)
+        if i == 1:
+            max_len = max([max_len, len(title), len(subtitle)] + [len(n) for n in CAUSE_LIST_NOTES])
+        ws.column_dimensions[get_column_letter(i)].width = min(max_len + 5, 50)
+
+    ws.append([styled(title, header)])
+    ws.append([styled(subtitle, header)])
+    ws.merged_cells.add(f"A1:{get_column_letter(max_col)}1")
+    ws.merged_cells.add(f"A2:{get_column_letter(max_col)}2")
+    ws.append([])  # blank line
+
+    # Column headers, then data rows with empty Next Date; the headers take the data style, as
+    # they always have in these files
+    ws.append([styled(col, data) for col in selected_columns])
+    for row in zip(*(values.tolist() for values in columns)):
+        ws.append([styled(v, data) for v in row])
+
+    # Additional recommended notes (3 rows)
+    ws.append([styled(None, footer) for _ in range(max_col)])
+    for note in CAUSE_LIST_NOTES:
+        ws.append([styled(note, footer)] + [styled(None, footer) for _ in range(max_col - 1)])
+
+    # Footer below notes with spacing
+    footer_row = len(df) + 10
+    ws.merged_cells.add(f"A{footer_row}:{get_column_letter(max_col)}{footer_row}")
+
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+class TextLayout:
+    """Splits table cell text into lines the way multi_cell would, without a PDF round trip.
+
+    Glyph widths are cached per font and whole splits per (font, width, text), so the court
+    names, stages and types that repeat down a cause list are measured once."""
+
+    def __init__(self, pdf):
+        self.pdf = pdf
+        self.glyphs = {}
+        self.splits = {}
+
+    def width(self, text, font):
+        glyphs = self.glyphs.setdefault(font, {})
+        total = 0.0
+        for ch in text:
+            w = glyphs.get(ch)
+            if w is None:
+                w = glyphs[ch] = self.pdf.get_string_width(ch)
+            total += w
+        return total
+
+    def split(self, text, width):
+        pdf = self.pdf
+        font = (pdf.font_family, pdf.font_style, pdf.font_size_pt)
+        key = (font, width, text)
+        lines = self.splits.get(key)
+        if lines is None:
+            lines = self.splits[key] = self._split(text, width - 2 * pdf.c_margin, font)
+        return lines
+
+    def _split(self, text, max_w, font):
+        lines = []
+        space = self.width(" ", font)
+        for para in text.split("\n"):
+            line, line_w = "", 0.0
+            for k, word in enumerate(para.split(" ")):
+                word_w = self.width(word, font)
+                if k and line_w + space + word_w <= max_w:
+                    line, line_w = f"{line} {word}", line_w + space + word_w
+                    continue
+                if line:
+                    lines.append(line)
+                # Words wider than the column are broken between characters
+                while word_w > max_w and len(word) > 1:
+                    cut, used = 0, 0.0
+                    while cut < len(word) - 1 and used + self.width(word[cut], font) <= max_w:
+                        used += self.width(word[cut], font)
+                        cut += 1
+                    cut = max(cut, 1)
+                    lines.append(word[:cut])
+                    word = word[cut:]
+                    word_w = self.width(word, font)
+                line, line_w = word, word_w
+            lines.append(line)
+        return lines or [""]
+
+def _pdf_column(df, col):
+    if col == "Next Date" or col not in df.columns:
+        return [""] * len(df)
+    values = df[col].astype(object)
+    return values.where(values.notna() & (values != ""), "").map(str).tolist()
+
+def _section_rows(result, sections, *args, **kwargs):
+    return sum(len(df) for _, df in sections)
+
+@timed(rows=_section_rows)
+def render_cause_list_pdf(sections, selected_columns, title, subtitle):
+    """PDF bytes for one or more (category_name, display frame) sections.
+
+    Each section starts on its own page and repeats its category line and column header
+    after every page break; the app footer closes the document."""
+    from fpdf import FPDF
+
+    pdf = FPDF(unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    layout = TextLayout(pdf)
+
+    # Title
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(0, 10, title, ln=True, align="C")
+    pdf.set_font("Arial", '', 12)
+    pdf.cell(0, 8, subtitle, ln=True, align="C")
+    pdf.ln(6)
+
+    # --- Column widths ---
+    base_widths = [25, 35, 20, 35, 55, 35, 25]
+    if len(selected_columns) != len(base_widths):
+        base_widths = [1] * len(selected_columns)
+
+    available = pdf.w - pdf.l_margin - pdf.r_margin
+    scale = available / sum(base_widths)
+    col_widths = [w * scale for w in base_widths]
+
+    line_h = 5
+    note = "*Cases advanced/listed but not appearing in cause list; Certified copies, Compliance, Office cases, Client appearances, Follow-ups, etc."
+
+    def draw_category(category_name):
+        if category_name:
+            pdf.set_font("Arial", 'B', 13)
+            pdf.cell(0, 8, category_name, ln=True, align="C")
+            pdf.ln(4)  # some spacing before table
+
+    # Header drawer
+    def draw_header():
+        pdf.set_font("Arial", 'B', 10)
+        header_h = 8
+        x = pdf.l_margin
+        y = pdf.get_y()
+        font = (pdf.font_family, pdf.font_style, pdf.font_size_pt)
+        baseline = .5 * header_h + .3 * pdf.font_size
+        header_lines = [layout.split(col, col_widths[i]) for i, col in enumerate(selected_columns)]
+        for i, lines in enumerate(header_lines):
+            pdf.rect(x, y, col_widths[i], header_h)
+            for j, line in enumerate(lines):
+                pdf.text(x + (col_widths[i] - layout.width(line, font)) / 2, y + j * header_h + baseline, line)
+            x += col_widths[i]
+        # Rows start a header height below the box, or lower when a title wraps onto more lines
+        pdf.set_xy(pdf.l_margin, y + header_h * max(2, max(len(lines) for lines in header_lines)))
+        pdf.set_font("Arial", '', 9)
+
+    # Row tops on the current page, then the bottom of the last row. The borders of those rows
+    # go in as one outline and the inner grid lines when the page is left, not a rect per cell
+    grid = []
+
+    def draw_grid():
+        if not grid:
+            return
+        top, bottom = grid[0], grid[-1]
+        left, right = pdf.l_margin, pdf.l_margin + sum(col_widths)
+        pdf.rect(left, top, right - left, bottom - top)
+        for y in grid[1:-1]:
+            pdf.line(left, y, right, y)
+        x = left
+        for w in col_widths[:-1]:
+            x += w
+            pdf.line(x, top, x, bottom)
+        grid.clear()
+
+    for n, (category_name, df) in enumerate(sections):
+        if n:
+            pdf.add_page()
+        draw_category(category_name)
+        draw_header()
+
+        # --- Rows: each cell is split once, then drawn line by line ---
+        baseline = .5 * line_h + .3 * pdf.font_size
+        columns = [_pdf_column(df, col) for col in selected_columns]
+        for row in zip(*columns):
+            cell_lines = [layout.split(text, col_widths[i]) for i, text in enumerate(row)]
+            row_h = max(len(lines) for lines in cell_lines) * line_h
+
+            if pdf.will_page_break(row_h):
+                draw_grid()
+                pdf.add_page()
+                draw_category(category_name)
+                draw_header()
+
+            y = pdf.get_y()
+            x = pdf.l_margin
+            for i, lines in enumerate(cell_lines):
+                for j, line in enumerate(lines):
+                    if line:
+                        pdf.text(x + pdf.c_margin, y + j * line_h + baseline, line)
+                x += col_widths[i]
+            if not grid:
+                grid.append(y)
+            grid.append(y + row_h)
+            pdf.set_xy(pdf.l_margin, y + row_h)
+        draw_grid()
+
+        pdf.ln(5)
+        if pdf.will_page_break(18):
+            pdf.add_page()
+            draw_category(category_name)
+            draw_header()
+        pdf.set_font("Arial", 'I', 9)
+        pdf.multi_cell(0, 6, note)
+
+    pdf.ln(6)
+    pdf.set_font("Arial", 'I', 10)
+    pdf.cell(0, 8, title, align="C", ln=True)
+    pdf.cell(0, 8, subtitle, align="C")
+
+    return bytes(pdf.output())
+
+def _build_file(kind, sections, selected_columns, title, subtitle):
+    # Runs in a worker process, so it only touches its arguments
+    if kind == "xlsx":
+        return build_cause_list_excel(sections[0][1], selected_columns, title, subtitle)
+    return render_cause_list_pdf(sections, selected_columns, title, subtitle)
+
+@timed(rows=first_arg_rows)
+def build_export_files(jobs, title, subtitle, max_workers=None, on_progress=None):
+    """{name: bytes} with one file per job, the files built in parallel on a process pool.
+
+    jobs are (name, kind, sections, selected_columns) with kind "xlsx" or "pdf" and sections a
+    list of (category_name, display frame). on_progress(done, total) runs on the calling thread."""
+    files = {}
+    total = len(jobs)
+    workers = max_workers or min(total, os.cpu_count() or 1)
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_build_file, kind, sections, columns, title, subtitle): name
+                           for name, kind, sections, columns in jobs}
+                for future in as_completed(futures):
+                    files[futures[future]] = future.result()
+                    if on_progress:
+                        on_progress(len(files), total)
+        except (OSError, BrokenProcessPool):
+            pass
+    # Single-core hosts, and hosts that cannot start worker processes, build the rest here
+    for name, kind, sections, columns in jobs:
+        if name not in files:
+            files[name] = _build_file(kind, sections, columns, title, subtitle)
+            if on_progress:
+                on_progress(len(files), total)
+    return {name: files[name] for name, *_ in jobs}
+
+def build_export_bundle(jobs, title, subtitle, max_workers=None, on_progress=None):
+    """ZIP bytes with the files of build_export_files, in job order."""
+    files = build_export_files(jobs, title, subtitle, max_workers, on_progress)
+    buffer = BytesIO()
+    # xlsx and PDF output is already compressed
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as bundle:
+        for name, data in files.items():
+            bundle.writestr(name, data)
+    return buffer.getvalue()
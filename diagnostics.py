@@ -0,0 +1,188 @@
+import collections
+import functools
+import itertools
+import json
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+RUN_HISTORY = 50
+
+class Profiler:
+    """Process-wide timing collector for reruns, tabs and hot functions.
+
+    A rerun is wrapped in run(), each tab in section(), and hot functions are decorated with
+    timed(). Per rerun it keeps the wall time of every tab and, per function, call count, total
+    and slowest time, rows processed and (while memory tracing is on) the peak of memory
+    allocated during the call. Calls made outside a rerun (downloads, scheduler jobs) are kept
+    as runs of their own ("job", "background"). When disabled, a decorated call costs one attribute check."""
+
+    def __init__(self, history=RUN_HISTORY, enabled=True):
+        self.enabled = enabled
+        self.runs = collections.deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self._ids = itertools.count(1)
+
+    # ----- Switches -----
+    @property
+    def tracing_memory(self):
+        return tracemalloc.is_tracing()
+
+    def trace_memory(self, on):
+        # tracemalloc makes every allocation slower, so it is only on while someone is looking
+        if on and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not on and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # ----- Recording -----
+    def _current(self):
+        return getattr(self.local, "run", None)
+
+    def _new_run(self, kind, label):
+        return {"id": next(self._ids), "kind": kind, "label": label,
+                "started": time.time(), "seconds": 0.0, "tabs": {}, "ops": {}}
+
+    def _finish(self, run, started):
+        run["seconds"] = time.perf_counter() - started
+        if resource is not None:
+            # ru_maxrss is in KB on Linux; it is the process high-water mark, not this run's
+            run["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with self.lock:
+            self.runs.append(run)
+
+    def run(self, label="", kind="rerun"):
+        return _Span(self, "run", label, kind) if self.enabled else _NOOP
+
+    def section(self, name):
+        return _Span(self, "section", name) if self.enabled and self._current() is not None else _NOOP
+
+    def timed(self, name=None, rows=None):
+        """Decorator recording calls of the function under name (default: its own name).
+
+        rows(result, *args, **kwargs) counts the rows a call processed, e.g. result_rows."""
+        def decorate(func):
+            op = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, "op", op) as span:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        try:
+                            span.rows = rows(result, *args, **kwargs)
+                        except (TypeError, KeyError, AttributeError):
+                            pass
+                    return result
+            return wrapper
+        return decorate
+
+    def _record_op(self, run, name, seconds, rows, peak):
+        stats = run["ops"].setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0})
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        if rows is not None:
+            stats["rows"] += int(rows)
+        if peak is not None:
+            stats["peak_kb"] = max(stats.get("peak_kb", 0), peak // 1024)
+
+    # ----- Reading -----
+    def recent(self, kind=None, limit=None):
+        with self.lock:
+            runs = [r for r in reversed(self.runs) if kind is None or r["kind"] == kind]
+        return runs[:limit] if limit else runs
+
+    def clear(self):
+        with self.lock:
+            self.runs.clear()
+
+    def to_jsonl(self):
+        """Every kept run, oldest first, one JSON object per line."""
+        with self.lock:
+            runs = list(self.runs)
+        return "".join(json.dumps(r, default=str) + "\n" for r in runs).encode("utf-8")
+
+def result_rows(result, *args, **kwargs):
+    return len(result)
+
+def first_arg_rows(result, data, *args, **kwargs):
+    return len(data)
+
+def method_arg_rows(result, obj, data, *args, **kwargs):
+    return len(data)
+
+class _Span:
+    # One timed region. Memory peaks nest: a child resets the tracemalloc peak, so on exit it
+    # hands its own peak back up to the enclosing span.
+    __slots__ = ("profiler", "kind", "name", "run_kind", "rows", "started", "run", "mem_start", "peak", "owns_run")
+
+    def __init__(self, profiler, kind, name, run_kind="background"):
+        self.profiler = profiler
+        self.kind = kind
+        self.name = name
+        self.run_kind = run_kind
+        self.rows = None
+
+    def __enter__(self):
+        profiler = self.profiler
+        self.run = profiler._current()
+        self.owns_run = self.run is None and self.kind != "section"
+        if self.owns_run:
+            self.run = profiler._new_run(self.run_kind, self.name)
+            profiler.local.run = self.run
+        self.mem_start = self.peak = None
+        if tracemalloc.is_tracing():
+            stack = profiler.local.__dict__.setdefault("spans", [])
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.mem_start, self.peak = current, current
+            stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        profiler = self.profiler
+        peak = None
+        if self.mem_start is not None and tracemalloc.is_tracing():
+            stack = profiler.local.spans
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if self in stack:
+                stack.remove(self)
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+            peak = self.peak - self.mem_start
+        if self.kind == "section":
+            self.run["tabs"][self.name] = self.run["tabs"].get(self.name, 0.0) + seconds
+        elif self.kind == "op":
+            profiler._record_op(self.run, self.name, seconds, self.rows, peak)
+        if self.owns_run:
+            profiler.local.run = None
+            if peak is not None:
+                self.run["peak_kb"] = peak // 1024
+            profiler._finish(self.run, self.started)
+        return False
+
+class _NoOp:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoOp()
+
+# Shared by the app, the export module and the sync engine
+PROFILER = Profiler()
+timed = PROFILER.timed
@@ -0,0 +1,227 @@
+import datetime
+import json
+import sqlite3
+import threading
+import time
+
+import pytz
+
+from diagnostics import PROFILER
+from sync_engine import Stopped, SyncEngine, apply_pending, plan_case_refresh, refresh_rollover, rollover_cases
+
+JOB_KINDS = {"sync", "rollover", "daily"}
+ACTIVE = ("queued", "running")
+
+class JobScheduler:
+    """Background worker for provider syncs and the daily cause-list rollover.
+
+    Jobs live in a small SQLite table so they survive restarts: a job that was running when
+    the process stopped is queued again (the sync journal lets it pick up where it left off).
+    A job is skipped if one with the same key is already queued or running, so every open
+    tab can press "Sync" without doubling the traffic. Progress and results are written to the
+    job row, which the UI polls; page renders never wait on the provider.
+
+    Jobs work on the case store, not on any session: responses are fetched into the response
+    cache first, then folded into the stored case table under the store lock."""
+
+    def __init__(self, path, store, cache, config, poll_seconds=30):
+        self.store = store
+        self.cache = cache
+        self.config = config
+        self.poll_seconds = poll_seconds
+        self.tz = pytz.timezone(config.get("timezone") or "Asia/Kolkata")
+        self.lock = threading.RLock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.started = None
+        self._engines = {}
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY, key TEXT NOT NULL, kind TEXT NOT NULL, params TEXT,
+                    status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, message TEXT,
+                    created REAL, started REAL, finished REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status);
+            """)
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                with self.db:
+                    self.db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+                self.started = self.now()
+                self.thread = threading.Thread(target=self._run_forever, name="casepilot-jobs", daemon=True)
+                self.thread.start()
+        return self
+
+    # ----- Queue -----
+    def submit(self, kind, params=None, key=None):
+        """Queue a job unless an identical one is already queued or running; returns its id."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        params = params or {}
+        key = key or f"{kind}:{json.dumps(params, sort_keys=True)}"
+        with self.lock, self.db:
+            row = self.db.execute(f"SELECT id FROM jobs WHERE key = ? AND status IN {ACTIVE}", (key,)).fetchone()
+            if row:
+                return row[0]
+            job_id = self.db.execute(
+                "INSERT INTO jobs (key, kind, params, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                (key, kind, json.dumps(params), time.time())).lastrowid
+        self.wake.set()
+        return job_id
+
+    def jobs(self, limit=10):
+        """Most recent jobs, newest first, as dicts."""
+        with self.lock:
+            cur = self.db.execute("SELECT id, kind, params, status, progress, message, created, started, finished "
+                                  "FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row), params=json.loads(row[2] or "{}")) for row in cur]
+
+    def active(self):
+        return [job for job in self.jobs(limit=20) if job["status"] in ACTIVE]
+
+    def _update(self, job_id, **fields):
+        with self.lock, self.db:
+            self.db.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                            (*fields.values(), job_id))
+
+    def _claim(self, job_id):
+        # The CLI may share the jobs table with a running server; whoever flips the status runs the job
+        with self.lock, self.db:
+            return self.db.execute("UPDATE jobs SET status = 'running', started = ?, progress = 0, message = '' "
+                                   "WHERE id = ? AND status = 'queued'", (time.time(), job_id)).rowcount == 1
+
+    def _next_job(self):
+        with self.lock:
+            job = self.db.execute("SELECT id, kind, params FROM jobs WHERE status = 'queued' "
+                                  "ORDER BY id LIMIT 1").fetchone()
+        return job if job is not None and self._claim(job[0]) else None
+
+    def run_now(self, kind, params=None, key=None, poll_seconds=1.0):
+        """Run a job in this thread (the CLI); if another process already has it, wait for that run.
+
+        Returns the finished job as a dict."""
+        job_id = self.submit(kind, params, key)
+        with self.lock:
+            job = self.db.execute("SELECT id, kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if self._claim(job_id):
+            self._run(*job)
+        while True:
+            with self.lock:
+                cur = self.db.execute("SELECT status, message FROM jobs WHERE id = ?", (job_id,))
+                status, message = cur.fetchone()
+            if status not in ACTIVE:
+                return {"id": job_id, "kind": kind, "status": status, "message": message}
+            time.sleep(poll_seconds)
+
+    # ----- Worker -----
+    def now(self):
+        return datetime.datetime.now(self.tz)
+
+    def _schedule_daily(self):
+        # The daily sync and rollover run once per local day, when the configured time passes while
+        # this process is up; a server started later that day does not open with a sync of every case
+        at = self.store.get_setting("auto_sync_time") or "17:00:00"
+        now = self.now()
+        due = self.tz.localize(datetime.datetime.combine(now.date(), datetime.time.fromisoformat(at)))
+        if now < due or self.started > due:
+            return
+        key = f"daily:{now.date().isoformat()}"
+        with self.lock:
+            seen = self.db.execute("SELECT 1 FROM jobs WHERE key = ?", (key,)).fetchone()
+        if not seen:
+            self.submit("daily", key=key)
+
+    def _run_forever(self):
+        while True:
+            try:
+                self._schedule_daily()
+            except (sqlite3.Error, ValueError):
+                pass
+            job = self._next_job()
+            if job is None:
+                self.wake.wait(self.poll_seconds)
+                self.wake.clear()
+                continue
+            self._run(*job)
+
+    def _run(self, job_id, kind, params):
+        last = [0.0]
+
+        def progress(done, total):
+            # Throttled so a large sync does not turn into thousands of tiny writes
+            if done == total or time.monotonic() - last[0] > 0.5:
+                last[0] = time.monotonic()
+                self._update(job_id, progress=done / total if total else 1.0)
+
+        try:
+            params = json.loads(params or "{}")
+            with PROFILER.run(kind, kind="job"):
+                if kind == "sync":
+                    message = self.sync(progress, **params)
+                elif kind == "rollover":
+                    message = self.rollover(progress)
+                else:
+                    message = self.rollover(progress) + " " + self.sync(progress)
+            self._update(job_id, status="done", progress=1.0, message=message, finished=time.time())
+        except Stopped as e:
+            # The process is going down; the next one picks the job up again
+            self._update(job_id, status="queued", progress=0, message=str(e))
+        except Exception as e:  # a failed job must not take the worker thread down with it
+            self._update(job_id, status="failed", message=f"{type(e).__name__}: {e}", finished=time.time())
+
+    def engine(self):
+        # Same pacing as the interactive engine; the API key comes from the saved settings
+        config = self.config
+        args = (config["base_url"],
+                self.store.get_setting("api_key") or config.get("api_key", ""),
+                float(config.get("min_delay_seconds", 0.7)), int(config.get("max_workers", 4)))
+        if args not in self._engines:
+            self._engines[args] = SyncEngine(args[0], api_key=args[1], min_delay_seconds=args[2], max_workers=args[3])
+        return self._engines[args]
+
+    def today(self):
+        return self.now().date()
+
+    # ----- Jobs -----
+    def sync(self, progress, only_today=False, force=False):
+        df = self.store.load_cases()
+        if df is None or df.empty:
+            return "No cases loaded."
+        engine, cache, today = self.engine(), self.cache, self.today()
+        leftover = cache.remaining()
+        if leftover:
+            engine.refresh_many(leftover, cache, on_progress=progress)
+            cache.finish_run()
+        plan, considered = plan_case_refresh(df, cache, today, only_today=only_today, force=force)
+        cache.start_run(plan)
+        engine.refresh_many(plan, cache, on_progress=progress)
+        cache.finish_run()
+        # Re-read under the lock so a table replaced while we were fetching is not overwritten
+        with self.store.lock:
+            df = self.store.load_cases()
+            applied, updated, patches = apply_pending(df, cache)
+            self.store.patch_cases(df, patches)
+            cache.mark_applied(applied)
+            self.store.set_setting("last_sync_date", today)
+        return f"Checked {len(plan)} of {considered} case(s) with the provider; updated {updated}."
+
+    def rollover(self, progress):
+        df = self.store.load_cases()
+        if df is None or df.empty:
+            return "No cases loaded."
+        today = self.today()
+        # Fetching happens outside the store lock; under it the cases are only moved from the cache
+        refresh_rollover(df, self.engine(), self.cache, today, on_progress=progress)
+        with self.store.lock:
+            df = self.store.load_cases()
+            rolled, patches = rollover_cases(df, self.cache, today)
+            self.store.patch_cases(df, patches)
+            self.cache.mark_applied(rolled)
+        return f"Rolled {len(rolled)} case(s) to Tomorrow's Cause List."
@@ -0,0 +1,138 @@
+import bisect
+import re
+
+import numpy as np
+import pandas as pd
+
+SEARCH_FIELDS = [
+    "cino", "case_no", "type_name", "petparty_name", "resparty_name",
+    "court_no_desg_name", "establishment_name", "purpose_name",
+]
+# Kannada counterparts are indexed whenever the loaded frame carries them
+LOCAL_SEARCH_FIELDS = [
+    "ltype_name", "lpetparty_name", "lresparty_name", "lestablishment_name",
+    "lcourt_no_desg_name", "lpurpose_name",
+]
+SEARCH_MODES = ["Contains", "Whole words", "Prefix"]
+
+# Tokens are runs of anything but whitespace and punctuation, so Kannada vowel signs stay attached
+TOKEN_RE = re.compile(r"[^\s,;:()\[\]\"'./\\|\-]+")
+FIELD_SEP = " | "
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+def _search_text(df):
+    # One lowercase line per case: the indexed fields plus "reg_no/reg_year"
+    fields = [c for c in SEARCH_FIELDS + LOCAL_SEARCH_FIELDS if c in df.columns]
+    parts = [df[c].astype("string").fillna("") for c in fields]
+    if "reg_no" in df.columns and "reg_year" in df.columns:
+        parts.append(df["reg_no"].astype("string").fillna("") + "/" + df["reg_year"].astype("string").fillna(""))
+    if not parts:
+        return [""] * len(df)
+    text = parts[0]
+    for part in parts[1:]:
+        text = text + FIELD_SEP + part
+    return text.str.lower().tolist()
+
+class CaseSearchIndex:
+    """Inverted index over the case table, addressed by row position.
+
+    Tokens map to sorted arrays of row positions. A trigram index over the token vocabulary
+    (not over rows) narrows substring queries to the few tokens that can contain the term,
+    and the per-row text confirms the final match."""
+
+    def __init__(self, df):
+        self.text = _search_text(df)
+        rows = {}
+        for pos, text in enumerate(self.text):
+            for token in set(TOKEN_RE.findall(text)):
+                rows.setdefault(token, []).append(pos)
+        self.postings = {token: np.array(r, dtype=np.int64) for token, r in rows.items()}
+        self.vocab = sorted(self.postings)
+        self.trigrams = {}
+        for token in self.vocab:
+            for tri in _trigrams(token):
+                self.trigrams.setdefault(tri, set()).add(token)
+
+    def __len__(self):
+        return len(self.text)
+
+    def _tokens_containing(self, term):
+        if len(term) < 3:
+            return [t for t in self.vocab if term in t]
+        candidates = None
+        for tri in _trigrams(term):
+            found = self.trigrams.get(tri, set())
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+        return [t for t in candidates if term in t]
+
+    def _tokens_with_prefix(self, term):
+        lo = bisect.bisect_left(self.vocab, term)
+        hi = bisect.bisect_left(self.vocab, term + "\U0010ffff")
+        return self.vocab[lo:hi]
+
+    def _rows(self, tokens):
+        arrays = [self.postings[t] for t in tokens if t in self.postings]
+        if not arrays:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(arrays))
+
+    def search(self, query, mode="Contains", within=None):
+        """Row positions matching query, in table order; within limits the search to those rows."""
+        query = query.strip().lower()
+        terms = tokenize(query)
+        if not terms:
+            return np.array([], dtype=np.int64)
+        result = None
+        for term in dict.fromkeys(terms):
+            if mode == "Whole words":
+                rows = self._rows([term])
+            elif mode == "Prefix":
+                rows = self._rows(self._tokens_with_prefix(term))
+            else:
+                rows = self._rows(self._tokens_containing(term))
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        if within is not None:
+            result = np.intersect1d(result, np.asarray(within, dtype=np.int64))
+        if mode == "Contains" and (len(terms) > 1 or query != terms[0]):
+            # Multi-word or punctuated queries must still appear verbatim, as in the old row scan
+            result = np.array([p for p in result if query in self.text[p]], dtype=np.int64)
+        return result
+
+    def copy(self):
+        # update() replaces posting arrays and trigram sets instead of editing them, so copies share them
+        index = object.__new__(CaseSearchIndex)
+        index.text = list(self.text)
+        index.postings = dict(self.postings)
+        index.vocab = list(self.vocab)
+        index.trigrams = dict(self.trigrams)
+        return index
+
+    def update(self, df, positions):
+        """Re-index the given row positions of df (same row layout, e.g. after an API sync)."""
+        new_text = _search_text(df.iloc[positions])
+        added, removed = {}, {}
+        for pos, text in zip(positions, new_text):
+            old_tokens, new_tokens = set(TOKEN_RE.findall(self.text[pos])), set(TOKEN_RE.findall(text))
+            for t in old_tokens - new_tokens:
+                removed.setdefault(t, []).append(pos)
+            for t in new_tokens - old_tokens:
+                added.setdefault(t, []).append(pos)
+            self.text[pos] = text
+        for t, rows in removed.items():
+            self.postings[t] = np.setdiff1d(self.postings[t], rows)
+        for t, rows in added.items():
+            if t not in self.postings:
+                self.postings[t] = np.array([], dtype=np.int64)
+                bisect.insort(self.vocab, t)
+                for tri in _trigrams(t):
+                    self.trigrams[tri] = self.trigrams.get(tri, set()) | {t}
+            self.postings[t] = np.union1d(self.postings[t], np.asarray(rows, dtype=np.int64))
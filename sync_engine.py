@@ -0,0 +1,429 @@
+import atexit
+import datetime
+import hashlib
+import json
+import queue
+import random
+import sqlite3
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+from dateutil import parser
+
+from case_core import CaseIndex, to_dates
+from diagnostics import method_arg_rows, timed
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HOUR = 3600
+DAY = 24 * HOUR
+# Rollover trusts statuses fetched within the last hour
+ROLLOVER_MAX_AGE = HOUR
+
+def parse_case_status(data):
+    return {
+        "date_last_list": parser.parse(data.get("date_last_list")).date() if data.get("date_last_list") else None,
+        "date_next_list": parser.parse(data.get("date_next_list")).date() if data.get("date_next_list") else None,
+        "purpose_name": data.get("purpose_name", "")
+    }
+
+def refresh_ttl(next_date, disposed, today):
+    """How long (seconds) a cached status stays fresh: disposed cases almost never change,
+    hearings in the next couple of days are re-checked every few hours."""
+    if disposed:
+        return 30 * DAY
+    if next_date is None:
+        return DAY
+    days = (next_date - today).days
+    if days < 0:
+        return 6 * HOUR
+    if days <= 1:
+        return 2 * HOUR
+    if days <= 7:
+        return 12 * HOUR
+    if days <= 30:
+        return DAY
+    return 3 * DAY
+
+def plan_refresh(cinos, next_dates, disposed, fetched_at, today, now, force=False):
+    """CNRs whose cached status is missing or stale, nearest hearing first."""
+    due = []
+    for cino, next_date, done in zip(cinos, next_dates, disposed):
+        if not cino:
+            continue
+        last = fetched_at.get(cino)
+        if force or last is None or now - last >= refresh_ttl(next_date, done, today):
+            distance = abs((next_date - today).days) if next_date is not None else 10 ** 6
+            due.append((done, distance, cino))
+    due.sort()
+    return list(dict.fromkeys(cino for _, _, cino in due))
+
+class ResponseCache:
+    """On-disk cache of raw case-status responses plus the resumable sync journal.
+
+    A response is "pending" until the case table has absorbed it; unchanged bodies and
+    304s never become pending again, so re-checks cost one conditional request and no writes."""
+
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    cino TEXT PRIMARY KEY, body TEXT, body_hash TEXT, applied_hash TEXT,
+                    etag TEXT, last_modified TEXT, fetched_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS sync_journal (
+                    position INTEGER PRIMARY KEY, cino TEXT NOT NULL, done INTEGER NOT NULL DEFAULT 0
+                );
+            """)
+
+    def fetched_at(self):
+        with self.lock:
+            return dict(self.db.execute("SELECT cino, fetched_at FROM responses"))
+
+    def validators(self, cino):
+        with self.lock:
+            row = self.db.execute("SELECT etag, last_modified FROM responses WHERE cino = ?", (cino,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def record(self, cino, response):
+        # Called with 200 and 304 responses; everything else leaves the cached copy alone
+        now = time.time()
+        with self.lock, self.db:
+            if response.status_code == 304:
+                self.db.execute("UPDATE responses SET fetched_at = ? WHERE cino = ?", (now, cino))
+                return
+            response.encoding = response.encoding or "utf-8"
+            body = response.text
+            self.db.execute(
+                "INSERT INTO responses (cino, body, body_hash, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (cino) DO UPDATE SET body = excluded.body, "
+                "body_hash = excluded.body_hash, etag = excluded.etag, "
+                "last_modified = excluded.last_modified, fetched_at = excluded.fetched_at",
+                (cino, body, hashlib.sha1(body.encode("utf-8")).hexdigest(),
+                 response.headers.get("ETag"), response.headers.get("Last-Modified"), now))
+
+    def _parsed(self, rows):
+        out = {}
+        for cino, body in rows:
+            try:
+                out[cino] = parse_case_status(json.loads(body))
+            except (ValueError, TypeError, AttributeError, OverflowError):
+                out[cino] = None
+        return out
+
+    def parsed(self, cinos):
+        with self.lock:
+            rows = [self.db.execute("SELECT cino, body FROM responses WHERE cino = ?", (c,)).fetchone()
+                    for c in cinos]
+        return self._parsed([r for r in rows if r])
+
+    def pending_changes(self):
+        with self.lock:
+            rows = self.db.execute("SELECT cino, body FROM responses WHERE body_hash IS NOT applied_hash").fetchall()
+        return self._parsed(rows)
+
+    def mark_applied(self, cinos):
+        with self.lock, self.db:
+            self.db.executemany("UPDATE responses SET applied_hash = body_hash WHERE cino = ?",
+                                [(c,) for c in cinos])
+
+    # ----- Sync journal -----
+    def start_run(self, cinos):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM sync_journal")
+            self.db.executemany("INSERT INTO sync_journal (position, cino) VALUES (?, ?)", enumerate(cinos))
+
+    def remaining(self):
+        with self.lock:
+            return [c for (c,) in self.db.execute("SELECT cino FROM sync_journal WHERE done = 0 ORDER BY position")]
+
+    def mark_done(self, cino):
+        with self.lock, self.db:
+            self.db.execute("UPDATE sync_journal SET done = 1 WHERE cino = ?", (cino,))
+
+    def finish_run(self):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM sync_journal")
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second on average, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class Stopped(Exception):
+    """A batch of requests was cut short by SyncEngine.stop()."""
+
+_ENGINES = weakref.WeakSet()
+
+def _stop_engines():
+    for engine in list(_ENGINES):
+        engine.stop()
+
+atexit.register(_stop_engines)
+
+class SyncEngine:
+    """Fetches case status for many CNRs over a pooled keep-alive session.
+
+    Requests run on up to max_workers daemon threads, share one token bucket derived from
+    min_delay_seconds, and are retried with jittered exponential backoff on 429/5xx
+    responses and connection errors. stop() (called for every engine when the interpreter
+    exits) makes the batch calls raise Stopped between requests."""
+
+    def __init__(self, base_url, api_key="", min_delay_seconds=0.7, max_workers=4,
+                 timeout=20, max_retries=3, backoff_seconds=1.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        rate = 1.0 / min_delay_seconds if min_delay_seconds else 0
+        self.bucket = TokenBucket(rate, capacity=max_workers)
+        # requests is only needed once something actually talks to the provider
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self._request_errors = requests.RequestException
+        self._stop = threading.Event()
+        _ENGINES.add(self)
+
+    def stop(self):
+        self._stop.set()
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def get(self, cino, headers=None):
+        # Raw response for one case, or None when the provider could not be reached
+        for attempt in range(self.max_retries + 1):
+            if self._stop.is_set():
+                return None
+            self.bucket.acquire()
+            try:
+                r = self.session.get(f"{self.base_url}/case-status/{cino}", headers=headers, timeout=self.timeout)
+            except self._request_errors:
+                r = None
+            if r is not None and r.status_code not in RETRY_STATUSES:
+                return r
+            if attempt < self.max_retries:
+                self._stop.wait(self._backoff(attempt, r))
+        return None
+
+    def fetch(self, cino):
+        r = self.get(cino)
+        if r is None or r.status_code != 200:
+            return None
+        try:
+            return parse_case_status(r.json())
+        except (ValueError, TypeError, AttributeError, OverflowError):
+            return None
+
+    @timed("SyncEngine.refresh_many", rows=method_arg_rows)
+    def refresh_many(self, cinos, cache, on_progress=None):
+        """Conditionally re-fetch cinos into cache, ticking each one off the sync journal.
+
+        Returns the number of requests that got a usable (200/304) answer."""
+        answered = 0
+        total = len(cinos)
+        if not total:
+            return answered
+        batch = [(cino, cache.validators(cino)) for cino in cinos]
+        # Cases not ticked off when the batch stops stay in the sync journal for the next run
+        for done, ((cino, _), r) in enumerate(self._map(lambda req: self.get(*req), batch), 1):
+            if r is not None and r.status_code in (200, 304):
+                cache.record(cino, r)
+                answered += 1
+            cache.mark_done(cino)
+            if on_progress:
+                on_progress(done, total)
+        return answered
+
+    @timed("SyncEngine.fetch_many", rows=method_arg_rows)
+    def fetch_many(self, cinos, on_progress=None):
+        """{cino: parsed status or None}. on_progress(done, total) runs on the calling thread."""
+        results = {}
+        cinos = list(dict.fromkeys(cinos))
+        total = len(cinos)
+        if not total:
+            return results
+        for done, (cino, result) in enumerate(self._map(self.fetch, cinos), 1):
+            results[cino] = result
+            if on_progress:
+                on_progress(done, total)
+        return results
+
+    def _map(self, func, items):
+        # (item, func(item)) in completion order. The workers are daemon threads that stop taking
+        # items once stop() is called or the caller walks away, so nothing waits on a rate-limited
+        # batch at exit; the caller sees Stopped for whatever was left
+        todo, done = queue.SimpleQueue(), queue.SimpleQueue()
+        for item in items:
+            todo.put(item)
+        abandoned = threading.Event()
+
+        def work():
+            while not (self._stop.is_set() or abandoned.is_set()):
+                try:
+                    item = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    done.put((item, func(item), None))
+                except Exception as e:
+                    done.put((item, None, e))
+
+        for _ in range(min(self.max_workers, len(items))):
+            threading.Thread(target=work, name="casepilot-sync", daemon=True).start()
+        try:
+            for _ in items:
+                while True:
+                    try:
+                        item, result, error = done.get(timeout=0.1)
+                        break
+                    except queue.Empty:
+                        self._check_stop()
+                # A request that finished after stop() may have been cut short
+                self._check_stop()
+                if error is not None:
+                    raise error
+                yield item, result
+        finally:
+            abandoned.set()
+
+    def _check_stop(self):
+        if self._stop.is_set():
+            raise Stopped("Stopped before all cases were fetched.")
+
+def _as_date(value):
+    if value is None or pd.isna(value):
+        return None
+    return pd.Timestamp(value).date()
+
+def _ensure_categories(df, col, values):
+    # Categorical columns only accept known values; widen the dictionary before writing new ones
+    if isinstance(df[col].dtype, pd.CategoricalDtype):
+        new = pd.Index(values).dropna().unique().difference(df[col].cat.categories)
+        if len(new):
+            df[col] = df[col].cat.add_categories(new)
+
+def apply_sync_results(df, positions, results):
+    """Write fetched case statuses into df (in place) for the given row positions in one batch.
+
+    Returns the number of updated rows, the hearing-date moves [(position, old, new)] and
+    the per-case patches for the store."""
+    cinos = df["cino"].to_numpy()[positions]
+    hit = np.array([bool(results.get(c)) for c in cinos], dtype=bool)
+    rows, cinos = np.asarray(positions)[hit], cinos[hit]
+    if not len(rows):
+        return 0, [], {}
+    updates = [results[c] for c in cinos]
+    last_col, next_col, purpose_col = (df.columns.get_loc(c) for c in
+                                       ["date_last_list", "date_next_list", "purpose_name"])
+    old_next = df.iloc[rows, next_col].to_numpy()
+    df.iloc[rows, last_col] = old_next
+
+    has_next = np.array([bool(u["date_next_list"]) for u in updates], dtype=bool)
+    new_next = to_dates([u["date_next_list"] for u in updates if u["date_next_list"]])
+    if has_next.any():
+        df.iloc[rows[has_next], next_col] = new_next
+    has_purpose = np.array([bool(u["purpose_name"]) for u in updates], dtype=bool)
+    new_purpose = [u["purpose_name"] for u in updates if u["purpose_name"]]
+    if has_purpose.any():
+        _ensure_categories(df, "purpose_name", new_purpose)
+        df.iloc[rows[has_purpose], purpose_col] = new_purpose
+
+    date_changes = list(zip(rows[has_next], old_next[has_next], new_next))
+    patches = {}
+    for pos, cino in zip(rows, cinos):
+        patches[cino] = {c: df.iat[pos, df.columns.get_loc(c)]
+                         for c in ["date_last_list", "date_next_list", "purpose_name"]}
+    return len(rows), date_changes, patches
+
+def _listed_on(df, day):
+    next_dates = pd.to_datetime(df["date_next_list"], errors="coerce")
+    return np.flatnonzero((next_dates == pd.Timestamp(day)).to_numpy())
+
+def plan_case_refresh(df, cache, today, only_today=False, force=False):
+    """(CNRs due for a re-check, number of cases considered) for a sync of df."""
+    positions = _listed_on(df, today) if only_today else np.arange(len(df))
+    disposed = (df["disp_name"].astype("string").fillna("").str.strip() != "").to_numpy()
+    next_dates = [_as_date(d) for d in df["date_next_list"].to_numpy()[positions]]
+    past = np.array([d is None or d < today for d in next_dates], dtype=bool)
+    plan = plan_refresh(df["cino"].to_numpy()[positions], next_dates, disposed[positions] & past,
+                        cache.fetched_at(), today, time.time(), force=force)
+    return plan, len(positions)
+
+def apply_pending(df, cache):
+    """Fold every cached response the case table has not absorbed yet into df (in place).
+
+    Returns (cinos to mark applied once df is stored, updated row count, store patches)."""
+    changes = cache.pending_changes()
+    rows = CaseIndex(df["cino"]).positions_of(changes)
+    updated, _, patches = apply_sync_results(df, rows, changes)
+    return list(changes), updated, patches
+
+def refresh_rollover(df, engine, cache, today, on_progress=None):
+    """Re-fetch into cache the statuses of today's cases that are older than ROLLOVER_MAX_AGE.
+
+    This is the network half of a rollover; rollover_cases then works from the cache alone."""
+    cinos = [c for c in df["cino"].to_numpy()[_listed_on(df, today)] if c]
+    fetched_at = cache.fetched_at()
+    now = time.time()
+    return engine.refresh_many([c for c in cinos if now - fetched_at.get(c, 0) >= ROLLOVER_MAX_AGE],
+                               cache, on_progress)
+
+def rollover_cases(df, cache, today):
+    """Move today's cases that the cached provider status lists for tomorrow onto tomorrow's
+    cause list. Makes no requests, so it is safe under the store lock.
+
+    Returns (rolled cinos, patches); df is updated in place."""
+    tomorrow = today + datetime.timedelta(days=1)
+    positions = _listed_on(df, today)
+    cinos = [c for c in df["cino"].to_numpy()[positions] if c]
+    results = cache.parsed(cinos)
+    rolled = [pos for pos in positions
+              if results.get(df["cino"].iat[pos]) and results[df["cino"].iat[pos]]["date_next_list"] == tomorrow]
+    if not rolled:
+        return [], {}
+    df.iloc[rolled, df.columns.get_loc("date_last_list")] = pd.Timestamp(today)
+    df.iloc[rolled, df.columns.get_loc("date_next_list")] = pd.Timestamp(tomorrow)
+    rolled_cinos = [df["cino"].iat[pos] for pos in rolled]
+    return rolled_cinos, {c: {"date_last_list": today, "date_next_list": tomorrow} for c in rolled_cinos}
@@ -0,0 +1,44 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+class _Provider(BaseHTTPRequestHandler):
+    # Answers /case-status/<cino> from server.script: a list of (status, headers, body) per CNR,
+    # consumed one per request with the last entry repeating. Bodies carrying an ETag get a
+    # 304 when the request sends it back in If-None-Match.
+    def do_GET(self):
+        server = self.server
+        cino = self.path.rsplit("/", 1)[-1]
+        with server.lock:
+            server.hits.append((cino, time.monotonic(), dict(self.headers)))
+            script = server.script[cino]
+            status, headers, body = script.pop(0) if len(script) > 1 else script[0]
+        if status == 200 and headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"]:
+            status, body = 304, None
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def provider():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Provider)
+    server.lock = threading.Lock()
+    server.hits = []
+    server.script = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
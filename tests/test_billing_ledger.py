@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from billing_ledger import DIMENSIONS, PAIRS, BillingLedger, entry_month
+from case_store import BILLING_FIELDS, CaseStore
+
+CASES = ["General", "KABC010001232020", "KABC010004562021", "KABC020007892019"]
+CATEGORIES = ["Drafting", "Appearance", "Consultation"]
+FEE_TYPES = ["Service Fee (Fixed)", "Time Based (Hourly)"]
+
+def _entry(rng):
+    hourly = rng.random() < 0.5
+    return {
+        "case": CASES[rng.integers(len(CASES))],
+        # Some dates as typed into the editor, which month totals cannot place
+        "date": f"{rng.integers(1, 29):02d}.{rng.integers(1, 13):02d}.{rng.choice([2025, 2026])}"
+                if rng.random() < 0.9 else "soon",
+        "service_type": CATEGORIES[rng.integers(len(CATEGORIES))],
+        "description": f"work {rng.integers(1000)}",
+        "fee_type": FEE_TYPES[hourly],
+        "amount": float(rng.integers(1, 500000)) / 100,
+        "time_spent": float(rng.integers(1, 40)) / 4 if hourly else 0.0,
+    }
+
+def _edits(ledger, rng, n):
+    # The same adds, edits and deletes on the ledger and on the list of dicts the billing tab kept
+    records = {}
+    for _ in range(n):
+        ids = ledger.entry_ids()
+        kind = rng.integers(5) if ids else 0
+        if kind <= 2:
+            entry = _entry(rng)
+            records[ledger.add(entry)] = entry
+        elif kind == 3:
+            entry_id = ids[rng.integers(len(ids))]
+            fields = {f: v for f, v in _entry(rng).items() if rng.random() < 0.4}
+            ledger.update({entry_id: fields})
+            records[entry_id] = dict(records[entry_id], **fields)
+        else:
+            gone = [ids[i] for i in rng.choice(len(ids), min(len(ids), 2), replace=False)]
+            ledger.delete(gone)
+            for entry_id in gone:
+                del records[entry_id]
+    return records
+
+def _baseline_totals(entries, case=None):
+    # The billing tab's summary before the ledger: filter the entries, then sum the frame
+    if case is not None:
+        entries = [e for e in entries if e["case"] == case]
+    df = pd.DataFrame(entries, columns=BILLING_FIELDS)
+    return df["amount"].sum(), df["time_spent"].sum(), len(df)
+
+def _summaries(entries):
+    df = pd.DataFrame(entries, columns=BILLING_FIELDS)
+    df["month"] = df["date"].map(entry_month).astype(object)
+    out = {}
+    for key in [*DIMENSIONS, *PAIRS]:
+        grouped = df.groupby(list(key) if isinstance(key, tuple) else key, dropna=False)
+        out[key] = {k: (round(a, 2), round(t, 2), n) for k, a, t, n in zip(
+            grouped.size().index.tolist(), grouped["amount"].sum(), grouped["time_spent"].sum(), grouped.size())}
+    return out
+
+def _ledger_summaries(ledger):
+    out = {}
+    for key in [*DIMENSIONS, *PAIRS]:
+        frame = ledger.summary(key)
+        out[key] = {k: (a, t, n) for k, a, t, n in zip(frame.index.tolist(), frame["amount"], frame["time_spent"], frame["entries"])}
+    return out
+
+def _nan_keys(summaries):
+    # groupby names a missing month NaN, the ledger None
+    def key(k):
+        if isinstance(k, tuple):
+            return tuple(key(v) for v in k)
+        return None if k != k else k
+    return {dim: {key(k): v for k, v in totals.items()} for dim, totals in summaries.items()}
+
+@pytest.fixture
+def store(tmp_path):
+    return CaseStore(str(tmp_path / "store"))
+
+def test_totals_match_baseline(store):
+    ledger = BillingLedger(store).current()
+    records = _edits(ledger, np.random.default_rng(0), 300)
+    entries = list(records.values())
+    assert len(ledger) == len(entries) > 0
+    for case in [None, *CASES]:
+        amount, hours, n = ledger.total() if case is None else ledger.total("case", case)
+        expected = _baseline_totals(entries, case)
+        assert (amount, hours, n) == (pytest.approx(expected[0]), pytest.approx(expected[1]), expected[2])
+    assert _nan_keys(_ledger_summaries(ledger)) == _nan_keys(_summaries(entries))
+
+def test_entries_come_back_in_write_order(store):
+    ledger = BillingLedger(store).current()
+    records = _edits(ledger, np.random.default_rng(1), 200)
+    frame = ledger.frame(ledger.entry_ids())
+    assert frame.index.tolist() == sorted(records)
+    assert frame.to_dict("records") == [records[i] for i in sorted(records)]
+    for case in CASES:
+        ids = [i for i in sorted(records) if records[i]["case"] == case]
+        assert ledger.entry_ids(case) == ids
+        assert ledger.entry_ids(case, 2, 5) == ids[2:5]
+        assert ledger.count(case) == len(ids)
+
+def test_running_totals_match_a_reload(store):
+    ledger = BillingLedger(store).current()
+    _edits(ledger, np.random.default_rng(2), 200)
+    reloaded = BillingLedger(store).current()
+    assert _ledger_summaries(ledger) == _ledger_summaries(reloaded)
+    assert ledger.entry_ids() == reloaded.entry_ids()
+
+def test_writes_from_elsewhere_reload_the_ledger(store):
+    ledger = BillingLedger(store).current()
+    _edits(ledger, np.random.default_rng(3), 20)
+    # Another process writes to the same store; this ledger's next write must not apply in place
+    other = BillingLedger(store).current()
+    other.add(_entry(np.random.default_rng(4)))
+    ledger.add(_entry(np.random.default_rng(5)))
+    assert _ledger_summaries(ledger) == _ledger_summaries(BillingLedger(store).current())
+    assert len(ledger) == len(store.load_billing())
@@ -0,0 +1,113 @@
+import datetime
+import io
+
+import pandas as pd
+
+from calendar_export import CalendarCache, event_uid, write_calendar
+
+DAY = datetime.date(2026, 10, 19)
+
+def _display(dates, stages=None):
+    cinos = [f"KABC0100000{i}2024" for i in range(len(dates))]
+    return pd.DataFrame({
+        "cino": cinos,
+        "date_next_list": pd.to_datetime(dates).astype("datetime64[s]"),
+        "Type": "O.S.",
+        "Case Number/Year": [f"{100 + i}/2024" for i in range(len(dates))],
+        "Parties": "RAMESH v. SURESH",
+        "court_no_desg_name": "CCH 10",
+        "establishment_name": "City Civil Court",
+        "Stage Today": stages or ["Evidence"] * len(dates),
+        "Category": "CCC/S/SCCH/MACT",
+    })
+
+def _export(disp, cache, positions=None, **kwargs):
+    f = io.BytesIO()
+    positions = list(range(len(disp))) if positions is None else positions
+    counts = write_calendar(f, disp, positions, cache, **kwargs)
+    return f.getvalue(), counts
+
+def _sequences(data):
+    # {UID: SEQUENCE} of every VEVENT, after unfolding continuation lines
+    out, uid = {}, None
+    for line in data.decode("utf-8").replace("\r\n ", "").split("\r\n"):
+        if line.startswith("UID:"):
+            uid = line[4:]
+        elif line.startswith("SEQUENCE:"):
+            out[uid] = int(line[9:])
+    return out
+
+def test_unchanged_events_are_copied(tmp_path):
+    cache = CalendarCache(str(tmp_path / "calendar.db"))
+    disp = _display([DAY, DAY, DAY + datetime.timedelta(days=3)])
+    first, counts = _export(disp, cache)
+    assert counts == (3, 3)
+    assert set(_sequences(first).values()) == {0}
+
+    again, counts = _export(disp, cache)
+    assert counts == (3, 0)
+    assert again == first
+
+def test_changed_events_get_next_sequence(tmp_path):
+    path = str(tmp_path / "calendar.db")
+    disp = _display([DAY, DAY, DAY])
+    _export(disp, CalendarCache(path))
+
+    moved = disp.copy()
+    moved.loc[1, "date_next_list"] = pd.Timestamp(DAY + datetime.timedelta(days=7))
+    moved.loc[2, "Stage Today"] = "Arguments"
+    # A fresh cache on the same file picks up where the last export left off
+    data, counts = _export(moved, CalendarCache(path))
+    assert counts == (3, 2)
+    assert list(_sequences(data).values()) == [0, 1, 1]
+
+    # Going back to earlier details is still a change, never a reuse of the old SEQUENCE
+    data, counts = _export(disp, CalendarCache(path))
+    assert counts == (3, 2)
+    assert list(_sequences(data).values()) == [0, 2, 2]
+
+def test_sequence_survives_leaving_the_window(tmp_path):
+    cache = CalendarCache(str(tmp_path / "calendar.db"))
+    disp = _display([DAY, DAY])
+    _export(disp, cache)
+    moved = disp.copy()
+    moved.loc[1, "date_next_list"] = pd.Timestamp(DAY + datetime.timedelta(days=60))
+    _export(moved, cache)
+
+    # Out of the window for one export, then back unchanged and then changed
+    data, counts = _export(moved, cache, positions=[0])
+    assert counts == (1, 0)
+    assert event_uid(disp["cino"][1]) not in _sequences(data)
+    data, counts = _export(moved, cache)
+    assert counts == (2, 0)
+    assert list(_sequences(data).values()) == [0, 1]
+    data, _ = _export(disp, cache)
+    assert list(_sequences(data).values()) == [0, 2]
+
+def test_options_change_the_fingerprint(tmp_path):
+    cache = CalendarCache(str(tmp_path / "calendar.db"))
+    disp = _display([DAY])
+    _export(disp, cache)
+    data, counts = _export(disp, cache, reminder_minutes=60)
+    assert counts == (1, 1)
+    assert list(_sequences(data).values()) == [1]
+    assert b"TRIGGER:-PT60M" in data
+
+def test_rows_without_a_stable_key_are_skipped(tmp_path):
+    cache = CalendarCache(str(tmp_path / "calendar.db"))
+    disp = _display([DAY, DAY, None, DAY])
+    disp.loc[1, "cino"] = " "
+    disp.loc[3, "cino"] = disp["cino"][0]
+    data, counts = _export(disp, cache)
+    assert counts == (1, 1)
+    assert list(_sequences(data)) == [event_uid(disp["cino"][0])]
+
+def test_long_lines_are_folded(tmp_path):
+    cache = CalendarCache(str(tmp_path / "calendar.db"))
+    disp = _display([DAY])
+    disp["Parties"] = "ರಮೇಶ್ ಕುಮಾರ್ ಮತ್ತು ಇತರರು v. ಕರ್ನಾಟಕ ರಾಜ್ಯ ಮತ್ತು ಇತರರು"
+    data, _ = _export(disp, cache)
+    lines = data.split(b"\r\n")
+    assert max(len(line) for line in lines) <= 75
+    assert any(line.startswith(b" ") for line in lines)
+    assert disp["Parties"][0] in data.decode("utf-8").replace("\r\n ", "")
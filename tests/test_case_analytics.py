@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from case_analytics import DIMENSIONS, CaseAggregates, aggregate_keys
+from case_core import assign_category, categorize_cases, read_case_export
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myCases.txt")
+
+@pytest.fixture(scope="module")
+def cases():
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    return df
+
+def _aggregates(df):
+    return CaseAggregates(aggregate_keys(df, categorize_cases(df)))
+
+def _state(aggregates):
+    return {dim: aggregates.series(dim).to_dict() for dim in DIMENSIONS}, {
+        court: aggregates.trend(court).to_dict() for court in aggregates.court_weeks}
+
+def _nonzero(counts):
+    return {k: int(n) for k, n in counts.items() if n}
+
+def test_counts_match_baseline_value_counts(cases):
+    aggregates = _aggregates(cases)
+    # The Analytics and Judge Analytics tabs as they were before the aggregates
+    cats = cases.apply(assign_category, axis=1).value_counts()
+    stage_counts = cases["purpose_name"].value_counts().head(10)
+    judge_counts = cases["court_no_desg_name"].value_counts()
+
+    assert aggregates.series("category").to_dict() == _nonzero(cats)
+    assert aggregates.series("court").to_dict() == _nonzero(judge_counts)
+    top = aggregates.series("stage", top=10)
+    assert top.tolist() == stage_counts.tolist()
+    assert _nonzero(cases["purpose_name"].value_counts()) == aggregates.series("stage").to_dict()
+    assert list(top) == sorted(top, reverse=True)
+
+def _edit(df, rng, n):
+    # Reschedule, move court, change stage or clear the next date of n random rows
+    df = df.copy()
+    rows = rng.choice(len(df), n, replace=False)
+    courts = df["court_no_desg_name"].dropna().unique()
+    stages = df["purpose_name"].dropna().unique()
+    for k, pos in enumerate(rows):
+        kind = k % 4
+        if kind == 0:
+            df.iat[pos, df.columns.get_loc("date_next_list")] = pd.Timestamp(2026, 1, 5) + pd.Timedelta(days=int(rng.integers(60)))
+        elif kind == 1:
+            df.iat[pos, df.columns.get_loc("court_no_desg_name")] = courts[rng.integers(len(courts))]
+        elif kind == 2:
+            df.iat[pos, df.columns.get_loc("purpose_name")] = stages[rng.integers(len(stages))]
+        else:
+            df.iat[pos, df.columns.get_loc("date_next_list")] = pd.NaT
+    return df, np.sort(rows)
+
+def _applied(aggregates, old, new, rows):
+    # What the dataset does after a sync: copy, then move only the changed rows
+    aggregates = aggregates.copy()
+    old, new = old.iloc[rows], new.iloc[rows]
+    aggregates.apply(aggregate_keys(old, categorize_cases(old)), aggregate_keys(new, categorize_cases(new)))
+    return aggregates
+
+def test_apply_matches_rebuild(cases):
+    rng = np.random.default_rng(0)
+    versions = [(cases, _aggregates(cases))]
+    for n in (1, 20, 200, 20, 5):
+        df, aggregates = versions[-1]
+        edited, rows = _edit(df, rng, n)
+        versions.append((edited, _applied(aggregates, df, edited, rows)))
+    # Every version, old ones included, still counts exactly what a rebuild of its table does
+    for df, aggregates in versions:
+        assert _state(aggregates) == _state(_aggregates(df))
+
+def test_apply_of_unchanged_rows_changes_nothing(cases):
+    aggregates = _aggregates(cases)
+    rows = np.arange(0, len(cases), 3)
+    assert _state(_applied(aggregates, cases, cases, rows)) == _state(aggregates)
+
+def test_changing_the_original_leaves_its_copy(cases):
+    edited, rows = _edit(cases, np.random.default_rng(1), 50)
+    original = _aggregates(cases)
+    copy = original.copy()
+    old, new = cases.iloc[rows], edited.iloc[rows]
+    original.apply(aggregate_keys(old, categorize_cases(old)), aggregate_keys(new, categorize_cases(new)))
+    assert _state(original) == _state(_aggregates(edited))
+    assert _state(copy) == _state(_aggregates(cases))
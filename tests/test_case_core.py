@@ -0,0 +1,141 @@
+import datetime
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from case_core import (
+    DATE_DTYPE, REQUIRED_COLUMNS, HearingDateIndex, _iter_export_elements, assign_category, categorize_cases,
+    compact_cases, read_case_export,
+)
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myCases.txt")
+
+# (type_name, case_no, reg_no, establishment_name, court_no_desg_name): one row per rule and
+# threshold edge, plus the odd registration numbers int() accepts or rejects
+RULE_ROWS = [
+    ("C.C.", "2020001", 50001, "ACMM Court", "Court 1"),
+    ("C.C.", "2020001", 50000, "ACMM Court", "Court 1"),
+    ("CC", "2020001", None, "City Civil Court", "CCH 10"),
+    ("Criminal Case", "2020001", "123", "Mayo Hall", "Court 2"),
+    ("CRL.A", "2020001", 20001, "Sessions Court", "CCH 1"),
+    ("Crl.R.P", "2020001", 20000, "Sessions Court", "CCH 1"),
+    ("S.C", "2020001", 15001, "Sessions Court", "CCH 2"),
+    ("SC", "2020001", 15000, "Mayo Hall", "CCH 2"),
+    ("SC", "2020001", " 12 ", "Magistrate Court", "Court 3"),
+    ("SC", "2020001", "12a", "Magistrate Court", "Court 3"),
+    ("SC", "2020001", 7.9, "City Civil Court", "Court 3"),
+    ("O.S.", "2020001", 10, "Mayohall Court", "Court 4"),
+    ("Com.OS", "2020001", 10, "City Civil Court", "CCH 5"),
+    ("O.S.", "com 2020001", 10, "City Civil Court", "CCH 5"),
+    ("Commercial Suit", "2020001", 10, "Family Court", "Court 6"),
+    ("O.S.", "2020001", 10, "Chief Metropolitan Magistrate", "Mayo Hall Unit"),
+    ("O.S.", "2020001", 10, "Chief Metropolitan Magistrate", "Court 7"),
+    ("M.V.C.", "2020001", 10, "MACT", "Court 8"),
+    ("R.A.", "2020001", 10, "Small Causes Court", "SCCH 9"),
+    ("O.S.", "2020001", 10, "Senior Civil Judge", "Rural Court"),
+    ("O.S.", "2020001", 10, "Family Court", "Court 11"),
+    (None, None, None, None, None),
+]
+
+def _rule_frame():
+    return pd.DataFrame(RULE_ROWS, columns=["type_name", "case_no", "reg_no", "establishment_name",
+                                            "court_no_desg_name"], dtype=object)
+
+def _row_labels(df):
+    return [assign_category(row) for _, row in df.iterrows()]
+
+def _export_frame():
+    with open(EXPORT, encoding="utf-8") as f:
+        return pd.DataFrame([json.loads(e) if isinstance(e, str) else e for e in json.load(f)])
+
+def test_categorize_cases_matches_assign_category():
+    df = _rule_frame()
+    assert categorize_cases(df).tolist() == _row_labels(df)
+
+def test_categorize_cases_without_court_columns():
+    df = _rule_frame().drop(columns=["establishment_name", "court_no_desg_name"])
+    assert categorize_cases(df).tolist() == _row_labels(df)
+
+def test_categorize_cases_keeps_index():
+    df = _rule_frame().set_axis(range(100, 100 + len(RULE_ROWS)))
+    assert categorize_cases(df).index.equals(df.index)
+    assert categorize_cases(df.iloc[:0]).empty
+
+def test_categorize_cases_on_export():
+    raw = _export_frame()
+    expected = _row_labels(raw)
+    assert categorize_cases(raw).tolist() == expected
+    # The typed frames the app works on (Int32 numbers, categoricals) categorize the same way
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    assert categorize_cases(df).tolist() == expected
+    assert categorize_cases(compact_cases(raw[REQUIRED_COLUMNS].copy())).tolist() == expected
+
+def _elements(text, chunk_size):
+    return list(_iter_export_elements(io.StringIO(text), chunk_size, lambda: None))
+
+def test_export_elements_survive_any_chunk_boundary():
+    # Top-level scalars are the elements a cut can shorten without a decode error
+    elements = [12345, True, None, -0.25e3, "a, \"b\" ]", {"cino": "KABC01", "reg_no": 6285, "l": "ಕನ್ನಡ"},
+                [1, [2, {}]], 9876543210]
+    text = json.dumps(elements, ensure_ascii=False, separators=(" ,\r\n ", ": "))
+    for chunk_size in range(1, len(text) + 2):
+        assert _elements(text, chunk_size) == elements, chunk_size
+
+def test_export_elements_reject_truncated_input():
+    text = json.dumps([{"cino": "KABC01"}, {"cino": "KABC02"}])[:-8]
+    for chunk_size in (1, 7, 1 << 16):
+        with pytest.raises(json.JSONDecodeError):
+            _elements(text, chunk_size)
+
+def test_read_case_export_chunk_size_does_not_matter():
+    with open(EXPORT, "rb") as f:
+        df, stats = read_case_export(f)
+        small, small_stats = read_case_export(f, chunk_size=97)
+    assert small_stats == stats
+    pd.testing.assert_frame_equal(small, df)
+
+def _same_index(index, next_dates):
+    rebuilt = HearingDateIndex(next_dates)
+    assert index.dates == rebuilt.dates
+    assert index.buckets == rebuilt.buckets
+
+def test_hearing_date_index_move():
+    day = datetime.date(2026, 10, 19)
+    before = np.array([day, day, None, day + datetime.timedelta(days=2), day], dtype=DATE_DTYPE)
+    next_dates = before.copy()
+    index = HearingDateIndex(next_dates)
+    copy = index.copy()
+
+    # Into a new date, out of a bucket that stays, out of the last row of a bucket, and from/to undated
+    moves = [(0, day, day + datetime.timedelta(days=1)), (3, day + datetime.timedelta(days=2), day),
+             (2, None, day + datetime.timedelta(days=5)), (1, day, None), (4, day, day)]
+    for pos, old, new in moves:
+        copy.move(pos, old, new)
+        next_dates[pos] = np.datetime64("NaT") if new is None else np.datetime64(new, "s")
+        _same_index(copy, next_dates)
+    assert copy.dates == [day, day + datetime.timedelta(days=1), day + datetime.timedelta(days=5)]
+    assert copy.on(day).tolist() == [3, 4]
+    # The index the copy was taken from still describes the old dates
+    _same_index(index, before)
+
+def test_hearing_date_index_moves_match_rebuild():
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    next_dates = df["date_next_list"].to_numpy().copy()
+    index = HearingDateIndex(next_dates)
+    rng = np.random.default_rng(0)
+    # Old values come in as the frame holds them (datetime64, NaT); new ones as the provider sends them
+    choices = [None, *sorted(set(next_dates[~pd.isna(next_dates)].tolist()))[:20],
+               datetime.date(2031, 1, 1), datetime.date(2031, 1, 2)]
+    for pos in rng.integers(0, len(next_dates), 300):
+        new = choices[rng.integers(len(choices))]
+        new = pd.Timestamp(new).date() if new is not None else None
+        index.move(int(pos), next_dates[pos], new)
+        next_dates[pos] = np.datetime64("NaT") if new is None else np.datetime64(new, "s")
+    _same_index(index, next_dates)
+    assert index.sorted_positions().tolist() == HearingDateIndex(next_dates).sorted_positions().tolist()
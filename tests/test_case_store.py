@@ -0,0 +1,160 @@
+import datetime
+import io
+import os
+import threading
+import zipfile
+
+import pandas as pd
+import pytest
+
+from case_core import read_case_export
+from case_store import BACKUP_TABLES, CaseStore
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myCases.txt")
+
+@pytest.fixture(scope="module")
+def cases():
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    return df
+
+def _backup(store, df, **kwargs):
+    f = io.BytesIO()
+    manifest = store.write_backup(f, df, **kwargs)
+    f.seek(0)
+    return f, manifest
+
+def _edited(df):
+    # A rescheduled hearing, a stage the table has not seen yet and one new case
+    df = df.copy()
+    df.loc[5, "date_next_list"] = pd.Timestamp(2030, 1, 1)
+    df["purpose_name"] = df["purpose_name"].cat.add_categories(["Final Arguments"])
+    df.loc[7, "purpose_name"] = "Final Arguments"
+    return pd.concat([df, df.iloc[[3]].assign(cino="KABC019999992024")], ignore_index=True)
+
+def _tampered(f, name):
+    out = io.BytesIO()
+    with zipfile.ZipFile(f) as src, zipfile.ZipFile(out, "w") as dst:
+        for info in src.infolist():
+            data = src.read(info.filename)
+            if info.filename == name:
+                data = data.replace(b"second", b"SECOND")
+            dst.writestr(info, data)
+    f.seek(0)
+    out.seek(0)
+    return out
+
+def test_incremental_chain_restores_latest_state(tmp_path, cases):
+    store = CaseStore(str(tmp_path / "source"))
+    store.save_cases(cases)
+    store.add_note(cases["cino"][0], {"date": "01.01.2025", "text": "first"})
+    store.add_reminder({"text": "file vakalat", "due": datetime.date(2025, 1, 2)})
+    store.set_pins({cases["cino"][1]})
+    full, m1 = _backup(store, cases)
+
+    edited = _edited(cases)
+    store.add_note(cases["cino"][2], {"date": "02.01.2025", "text": "second"})
+    incremental, m2 = _backup(store, edited)
+    unchanged, m3 = _backup(store, edited)
+
+    assert (m1["kind"], m1["case_rows"], m1["tables"]) == ("full", len(cases), BACKUP_TABLES)
+    assert (m2["kind"], m2["parent"], m2["case_rows"], m2["tables"]) == ("incremental", m1["id"], 3, ["case_notes"])
+    assert (m3["kind"], m3["parent"], m3["case_rows"], m3["tables"]) == ("incremental", m2["id"], 0, [])
+
+    target = CaseStore(str(tmp_path / "target"))
+    # Archives may be picked in any order; the chain is rebuilt from the manifests
+    restored = target.restore_backup([unchanged, full, incremental])
+    pd.testing.assert_frame_equal(restored, edited)
+    pd.testing.assert_frame_equal(target.load_cases(), edited)
+    state = target.load_state()
+    assert state["case_notes"] == {cases["cino"][0]: [{"date": "01.01.2025", "text": "first"}],
+                                   cases["cino"][2]: [{"date": "02.01.2025", "text": "second"}]}
+    assert state["pinned_cases"] == {cases["cino"][1]}
+
+    # The restored store carries on the chain where the restored backups left it
+    _, m4 = _backup(target, restored)
+    assert (m4["kind"], m4["parent"], m4["case_rows"], m4["tables"]) == ("incremental", m3["id"], 0, [])
+
+def test_full_backup_on_request(tmp_path, cases):
+    store = CaseStore(str(tmp_path / "source"))
+    _backup(store, cases)
+    _, manifest = _backup(store, cases, incremental=False)
+    assert (manifest["kind"], manifest["parent"], manifest["case_rows"]) == ("full", None, len(cases))
+
+def test_backup_kind_matches_write_backup(tmp_path, cases):
+    store = CaseStore(str(tmp_path / "source"))
+    assert store.backup_kind(cases) == "full"
+    _, m1 = _backup(store, cases)
+    edited = _edited(cases)
+    assert store.backup_kind(edited) == "incremental"
+    assert store.backup_kind(edited, incremental=False) == "full"
+    # A different table is written out in full
+    replaced = cases.iloc[::-1].reset_index(drop=True)
+    assert store.backup_kind(replaced) == "full"
+    _, m2 = _backup(store, replaced)
+    assert m2["kind"] == "full"
+
+def test_baseline_moves_only_when_an_archive_is_written(tmp_path, cases):
+    store = CaseStore(str(tmp_path / "source"))
+    _, m1 = _backup(store, cases)
+    # Rendering the Backup tab asks for the kind and the baseline, possibly many times, without
+    # ever handing an archive over; the next archive must still follow on from m1
+    for _ in range(3):
+        store.backup_kind(_edited(cases))
+        assert store.backup_baseline()["id"] == m1["id"]
+    _, m2 = _backup(store, _edited(cases))
+    assert (m2["kind"], m2["parent"]) == ("incremental", m1["id"])
+    assert store.backup_baseline()["id"] == m2["id"]
+
+def test_concurrent_backups_form_one_chain(tmp_path, cases):
+    store = CaseStore(str(tmp_path / "source"))
+    full, _ = _backup(store, cases)
+    frames, results = {}, []
+
+    def download(n):
+        # Each deferred download builds its archive on a thread of its own
+        df = cases.copy()
+        df.loc[n, "date_next_list"] = pd.Timestamp(2031, 1, n + 1)
+        f, manifest = _backup(store, df)
+        frames[manifest["id"]] = df
+        results.append(f)
+
+    threads = [threading.Thread(target=download, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    target = CaseStore(str(tmp_path / "target"))
+    # Four incrementals, each following on from the one before, end at whichever was built last
+    restored = target.restore_backup([full] + results)
+    last = target.backup_baseline()["id"]
+    assert last == store.backup_baseline()["id"]
+    pd.testing.assert_frame_equal(restored, frames[last])
+
+def test_restore_rejects_checksum_mismatch(tmp_path, cases):
+    store = CaseStore(str(tmp_path / "source"))
+    full, _ = _backup(store, cases)
+    store.add_note(cases["cino"][2], {"date": "02.01.2025", "text": "second"})
+    incremental, _ = _backup(store, cases)
+
+    target = CaseStore(str(tmp_path / "target"))
+    with pytest.raises(ValueError):
+        target.restore_backup([full, _tampered(incremental, "tables/case_notes.jsonl")])
+    # Nothing is written until every member has been verified
+    assert target.load_cases() is None
+    assert target.load_state()["case_notes"] == {}
+
+def test_restore_rejects_broken_chain(tmp_path, cases):
+    store = CaseStore(str(tmp_path / "source"))
+    full, _ = _backup(store, cases)
+    edited = _edited(cases)
+    _backup(store, edited)
+    edited.loc[9, "date_next_list"] = pd.Timestamp(2030, 2, 1)
+    orphan, manifest = _backup(store, edited)
+    assert manifest["kind"] == "incremental"
+
+    target = CaseStore(str(tmp_path / "target"))
+    with pytest.raises(ValueError, match="do not follow on"):
+        target.restore_backup([full, orphan])
+    with pytest.raises(ValueError, match="exactly one full backup"):
+        target.restore_backup([orphan])
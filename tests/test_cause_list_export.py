@@ -0,0 +1,196 @@
+import os
+import re
+import zipfile
+import zlib
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Alignment, Font
+from fpdf import FPDF
+from openpyxl.utils import get_column_letter
+
+from case_core import APP_NAME, APP_SUB, prepare_display_df, read_case_export
+from cause_list_export import (TextLayout, _pdf_column, build_cause_list_excel, build_export_bundle,
+                               render_cause_list_pdf)
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myCases.txt")
+COLUMNS = ["Previous Date", "court_no_desg_name", "Type", "Case Number/Year", "Parties", "Stage Today", "Next Date"]
+
+@pytest.fixture(scope="module")
+def display():
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    return prepare_display_df(df)
+
+def _baseline_excel(df, selected_columns):
+    # export_cause_list_excel_categorized as it was before the write-only workbook, minus the
+    # download button
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "CauseList"
+    max_col = len(selected_columns)
+    font_header = Font(size=20, bold=True)
+    font_footer = Font(size=20, italic=True)
+    font_data = Font(size=20)
+    align_center = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    align_left_wrap = Alignment(horizontal="left", vertical="top", wrap_text=True)
+    for row, text in ((1, APP_NAME), (2, APP_SUB)):
+        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=max_col)
+        cell = ws.cell(row=row, column=1)
+        cell.value = text
+        cell.font = font_header
+        cell.alignment = align_center
+    ws.append([])
+    ws.append(selected_columns)
+    for cell in ws[ws.max_row]:
+        cell.font = font_header
+        cell.alignment = align_center
+    for _, row in df.iterrows():
+        row_data = []
+        for col in selected_columns:
+            if col == "Next Date":
+                row_data.append("")
+            else:
+                val = row.get(col, "")
+                if isinstance(val, str) and len(val) > 50:
+                    val = val[:47] + "..."
+                row_data.append(val)
+        ws.append(row_data)
+    for row_cells in ws.iter_rows(min_row=4, max_row=ws.max_row):
+        for cell in row_cells:
+            cell.font = font_data
+            cell.alignment = align_left_wrap
+    ws.append([])
+    ws.append(["Additional Category Notes:"])
+    ws.append(["*Cases advanced/listed but not appearing in cause list; Certified copies, Compliance, "
+               "Office cases, Client appearances, Follow-ups, etc."])
+    for r in range(ws.max_row - 2, ws.max_row + 1):
+        for c in range(1, max_col + 1):
+            cell = ws.cell(row=r, column=c)
+            cell.font = font_footer
+            cell.alignment = align_left_wrap
+    footer_row = ws.max_row + 3
+    ws.merge_cells(start_row=footer_row, start_column=1, end_row=footer_row, end_column=max_col)
+    ws.page_setup.orientation = ws.ORIENTATION_PORTRAIT
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    ws.page_setup.fitToPage = True
+    ws.page_setup.fitToWidth = 1
+    ws.oddFooter.center.text = f"{APP_NAME} - {APP_SUB}"
+    ws.oddFooter.center.size = 18
+    ws.oddFooter.center.font = "Arial"
+    ws.oddFooter.center.color = "000000"
+    for i, col in enumerate(selected_columns, 1):
+        max_len = len(col) + 2
+        for cell in ws[get_column_letter(i)]:
+            if cell.value:
+                max_len = max(max_len, len(str(cell.value)))
+        ws.column_dimensions[get_column_letter(i)].width = min(max_len + 5, 50)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+def _sheet(data):
+    # What a reader of the file sees: values, fonts, alignment, merges, widths and page setup.
+    # Values are compared as text since write_only and regular workbooks store dates and numbers alike
+    ws = load_workbook(BytesIO(data)).active
+    cells = {}
+    for row in ws.iter_rows():
+        for cell in row:
+            if cell.value is not None or cell.has_style:
+                cells[cell.coordinate] = (
+                    None if cell.value in (None, "") else str(cell.value),
+                    (cell.font.sz, bool(cell.font.b), bool(cell.font.i)),
+                    (cell.alignment.horizontal, cell.alignment.vertical, bool(cell.alignment.wrap_text)),
+                )
+    return {
+        "cells": cells,
+        "merged": sorted(str(r) for r in ws.merged_cells.ranges),
+        "widths": {k: d.width for k, d in ws.column_dimensions.items() if d.width},
+        "page": (ws.page_setup.orientation, str(ws.page_setup.paperSize), ws.sheet_properties.pageSetUpPr.fitToPage,
+                 ws.page_setup.fitToWidth),
+        "footer": (ws.oddFooter.center.text, ws.oddFooter.center.size, ws.oddFooter.center.font),
+    }
+
+@pytest.mark.parametrize("columns", [COLUMNS, ["Parties", "Next Date", "Category"], ["Type", "missing column"]])
+def test_excel_matches_baseline_export(display, columns):
+    df = display.iloc[::7]
+    assert _sheet(build_cause_list_excel(df, columns, APP_NAME, APP_SUB)) == _sheet(_baseline_excel(df, columns))
+
+def test_excel_of_empty_list_matches_baseline(display):
+    df = display.iloc[:0]
+    assert _sheet(build_cause_list_excel(df, COLUMNS, APP_NAME, APP_SUB)) == _sheet(_baseline_excel(df, COLUMNS))
+
+def _pdf_rows(data):
+    # Rebuild the table rows of each page from its content stream: the outline and inner lines
+    # give the cells, and every text drawn inside the outline lands in one of them
+    rows = []
+    for raw in re.findall(rb"stream\r?\n(.*?)\r?\nendstream", data, re.S):
+        ops = zlib.decompress(raw).decode("latin-1")
+        outlines = [tuple(map(float, m)) for m in re.findall(r"^([\d.]+) ([\d.]+) ([\d.]+) -([\d.]+) re S$", ops, re.M)]
+        outlines = [o for o in outlines if o[2] > 500]
+        if not outlines:
+            continue
+        (left, top, width, height), = outlines
+        bottom = top - height
+        edges = re.findall(r"^([\d.]+) ([\d.]+) m ([\d.]+) ([\d.]+) l S$", ops, re.M)
+        row_edges = sorted({top, bottom} | {float(y1) for x1, y1, x2, y2 in edges if y1 == y2}, reverse=True)
+        col_edges = sorted({left, left + width} | {float(x1) for x1, y1, x2, y2 in edges if x1 == x2})
+        page = [[[] for _ in col_edges[1:]] for _ in row_edges[1:]]
+        for x, y, text in re.findall(r"BT ([\d.]+) ([\d.]+) Td \((.*)\) Tj ET", ops):
+            x, y = float(x), float(y)
+            if bottom < y < top:
+                r = next(i for i, edge in enumerate(row_edges[1:]) if y > edge)
+                c = next(i for i, edge in enumerate(col_edges[1:]) if x < edge)
+                page[r][c].append(re.sub(r"\\(.)", r"\1", text))
+        rows += page
+    return rows
+
+def test_pdf_draws_every_row_in_its_cells(display):
+    sections = [("Category A", display.iloc[:70]), ("Category B", display.iloc[70:75]), ("", display.iloc[:0])]
+    rows = _pdf_rows(render_cause_list_pdf(sections, COLUMNS, APP_NAME, APP_SUB))
+    expected = [row for _, df in sections for row in zip(*(_pdf_column(df, col) for col in COLUMNS))]
+    assert len(rows) == len(expected) > 0
+    for cells, row in zip(rows, expected):
+        # Line breaks may fall inside a word, so the cell text is compared without whitespace
+        assert ["".join("".join(lines).split()) for lines in cells] == ["".join(text.split()) for text in row]
+
+def test_text_layout_matches_multi_cell(display):
+    pdf = FPDF(unit="mm", format="A4")
+    pdf.add_page()
+    pdf.set_font("Arial", '', 9)
+    layout = TextLayout(pdf)
+    width = (pdf.w - pdf.l_margin - pdf.r_margin) * 55 / 230
+    values = {text for col in COLUMNS for text in _pdf_column(display, col)} | {"", "x" * 200, "a  b", "one\ntwo"}
+    for text in sorted(values):
+        assert layout.split(text, width) == pdf.multi_cell(width, 5, text, dry_run=True, output="LINES"), text
+
+def _pdf_without_date(data):
+    # The creation time, and the file ID fpdf2 derives from it, are the only parts that change
+    # between two renders of the same list
+    return re.sub(rb"/CreationDate \(D:[^)]*\)|/ID \[<\w+><\w+>\]", b"", data)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_bundle_holds_the_single_exports(display, workers):
+    # The same per-category jobs the Cause Lists tab builds for a day, plus a calendar sheet
+    jobs = []
+    for cat, rows in display.iloc[:60].groupby("Category", observed=True, sort=False):
+        jobs.append((f"day/{cat}.xlsx", "xlsx", [(cat, rows)], COLUMNS))
+        jobs.append((f"day/{cat}.pdf", "pdf", [(cat, rows)], COLUMNS))
+    jobs.append(("Calendar_View.xlsx", "xlsx", [(None, display.iloc[::5])], COLUMNS))
+    progress = []
+    data = build_export_bundle(jobs, APP_NAME, APP_SUB, max_workers=workers,
+                               on_progress=lambda done, total: progress.append((done, total)))
+    with zipfile.ZipFile(BytesIO(data)) as bundle:
+        assert bundle.namelist() == [name for name, *_ in jobs]
+        for name, kind, sections, columns in jobs:
+            member = bundle.read(name)
+            if kind == "xlsx":
+                df = sections[0][1]
+                assert _sheet(member) == _sheet(_baseline_excel(df, columns))
+                assert _sheet(member) == _sheet(build_cause_list_excel(df, columns, APP_NAME, APP_SUB))
+            else:
+                single = render_cause_list_pdf(sections, columns, APP_NAME, APP_SUB)
+                assert _pdf_without_date(member) == _pdf_without_date(single)
+    assert len(jobs) > 3
+    assert progress == [(done, len(jobs)) for done in range(1, len(jobs) + 1)]
@@ -0,0 +1,164 @@
+import datetime
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+from dateutil import parser
+
+from case_store import CaseStore
+from case_core import read_case_export
+from scheduler import JobScheduler
+from sync_engine import ResponseCache, Stopped, SyncEngine
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myCases.txt")
+DAY = datetime.date(2026, 10, 20)
+TOMORROW = DAY + datetime.timedelta(days=1)
+
+def _status(next_date, purpose="Evidence"):
+    return {"date_last_list": "2026-10-01", "date_next_list": next_date, "purpose_name": purpose}
+
+@pytest.fixture(scope="module")
+def cases():
+    # Every fifth case is listed on DAY
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    df.iloc[::5, df.columns.get_loc("date_next_list")] = pd.Timestamp(DAY)
+    return df
+
+def _script(df):
+    # Of the cases listed on DAY, some move to tomorrow, some elsewhere, some are not found
+    script = {}
+    for n, cino in enumerate(df.loc[df["date_next_list"] == pd.Timestamp(DAY), "cino"]):
+        script[cino] = [[(200, {}, _status(TOMORROW.isoformat())), (200, {}, _status("2026-12-01")),
+                         (404, {}, None), (200, {}, _status(TOMORROW.isoformat(), "Orders"))][n % 4]]
+    return script
+
+def _scheduler(tmp_path, store, url):
+    sched = JobScheduler(str(tmp_path / "jobs.db"), store, ResponseCache(str(tmp_path / "cache.db")),
+                         {"base_url": url, "min_delay_seconds": 0})
+    sched.today = lambda: DAY
+    return sched
+
+def _baseline_rollover(df, script):
+    # roll_cases_to_tomorrow as it was before the scheduler, with fetch_case_api reading the script
+    def fetch_case_api(cino):
+        status, _, data = script[cino][0]
+        if status != 200:
+            return None
+        return {"date_next_list": parser.parse(data["date_next_list"]).date()}
+
+    df = df.copy()
+    updated_rows = 0
+    for idx, row in df.iterrows():
+        if row["date_next_list"] == pd.Timestamp(DAY):
+            updated_data = fetch_case_api(row["cino"])
+            if updated_data and updated_data["date_next_list"] == TOMORROW:
+                df.at[idx, "date_last_list"] = row["date_next_list"]
+                df.at[idx, "date_next_list"] = pd.Timestamp(TOMORROW)
+                updated_rows += 1
+    return df, updated_rows
+
+def test_rollover_matches_baseline(tmp_path, provider, cases):
+    provider.script.update(_script(cases))
+    store = CaseStore(str(tmp_path / "store"))
+    store.save_cases(cases)
+    sched = _scheduler(tmp_path, store, provider.url)
+
+    message = sched.rollover(lambda done, total: None)
+    expected, updated_rows = _baseline_rollover(cases, provider.script)
+    assert updated_rows > 0
+    assert message == f"Rolled {updated_rows} case(s) to Tomorrow's Cause List."
+    pd.testing.assert_frame_equal(store.load_cases(), expected)
+
+    # Statuses fetched within the hour are trusted and the rolled cases are no longer listed today,
+    # so only the cases the provider did not know are asked about again
+    hits = len(provider.hits)
+    not_found = sum(script[0][0] == 404 for script in provider.script.values())
+    assert sched.rollover(lambda done, total: None) == "Rolled 0 case(s) to Tomorrow's Cause List."
+    assert len(provider.hits) == hits + not_found
+
+class _WatchedLock:
+    # Stands in for store.lock and counts how deeply it is held
+    def __init__(self, lock):
+        self.lock = lock
+        self.depth = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.depth += 1
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        self.lock.release()
+
+def test_rollover_fetches_outside_the_store_lock(tmp_path, provider, cases):
+    provider.script.update(_script(cases))
+    store = CaseStore(str(tmp_path / "store"))
+    store.save_cases(cases)
+    store.lock = _WatchedLock(store.lock)
+    sched = _scheduler(tmp_path, store, provider.url)
+    engine, held = sched.engine(), []
+    get = engine.get
+
+    def watched_get(*args, **kwargs):
+        held.append(store.lock.depth)
+        return get(*args, **kwargs)
+
+    engine.get = watched_get
+    sched.rollover(lambda done, total: None)
+    # Page renders take the store lock, so no request may go out while the rollover holds it
+    assert len(held) == len(provider.script)
+    assert not any(held)
+
+def test_stop_cuts_a_batch_short(tmp_path, provider):
+    cinos = list("ABCDEF")
+    provider.script.update({c: [(503, {"Retry-After": "30"}, None)] for c in cinos})
+    engine = SyncEngine(provider.url, min_delay_seconds=0, max_workers=2)
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    cache.start_run(cinos)
+    threading.Timer(0.3, engine.stop).start()
+    started = time.monotonic()
+    with pytest.raises(Stopped):
+        engine.refresh_many(cinos, cache)
+    # A Retry-After of 30s is not waited out, and nothing was ticked off the journal
+    assert time.monotonic() - started < 5
+    assert sorted(cache.remaining()) == cinos
+    deadline = time.monotonic() + 5
+    while any(t.name == "casepilot-sync" for t in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(t.name == "casepilot-sync" for t in threading.enumerate())
+
+def test_stopped_job_goes_back_to_the_queue(tmp_path, provider, cases):
+    provider.script.update(_script(cases))
+    store = CaseStore(str(tmp_path / "store"))
+    store.save_cases(cases)
+    sched = _scheduler(tmp_path, store, provider.url)
+    sched.engine().stop()
+    sched.submit("rollover")
+    sched._run(*sched._next_job())
+    job, = sched.jobs()
+    assert (job["kind"], job["status"], job["progress"]) == ("rollover", "queued", 0)
+    assert provider.hits == []
+
+def test_daily_job_fires_only_when_its_time_passes_while_running(tmp_path):
+    store = CaseStore(str(tmp_path / "store"))
+    store.set_setting("auto_sync_time", "17:00:00")
+    sched = _scheduler(tmp_path, store, "http://127.0.0.1:9")
+
+    def at(hour, minute=0):
+        return sched.tz.localize(datetime.datetime(2026, 10, 20, hour, minute))
+
+    # Started after the sync time: no catch-up sync of every case on the first render
+    sched.started, sched.now = at(18), lambda: at(19)
+    sched._schedule_daily()
+    assert sched.jobs() == []
+
+    sched.started, sched.now = at(16), lambda: at(16, 30)
+    sched._schedule_daily()
+    assert sched.jobs() == []
+    sched.now = lambda: at(17, 1)
+    sched._schedule_daily()
+    sched._schedule_daily()
+    assert [(job["kind"], job["status"]) for job in sched.jobs()] == [("daily", "queued")]
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from case_core import read_case_export
+from search_index import SEARCH_MODES, CaseSearchIndex, tokenize
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myCases.txt")
+EDITED = [0, 3, 7, 100, 1335]
+
+@pytest.fixture(scope="module")
+def cases():
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    return df
+
+def _edited(df):
+    df = df.copy()
+    df["purpose_name"] = df["purpose_name"].cat.add_categories(["Zeta Arguments"])
+    df.loc[EDITED[:3], "petparty_name"] = "Zyxwvu Qqq"
+    df.loc[EDITED[3], "resparty_name"] = df["resparty_name"].iat[1]
+    df.loc[EDITED[3:], "purpose_name"] = "Zeta Arguments"
+    return df
+
+def _queries(before, after):
+    # Words that leave, arrive or stay on the edited rows, their fragments, and phrases around them
+    queries = {"zyxwvu", "zyxwvu qqq", "qq", "zeta", "eta arg", "zeta arguments", "6285/2007", "state"}
+    for index in (before, after):
+        for pos in EDITED:
+            tokens = tokenize(index.text[pos])
+            queries.update(tokens[:6])
+            queries.update(t[1:4] for t in tokens[:6])
+            queries.update(" ".join(tokens[i:i + 2]) for i in range(0, 6, 2))
+    return sorted(q for q in queries if q.strip())
+
+def _assert_same_results(index, rebuilt, queries):
+    assert index.text == rebuilt.text
+    for query in queries:
+        for mode in SEARCH_MODES:
+            assert index.search(query, mode).tolist() == rebuilt.search(query, mode).tolist(), (query, mode)
+        within = np.arange(0, len(rebuilt), 3)
+        assert index.search(query, within=within).tolist() == rebuilt.search(query, within=within).tolist()
+
+def test_update_matches_rebuild(cases):
+    edited = _edited(cases)
+    index = CaseSearchIndex(cases)
+    index.update(edited, EDITED)
+    rebuilt = CaseSearchIndex(edited)
+    _assert_same_results(index, rebuilt, _queries(CaseSearchIndex(cases), rebuilt))
+    assert index.search("zyxwvu").tolist() == EDITED[:3]
+
+def test_update_of_a_copy_leaves_the_original(cases):
+    edited = _edited(cases)
+    original = CaseSearchIndex(cases)
+    copy = original.copy()
+    copy.update(edited, EDITED)
+    queries = _queries(CaseSearchIndex(cases), CaseSearchIndex(edited))
+    _assert_same_results(copy, CaseSearchIndex(edited), queries)
+    _assert_same_results(original, CaseSearchIndex(cases), queries)
+
+def test_repeated_updates_match_rebuild(cases):
+    # Editing rows back and forth leaves emptied postings behind; they must not match anything
+    edited = _edited(cases)
+    index = CaseSearchIndex(cases)
+    index.update(edited, EDITED)
+    index = index.copy()
+    index.update(cases, EDITED)
+    rebuilt = CaseSearchIndex(cases)
+    _assert_same_results(index, rebuilt, _queries(rebuilt, CaseSearchIndex(edited)))
+    assert index.search("zyxwvu").tolist() == []
@@ -0,0 +1,141 @@
+import datetime
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from case_core import read_case_export
+from sync_engine import ResponseCache, SyncEngine, apply_sync_results
+
+EXPORT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "myCases.txt")
+
+def _status(next_date, purpose="Evidence"):
+    return {"date_last_list": "2026-10-01", "date_next_list": next_date, "purpose_name": purpose}
+
+def test_retries_honour_retry_after(provider):
+    provider.script["A"] = [(503, {"Retry-After": "1"}, None), (429, {"Retry-After": "0"}, None),
+                            (200, {}, _status("2026-11-02"))]
+    # A backoff this long would fail the timing below if Retry-After were ignored
+    engine = SyncEngine(provider.url, min_delay_seconds=0, backoff_seconds=5)
+    assert engine.fetch("A")["date_next_list"] == datetime.date(2026, 11, 2)
+    times = [t for _, t, _ in provider.hits]
+    assert len(times) == 3
+    assert times[1] - times[0] >= 0.9
+    assert times[2] - times[1] < 1
+
+def test_gives_up_after_max_retries(provider):
+    provider.script["A"] = [(500, {"Retry-After": "0"}, None)]
+    engine = SyncEngine(provider.url, min_delay_seconds=0, max_retries=2)
+    assert engine.get("A") is None
+    assert engine.fetch_many(["A"]) == {"A": None}
+    assert len(provider.hits) == 6
+
+def test_not_found_is_not_retried(provider):
+    provider.script["A"] = [(404, {}, None)]
+    engine = SyncEngine(provider.url, min_delay_seconds=0)
+    assert engine.fetch("A") is None
+    assert len(provider.hits) == 1
+
+def test_requests_are_paced(provider):
+    cinos = [f"C{i}" for i in range(10)]
+    for cino in cinos:
+        provider.script[cino] = [(200, {}, _status("2026-11-02"))]
+    engine = SyncEngine(provider.url, min_delay_seconds=0.1, max_workers=4)
+    results = engine.fetch_many(cinos + cinos[:3])
+    assert sorted(results) == cinos and all(results.values())
+    # Repeated CNRs are fetched once; the bucket starts with one token per worker and the
+    # other six wait their turn
+    assert len(provider.hits) == 10
+    times = sorted(t for _, t, _ in provider.hits)
+    assert times[-1] - times[0] >= 0.5
+
+def test_refresh_uses_validators_and_304(provider, tmp_path):
+    provider.script["A"] = [(200, {"ETag": '"v1"'}, _status("2026-11-02"))]
+    engine = SyncEngine(provider.url, min_delay_seconds=0)
+    cache = ResponseCache(str(tmp_path / "responses.db"))
+    cache.start_run(["A"])
+
+    assert engine.refresh_many(["A"], cache) == 1
+    assert list(cache.pending_changes()) == ["A"]
+    cache.mark_applied(["A"])
+    first = cache.fetched_at()["A"]
+
+    time.sleep(0.01)
+    assert engine.refresh_many(["A"], cache) == 1
+    assert provider.hits[-1][2].get("If-None-Match") == '"v1"'
+    # A 304 keeps the stored body, counts as fresh and does not make the case pending again
+    assert cache.pending_changes() == {}
+    assert cache.fetched_at()["A"] > first
+    assert cache.parsed(["A"])["A"]["date_next_list"] == datetime.date(2026, 11, 2)
+    assert cache.remaining() == []
+
+def test_changed_body_becomes_pending(provider, tmp_path):
+    provider.script["A"] = [(200, {}, _status("2026-11-02")), (200, {}, _status("2026-11-09"))]
+    engine = SyncEngine(provider.url, min_delay_seconds=0)
+    cache = ResponseCache(str(tmp_path / "responses.db"))
+    engine.refresh_many(["A"], cache)
+    cache.mark_applied(["A"])
+    engine.refresh_many(["A"], cache)
+    assert cache.pending_changes()["A"]["date_next_list"] == datetime.date(2026, 11, 9)
+
+def test_failed_requests_stay_in_the_journal(provider, tmp_path):
+    provider.script["A"] = [(200, {}, _status("2026-11-02"))]
+    provider.script["B"] = [(500, {"Retry-After": "0"}, None)]
+    engine = SyncEngine(provider.url, min_delay_seconds=0, max_retries=0)
+    cache = ResponseCache(str(tmp_path / "responses.db"))
+    cache.start_run(["A", "B"])
+    assert engine.refresh_many(["A", "B"], cache) == 1
+    # Both were attempted, so neither is left for a resumed run; only A has a status
+    assert cache.remaining() == []
+    assert list(cache.fetched_at()) == ["A"]
+
+def _apply_row_by_row(df, positions, results):
+    # The baseline update_cases_api loop
+    df = df.astype({"purpose_name": object})
+    updated = 0
+    for idx in df.index[positions]:
+        upd = results.get(df.at[idx, "cino"])
+        if upd:
+            df.at[idx, "date_last_list"] = df.at[idx, "date_next_list"]
+            if upd["date_next_list"]:
+                df.at[idx, "date_next_list"] = pd.Timestamp(upd["date_next_list"])
+            if upd["purpose_name"]:
+                df.at[idx, "purpose_name"] = upd["purpose_name"]
+            updated += 1
+    return df, updated
+
+def test_apply_sync_results_matches_row_by_row_update():
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    rng = np.random.default_rng(0)
+    positions = np.sort(rng.choice(len(df), 400, replace=False))
+    results = {}
+    for i, cino in enumerate(df["cino"].to_numpy()[rng.choice(len(df), 600, replace=False)]):
+        # Misses, statuses without a next date or stage, known and new stages
+        kind = i % 5
+        results[cino] = None if kind == 0 else {
+            "date_last_list": None,
+            "date_next_list": None if kind == 1 else datetime.date(2026, 11, 1) + datetime.timedelta(days=i % 40),
+            "purpose_name": "" if kind == 2 else ("Final Arguments" if kind == 3 else df["purpose_name"].iat[i]),
+        }
+    expected, expected_updated = _apply_row_by_row(df, positions, results)
+
+    before = df.copy()
+    updated, moves, patches = apply_sync_results(df, positions, results)
+    assert updated == expected_updated == len(patches)
+    for col in df.columns:
+        pd.testing.assert_series_equal(df[col].astype(object), expected[col].astype(object))
+    assert sorted(moves) == sorted(
+        (pos, before["date_next_list"].iat[pos], df["date_next_list"].iat[pos])
+        for pos in positions if results.get(df["cino"].iat[pos]) and results[df["cino"].iat[pos]]["date_next_list"])
+    for cino, patch in patches.items():
+        pos = df.index[df["cino"] == cino][0]
+        assert patch == {c: df[c].iat[pos] for c in ["date_last_list", "date_next_list", "purpose_name"]}
+
+def test_apply_sync_results_without_hits_leaves_frame_alone():
+    with open(EXPORT, "rb") as f:
+        df, _ = read_case_export(f)
+    before = df.copy()
+    assert apply_sync_results(df, np.array([0, 1]), {df["cino"].iat[0]: None}) == (0, [], {})
+    pd.testing.assert_frame_equal(df, before)